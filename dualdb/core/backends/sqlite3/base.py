@@ -0,0 +1,136 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import re
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+#DatabaseError and IntegrityError are looked up on the backend module.
+from django.db.backends.sqlite3.base import Database, DatabaseError, \
+    IntegrityError, DatabaseWrapper as SQLiteDatabaseWrapper, \
+    _sqlite_extract, _sqlite_date_trunc, _sqlite_regexp, \
+    _sqlite_format_dtdelta
+from dualdb.core.instrumentation import InstrumentedCursor, get_stats
+from dualdb.core.pool import POOLS, get_pool
+
+
+#Pragmas set ahead of the others: the wait on locks applies to the switch of
+#the journal mode, which takes one.
+FIRST_PRAGMAS = ["busy_timeout", "journal_mode"]
+PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+def get_pragmas(settings_dict):
+    '''
+        Returns the (name, value) of the ``PRAGMAS`` of the database in the
+        order they are set.
+    '''
+    pragmas = settings_dict.get("PRAGMAS") or {}
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME.match(name) or \
+                not PRAGMA_VALUE.match(unicode(value)):
+            raise ImproperlyConfigured("Invalid pragma {0} = {1!r}.".format(
+                                                                name, value))
+    return sorted(pragmas.items(), key=lambda item: (
+                        FIRST_PRAGMAS.index(item[0]) if item[0] in
+                        FIRST_PRAGMAS else len(FIRST_PRAGMAS), item[0]))
+
+
+def init_connection(connection, settings_dict):
+    '''
+        Sets the pragmas of the database on a connection as it opens.
+    '''
+    pragmas = get_pragmas(settings_dict)
+    if not pragmas:
+        return
+    cursor = connection.cursor()
+    for name, value in pragmas:
+        cursor.execute("PRAGMA {0} = {1}".format(name, value))
+        #Some pragmas answer with their new value.
+        cursor.fetchall()
+    cursor.close()
+
+
+class PooledConnection(Database.Connection):
+    '''
+        SQLite connection which can be told apart once announced.
+    '''
+    #Set once connection_created has been sent for it.
+    announced = False
+
+
+def connect(settings_dict):
+    '''
+        Opens a connection the way the sqlite3 backend of Django does.
+    '''
+    kwargs = {
+        'database': settings_dict['NAME'],
+        'detect_types': Database.PARSE_DECLTYPES | Database.PARSE_COLNAMES,
+    }
+    kwargs.update(settings_dict['OPTIONS'])
+    #Pooled connections move between the threads serving requests.
+    kwargs.update({'check_same_thread': False, 'factory': PooledConnection})
+
+    connection = Database.connect(**kwargs)
+    connection.create_function("django_extract", 2, _sqlite_extract)
+    connection.create_function("django_date_trunc", 2, _sqlite_date_trunc)
+    connection.create_function("regexp", 2, _sqlite_regexp)
+    connection.create_function("django_format_dtdelta", 5,
+                               _sqlite_format_dtdelta)
+    init_connection(connection, settings_dict)
+    return connection
+
+
+class DatabaseWrapper(SQLiteDatabaseWrapper):
+    '''
+        The sqlite3 backend of Django, taking its connections out of the
+        ConnectionPool of the database alias and giving them back on close,
+        instead of opening one for every request.
+
+        In-memory databases, like the test ones, are left unpooled; closing
+        their connection would drop them.
+
+        The ``PRAGMAS`` of the database, like its journal mode or the size
+        of its cache, are set on every connection as it opens.
+    '''
+    def is_pooled(self):
+        '''
+            Returns if the connections of the database are pooled.
+        '''
+        return self.settings_dict['NAME'] != ":memory:"
+
+    def _sqlite_create_connection(self):
+        if not self.is_pooled():
+            super(DatabaseWrapper, self)._sqlite_create_connection()
+            init_connection(self.connection, self.settings_dict)
+            return
+
+        pool = get_pool(self.alias, self.settings_dict,
+                        partial(connect, self.settings_dict))
+        self.connection = pool.checkout()
+        if not self.connection.announced:
+            self.connection.announced = True
+            connection_created.send(sender=self.__class__, connection=self)
+
+    def cursor(self):
+        '''
+            Returns a cursor recording its queries into the QueryStats of
+            the request being served, if any.
+        '''
+        cursor = super(DatabaseWrapper, self).cursor()
+        stats = get_stats()
+        if stats is None:
+            return cursor
+        return InstrumentedCursor(cursor, self.alias, stats)
+
+    def close(self):
+        if self.connection is None or not self.is_pooled():
+            return super(DatabaseWrapper, self).close()
+
+        self.validate_thread_sharing()
+        POOLS[self.alias].checkin(self.connection)
+        self.connection = None
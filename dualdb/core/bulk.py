@@ -0,0 +1,280 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import resolve, Resolver404
+from django.db import connections, router, transaction
+from django.db.models import Max
+from tastypie.exceptions import ApiFieldError, ImmediateHttpResponse, \
+    NotFound
+from tastypie.utils import dict_strip_unicode_keys
+from dualdb.core.models import ChangeEvent
+from dualdb.core.shards import SHARDS, next_ids
+from dualdb.core.signals import bulk_saved
+
+#SQLite allows up to 999 parameters per statement.
+MAX_PARAMS = 999
+
+
+def get_pk(uri):
+    '''
+        Returns the primary key in the given resource URI; None if it is
+        not a detail URI.
+    '''
+    try:
+        return resolve(uri).kwargs.get("pk")
+    except Resolver404:
+        return None
+
+
+def lock_table(model, connection):
+    '''
+        Takes the write lock of the database of the model for the running
+        transaction, with an UPDATE touching no row; so that no other
+        connection writes to it until committed. SQLite can't BEGIN
+        IMMEDIATE once a transaction is open, which Django may have done.
+    '''
+    quote = connection.ops.quote_name
+    column = quote(model._meta.pk.column)
+    connection.cursor().execute("UPDATE {0} SET {1} = {1} WHERE 0".format(
+                                quote(model._meta.db_table), column))
+
+
+def bulk_update(model, objects, using):
+    '''
+        Writes the fields of the given objects back with one UPDATE per
+        batch of rows, choosing the value of each column by primary key.
+    '''
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    pk = model._meta.pk
+    fields = [field for field in model._meta.local_fields
+              if not field.primary_key]
+    batch_size = max(1, MAX_PARAMS // (2 * len(fields) + 1))
+
+    cursor = connection.cursor()
+    for start in range(0, len(objects), batch_size):
+        batch = objects[start:start + batch_size]
+        pks = [pk.get_db_prep_value(obj.pk, connection) for obj in batch]
+
+        columns = []
+        params = []
+        for field in fields:
+            cases = []
+            for obj, obj_pk in zip(batch, pks):
+                cases.append("WHEN %s THEN %s")
+                params.extend([obj_pk, field.get_db_prep_save(
+                                getattr(obj, field.attname), connection)])
+            columns.append("{0} = CASE {1} {2} ELSE {0} END".format(
+                           quote(field.column), quote(pk.column),
+                           " ".join(cases)))
+        params.extend(pks)
+
+        cursor.execute("UPDATE {0} SET {1} WHERE {2} IN ({3})".format(
+                       quote(model._meta.db_table), ", ".join(columns),
+                       quote(pk.column), ", ".join(["%s"] * len(batch))),
+                       params)
+    #Raw writes don't mark the transaction for commit.
+    transaction.set_dirty(using=using)
+
+
+class BulkWriter(object):
+    '''
+        Creates and updates the objects of a posted array in one go; they
+        get validated together, then written with bulk_create and batched
+        UPDATEs in one transaction per database they are routed to.
+
+        Objects carrying their resource_uri are updated, the rest created.
+        Related objects are only linked to by URI, and are looked up with
+        one query per related resource up front.
+    '''
+    def prefetch(self, resource, request, items):
+        '''
+            Looks up the objects the items link to, so that hydrating the
+            related fields does not cost a query per item.
+        '''
+        related_objects = {}
+        for field_name, field_object in resource.fields.items():
+            if not getattr(field_object, "is_related", False) or \
+                    field_object.readonly:
+                continue
+
+            pks = set()
+            for item in items:
+                uris = item.get(field_name)
+                if not isinstance(uris, (list, tuple)):
+                    uris = [uris]
+                pks.update(get_pk(uri) for uri in uris
+                           if isinstance(uri, basestring))
+            pks.discard(None)
+            if not pks:
+                continue
+
+            related_resource = field_object.to_class()
+            model = related_resource._meta.object_class
+            for obj in related_resource.get_object_list(request).filter(
+                                                    pk__in=list(pks)):
+                related_objects[(model, unicode(obj.pk))] = obj
+
+        request.related_objects = related_objects
+
+    def get_existing(self, resource, request, items):
+        '''
+            Returns the objects the items carrying a resource_uri update,
+            by primary key.
+        '''
+        pks = [get_pk(item["resource_uri"]) for item in items
+               if item.get("resource_uri")]
+        if not pks:
+            return {}
+        return dict((unicode(obj.pk), obj) for obj in
+                    resource.get_object_list(request).filter(pk__in=pks))
+
+    def hydrate(self, resource, request, items):
+        '''
+            Builds and validates a bundle out of every item; responds with
+            the errors of all of the invalid items, if any.
+        '''
+        self.prefetch(resource, request, items)
+        existing = self.get_existing(resource, request, items)
+        object_list = resource.get_object_list(request)
+
+        bundles = []
+        errors = {}
+        for index, item in enumerate(items):
+            obj = None
+            if item.get("resource_uri"):
+                obj = existing.get(get_pk(item["resource_uri"]))
+                if obj is None:
+                    errors[index] = "No object found at '{0}'.".format(
+                                                    item["resource_uri"])
+                    continue
+
+            bundle = resource.build_bundle(obj=obj, request=request,
+                                           data=dict_strip_unicode_keys(item))
+            try:
+                if obj is None:
+                    resource.authorized_create_detail(object_list, bundle)
+                else:
+                    resource.authorized_update_detail(object_list, bundle)
+                resource.full_hydrate(bundle)
+                resource.hydrate_m2m(bundle)
+            except (ApiFieldError, NotFound, ObjectDoesNotExist), e:
+                errors[index] = e.args[0] if e.args else ""
+                continue
+
+            if not resource.is_valid(bundle):
+                errors[index] = bundle.errors
+            bundles.append(bundle)
+
+        if errors:
+            raise ImmediateHttpResponse(response=resource.error_response(
+                                            request, {"errors": errors}))
+        return bundles
+
+    def route(self, model, bundles):
+        '''
+            Groups the bundles by the database their objects are written
+            to. Sharded objects get their ids first, as they may be routed
+            by them.
+        '''
+        created = [bundle.obj for bundle in bundles
+                   if bundle.obj._state.adding]
+        if created and model in SHARDS and len(SHARDS[model]) > 1:
+            for obj, pk in zip(created, next_ids(model, len(created))):
+                obj.pk = pk
+
+        groups = {}
+        for bundle in bundles:
+            db = router.db_for_write(model, instance=bundle.obj)
+            groups.setdefault(db, []).append(bundle)
+        return groups
+
+    def write(self, resource, bundles):
+        '''
+            Writes the objects of the given bundles, along with their many
+            to many links and their change events, in one transaction per
+            database.
+        '''
+        model = resource._meta.object_class
+        change_log = resource._meta.change_log
+        for db, group in self.route(model, bundles).items():
+            created = [bundle.obj for bundle in group
+                       if bundle.obj._state.adding]
+            updated = [bundle.obj for bundle in group
+                       if not bundle.obj._state.adding]
+
+            with transaction.commit_on_success(using=db):
+                self.allocate(model, created, db)
+                model._default_manager.db_manager(db).bulk_create(created)
+                if updated:
+                    bulk_update(model, updated, db)
+                self.link(resource, group, db)
+                if change_log is not None:
+                    with change_log.batch():
+                        change_log.record(db, model, created,
+                                          ChangeEvent.CREATED)
+                        change_log.record(db, model, updated,
+                                          ChangeEvent.UPDATED)
+
+            for obj in created:
+                obj._state.db = db
+                obj._state.adding = False
+            if created:
+                bulk_saved.send(sender=model, instances=created,
+                                created=True, using=db)
+            if updated:
+                bulk_saved.send(sender=model, instances=updated,
+                                created=False, using=db)
+
+    def allocate(self, model, objects, using):
+        '''
+            Hands out the primary keys of the objects to create, so that
+            they can be linked to right after the bulk insert; holding the
+            write lock, so that no other writer takes the same ones before
+            the transaction commits.
+        '''
+        unassigned = [obj for obj in objects if obj.pk is None]
+        if not unassigned:
+            return
+
+        lock_table(model, connections[using])
+        top = model._default_manager.db_manager(using).aggregate(
+                                                top=Max("pk"))["top"] or 0
+        for pk, obj in enumerate(unassigned, top + 1):
+            obj.pk = pk
+
+    def link(self, resource, bundles, using):
+        '''
+            Replaces the many to many links of the objects of the bundles
+            with the ones they were posted with.
+        '''
+        model = resource._meta.object_class
+        for field_name, field_object in resource.fields.items():
+            if not getattr(field_object, "is_m2m", False) or \
+                    field_object.readonly or \
+                    not isinstance(field_object.attribute, basestring):
+                continue
+
+            field = model._meta.get_field(field_object.attribute)
+            through = field.rel.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(
+                                    field.m2m_reverse_field_name()).attname
+
+            group = [bundle for bundle in bundles
+                     if field_name in bundle.data]
+            if not group:
+                continue
+
+            links = through._default_manager.db_manager(using)
+            linked = [bundle.obj.pk for bundle in group
+                      if not bundle.obj._state.adding]
+            if linked:
+                links.filter(**{source + "__in": linked}).delete()
+            links.bulk_create([through(**{source: bundle.obj.pk,
+                                          target: related.obj.pk})
+                               for bundle in group
+                               for related in bundle.data[field_name]])
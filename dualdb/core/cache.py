@@ -0,0 +1,252 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import get_cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from tastypie.cache import NoCache
+from dualdb.core.signals import bulk_saved
+
+#Seconds the shared version counters are kept; long enough past any
+#response timeout that a counter seeded again can't repeat an old value.
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def get_label(model):
+    '''
+        Returns the label the version counter of the model is kept under;
+        proxy and deferred classes share the one of their concrete model.
+    '''
+    opts = model._meta.concrete_model._meta
+    return "{0}.{1}".format(opts.app_label, opts.object_name)
+
+
+class ResponseCache(NoCache):
+    '''
+        Base of the caches holding the serialized responses of resources.
+
+        Every model has a version counter which is part of the cache keys
+        of the responses built off it; writes bump the counter, so stale
+        responses are never looked up again and simply age out.
+
+        The counters are kept in the given SharedVersions, when there are
+        any, and in the process otherwise.
+    '''
+    def __init__(self, timeout=60, versions=None, *args, **kwargs):
+        super(ResponseCache, self).__init__(*args, **kwargs)
+        self.timeout = timeout
+        self.versions = versions
+        self._local_versions = {}
+        self._versions_lock = threading.Lock()
+        #Nothing is known to have changed before the cache came up.
+        self._started = time.time()
+
+        post_save.connect(self.model_changed)
+        post_delete.connect(self.model_changed)
+        bulk_saved.connect(self.model_changed)
+        m2m_changed.connect(self.relation_changed)
+
+    def get_stamps(self, labels):
+        '''
+            Returns the current version and the time of the last change of
+            each of the given model labels.
+        '''
+        if self.versions is not None:
+            return self.versions.get_stamps(labels)
+        versions = self._local_versions
+        default = (0, self._started)
+        return [versions.get(label, default) for label in labels]
+
+    def is_shared(self):
+        '''
+            Returns if the versions are shared by all of the processes, so
+            that a write in any of them is seen by the others.
+        '''
+        return self.versions is not None
+
+    def bump(self, label):
+        '''
+            Moves the version of the given model label forward.
+        '''
+        if self.versions is not None:
+            return self.versions.bump(label)
+        with self._versions_lock:
+            version = self._local_versions.get(label, (0, None))[0]
+            self._local_versions[label] = (version + 1, time.time())
+
+    def get_validators(self, bits, models):
+        '''
+            Returns the cache key of a response, built from the bits
+            identifying the request and the versions of the models it is
+            built off, along with the time those models last changed.
+            The key doubles as the ETag of the response.
+        '''
+        labels = sorted(set(get_label(model) for model in models))
+        stamps = self.get_stamps(labels)
+        bits = list(bits) + ["{0}={1}".format(label, version)
+                             for label, (version, _) in zip(labels, stamps)]
+        key = "response:" + hashlib.md5(
+                            u"|".join(bits).encode("utf-8")).hexdigest()
+        return key, max(modified for _, modified in stamps)
+
+    def make_key(self, bits, models):
+        '''
+            Returns the cache key of a response, see get_validators.
+        '''
+        return self.get_validators(bits, models)[0]
+
+    def model_changed(self, sender, **kwargs):
+        '''
+            post_save, post_delete and bulk_saved hook, invalidates the
+            responses of the saved or deleted model.
+        '''
+        self.bump(get_label(sender))
+
+    def relation_changed(self, sender, instance, model, **kwargs):
+        '''
+            m2m_changed hook, invalidates the responses of both the models
+            of the relation.
+        '''
+        if kwargs.get("action", "").startswith("pre_"):
+            return
+        self.bump(get_label(instance.__class__))
+        self.bump(get_label(model))
+
+
+class SharedVersions(object):
+    '''
+        Version counters of the models kept in one of the Django caches,
+        so that all of the processes on the host see the writes made by
+        any of them.
+    '''
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self._backend = None
+        self._pid = None
+
+    @property
+    def backend(self):
+        '''
+            The Django cache, connected on first use in every process; the
+            connections of a parent are not to be shared by its forks.
+        '''
+        if self._backend is None or self._pid != os.getpid():
+            self._backend = get_cache(self.alias)
+            self._pid = os.getpid()
+        return self._backend
+
+    def _seed(self):
+        '''
+            Returns the version to start an evicted or new counter from;
+            taken off the clock, so that it has never been used before.
+        '''
+        return int(time.time() * 1000)
+
+    def get_stamps(self, labels):
+        keys = []
+        for label in labels:
+            keys.extend(["version:" + label, "modified:" + label])
+        stamps = self.backend.get_many(keys)
+
+        for key in keys:
+            if key not in stamps:
+                if key.startswith("version:"):
+                    value = self._seed()
+                else:
+                    #Not known, have clients fetch it afresh.
+                    value = time.time()
+                self.backend.add(key, value, VERSION_TIMEOUT)
+                stamps[key] = self.backend.get(key)
+        return [(stamps["version:" + label], stamps["modified:" + label])
+                for label in labels]
+
+    def bump(self, label):
+        key = "version:" + label
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            self.backend.set(key, self._seed(), VERSION_TIMEOUT)
+        self.backend.set("modified:" + label, time.time(), VERSION_TIMEOUT)
+
+
+class LRUCache(ResponseCache):
+    '''
+        In-process cache keeping the most recently used responses up to
+        ``max_entries``, each for ``timeout`` seconds.
+
+        The versions are kept in the Django cache named by ``versions``,
+        when given, so that a write in any process serving the API keeps
+        the others from serving their stale copies. Otherwise they are
+        local to the process as well, which is only right when a single
+        process serves the API.
+    '''
+    def __init__(self, timeout=60, max_entries=1000, versions=None, *args,
+                 **kwargs):
+        versions = SharedVersions(versions) if versions else None
+        super(LRUCache, self).__init__(timeout, versions, *args, **kwargs)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.time():
+                return None
+            #Re-inserting marks it the most recently used one.
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + timeout, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        '''
+            Drops all of the cached responses.
+        '''
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCache(ResponseCache):
+    '''
+        Keeps the responses and the versions in one of the Django caches,
+        so that all of the processes on the host share and invalidate them.
+    '''
+    def __init__(self, alias="default", timeout=60, *args, **kwargs):
+        super(SharedCache, self).__init__(timeout, SharedVersions(alias),
+                                          *args, **kwargs)
+        self.alias = alias
+
+    @property
+    def backend(self):
+        '''
+            The Django cache, connected on first use.
+        '''
+        return self.versions.backend
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        self.backend.set(key, value, timeout)
@@ -0,0 +1,347 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.db import connections, router
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpRequest, HttpResponse
+from tastypie import http
+from tastypie.utils.mime import build_content_type
+from dualdb.core.cache import get_label
+from dualdb.core.signals import bulk_saved
+
+#Seconds a rebuild waits for the writes to settle, and commit.
+DEFAULT_REBUILD_DELAY = 1.0
+
+#Magic, time the rows were read at, count of records, offset of the index
+#and length of the name of the database they were read from.
+HEADER = struct.Struct("<8sdQQI")
+MAGIC = "DDBCAT01"
+#Primary key, offset and length of a record; sorted by primary key.
+ENTRY = struct.Struct("<qQI")
+
+#Query parameters a list can be served with off a snapshot.
+PLAIN_PARAMETERS = frozenset(["format", "limit", "offset", "_"])
+
+logger = logging.getLogger(__name__)
+
+
+def write_snapshot(path, database, built_from, records):
+    '''
+        Writes the (primary key, JSON) records, in the order of their
+        primary keys, into the snapshot file; replacing the file at once.
+    '''
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as snapshot:
+            database = database.encode("utf-8")
+            snapshot.write(HEADER.pack(MAGIC, built_from, 0, 0,
+                                       len(database)))
+            snapshot.write(database)
+            entries = []
+            offset = snapshot.tell()
+            for pk, record in records:
+                snapshot.write(record)
+                entries.append(ENTRY.pack(pk, offset, len(record)))
+                offset += len(record)
+            snapshot.write("".join(entries))
+            snapshot.seek(0)
+            snapshot.write(HEADER.pack(MAGIC, built_from, len(entries),
+                                       offset, len(database)))
+        #Readable by the workers of other users too, as the database is.
+        os.chmod(temp_path, 0644)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+class SnapshotFile(object):
+    '''
+        A snapshot file mapped in memory, read-only; the pages are shared
+        by all of the processes mapping it. Records are looked up by binary
+        search over the index, in place, and sliced straight off the map.
+    '''
+    def __init__(self, path):
+        with open(path, "rb") as snapshot:
+            self.inode = os.fstat(snapshot.fileno()).st_ino
+            self.map = mmap.mmap(snapshot.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        magic, self.built_from, self.length, self.index, length = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("{0} is no catalog snapshot.".format(path))
+        self.database = self.map[HEADER.size:HEADER.size + length].decode(
+                                                                    "utf-8")
+
+    def __len__(self):
+        return self.length
+
+    def get_entry(self, position):
+        return ENTRY.unpack_from(self.map, self.index + position * ENTRY.size)
+
+    def get(self, pk):
+        '''
+            Returns the record of the primary key, None if there is none.
+        '''
+        low, high = 0, self.length
+        while low < high:
+            middle = (low + high) // 2
+            entry_pk, offset, length = self.get_entry(middle)
+            if entry_pk == pk:
+                return self.map[offset:offset + length]
+            if entry_pk < pk:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __getitem__(self, index):
+        '''
+            Returns the records of a slice of positions.
+        '''
+        return [self.map[offset:offset + length] for _, offset, length in
+                (self.get_entry(position) for position in
+                 xrange(*index.indices(self.length)))]
+
+
+class Catalog(object):
+    '''
+        Serves the lists and details of a resource which rarely changes
+        off a snapshot file of its JSON records, rather than off its
+        database.
+
+        The snapshot is valid while none of the given models has been
+        written to since its rows were read. Writes are marked in a file
+        next to it, for the other processes serving it, and make the
+        process writing rebuild it in the background once they settle;
+        until then, requests are served off the database. Snapshots of
+        in-memory databases are built on demand only.
+
+        Plain JSON requests are served off the snapshot; filtered, sorted,
+        sparse and other formats ones go to the database.
+    '''
+    def __init__(self, path, models, delay=DEFAULT_REBUILD_DELAY):
+        self.path = path
+        self.marker = path + ".changed"
+        self.model = models[0]
+        self.labels = frozenset(get_label(model) for model in models)
+        self.delay = delay
+        self.resource = None
+        self.snapshot = None
+        self.changed_at = 0
+        self.due = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+        post_save.connect(self.model_changed)
+        post_delete.connect(self.model_changed)
+        bulk_saved.connect(self.model_changed)
+        m2m_changed.connect(self.relation_changed)
+
+    def bind(self, resource):
+        '''
+            Sets the resource the snapshot is built off, once.
+        '''
+        if self.resource is None:
+            self.resource = resource
+
+    @property
+    def alias(self):
+        return router.db_for_read(self.model)
+
+    def get_database(self):
+        return connections[self.alias].settings_dict["NAME"]
+
+    def is_in_memory(self):
+        return self.get_database() == ":memory:"
+
+    def model_changed(self, sender, **kwargs):
+        if get_label(sender) in self.labels:
+            self.invalidate()
+
+    def relation_changed(self, sender, instance, model, **kwargs):
+        if kwargs.get("action", "").startswith("pre_"):
+            return
+        if self.labels & set([get_label(instance.__class__),
+                              get_label(model)]):
+            self.invalidate()
+
+    def invalidate(self):
+        '''
+            Marks the snapshot out of date, and schedules its rebuild.
+        '''
+        self.changed_at = time.time()
+        if self.is_in_memory():
+            return
+        if not os.path.isdir(os.path.dirname(self.marker)):
+            os.makedirs(os.path.dirname(self.marker))
+        with open(self.marker, "a"):
+            os.utime(self.marker, None)
+        if self.resource is not None:
+            self.schedule()
+
+    def schedule(self):
+        with self._lock:
+            self.due = time.time() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run,
+                                                name="catalog-rebuild")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def run(self):
+        while True:
+            with self._lock:
+                due = self.due
+                if due is None:
+                    self._thread = None
+                    return
+            if time.time() < due:
+                time.sleep(max(due - time.time(), 0))
+                continue
+            with self._lock:
+                if self.due == due:
+                    self.due = None
+            try:
+                self.build()
+            except Exception:
+                logger.exception("The snapshot %s could not be built.",
+                                 self.path)
+            finally:
+                connections[self.alias].close()
+
+    def get_changed_at(self):
+        try:
+            changed_at = os.stat(self.marker).st_mtime
+        except OSError:
+            changed_at = 0
+        return max(changed_at, self.changed_at)
+
+    def get_snapshot(self):
+        '''
+            Returns the snapshot file if it is up to date, mapping it again
+            when it got replaced; None otherwise, when a rebuild is due.
+        '''
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = None
+        snapshot = self.snapshot
+        if inode is None:
+            snapshot = None
+        elif snapshot is None or snapshot.inode != inode:
+            try:
+                snapshot = SnapshotFile(self.path)
+            except (IOError, ValueError, struct.error):
+                snapshot = None
+        self.snapshot = snapshot
+
+        if snapshot is None or snapshot.database != self.get_database() or \
+                snapshot.built_from <= self.get_changed_at():
+            if self.due is None and not self.is_in_memory():
+                self.schedule()
+            return None
+        return snapshot
+
+    def build(self, resource=None):
+        '''
+            Reads all of the rows of the resource, dehydrated the way a
+            plain request does, into a new snapshot file.
+        '''
+        if resource is not None:
+            self.bind(resource)
+        resource = self.resource
+        built_from = time.time()
+        request = HttpRequest()
+        request.method = "GET"
+        objects = resource._meta.queryset._clone().order_by("pk")
+        chunk_size = resource._meta.stream_chunk_size
+
+        def get_records():
+            last = None
+            while True:
+                chunk = objects if last is None else \
+                    objects.filter(pk__gt=last)
+                chunk = list(chunk[:chunk_size])
+                if not chunk:
+                    return
+                resource._meta.relation_loader.load(resource, chunk, None)
+                for obj in chunk:
+                    bundle = resource.full_dehydrate(resource.build_bundle(
+                                                obj=obj, request=request))
+                    record = resource._meta.serializer.to_json(bundle)
+                    if isinstance(record, unicode):
+                        record = record.encode("utf-8")
+                    yield obj.pk, record
+                last = chunk[-1].pk
+
+        write_snapshot(self.path, self.get_database(), built_from,
+                       get_records())
+        return self.get_snapshot()
+
+    def is_plain(self, request):
+        return request.method == "GET" and \
+            self.resource.determine_format(request) == "application/json" \
+            and set(request.GET) <= PLAIN_PARAMETERS
+
+    def get_list(self, resource, request):
+        '''
+            Returns the response of a list off the snapshot, None when it
+            has to be read off the database.
+        '''
+        self.bind(resource)
+        if not self.is_plain(request):
+            return None
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+
+        collection_name = resource._meta.collection_name
+        paginator = resource._meta.paginator_class(request.GET, snapshot,
+                                    resource_uri=resource.get_resource_uri(),
+                                    limit=resource._meta.limit,
+                                    max_limit=resource._meta.max_limit,
+                                    collection_name=collection_name)
+        page = paginator.page()
+        records = page[collection_name]
+        page[collection_name] = []
+        #The collection comes first, the keys being sorted.
+        empty = resource._meta.serializer.to_json(page)
+        if isinstance(empty, unicode):
+            empty = empty.encode("utf-8")
+        prefix = '{{"{0}": ['.format(collection_name)
+        if not empty.startswith(prefix + "]"):
+            return None
+        content = prefix + ", ".join(records) + empty[len(prefix):]
+        return HttpResponse(content,
+                            content_type=build_content_type("application/json"))
+
+    def get_detail(self, resource, request, pk):
+        '''
+            Returns the response of a detail off the snapshot, None when it
+            has to be read off the database.
+        '''
+        self.bind(resource)
+        if not self.is_plain(request) or not unicode(pk).isdigit():
+            return None
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        record = snapshot.get(int(pk))
+        if record is None:
+            return http.HttpNotFound()
+        return HttpResponse(record,
+                            content_type=build_content_type("application/json"))
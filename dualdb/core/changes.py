@@ -0,0 +1,199 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from dualdb.core.cache import get_label
+from dualdb.core.models import ChangeEvent
+from dualdb.core.registry import route
+from dualdb.core.signals import bulk_saved
+
+
+class ChangeLog(object):
+    '''
+        Logs the writes on the tracked models into the ChangeEvent table of
+        the database they went to, so that consumers can follow the changes
+        of every database off its sequence instead of scanning the tables.
+
+        Saves, deletes and changed many to many links are logged off their
+        signals; within the transaction of the write whenever it has one,
+        like the deletes and the writes through BaseResource do. Bulk
+        writes are logged off bulk_saved, right after they commit; rows
+        updated by a query get logged as a single event with no primary
+        key, telling to read the model again. Events recorded within
+        ``batch`` are written in one INSERT per database on the way out.
+
+        SQLite commits one write at a time, so the events of a database
+        become visible in the order of their ids.
+    '''
+    def __init__(self):
+        #Label of the tracked models to their resource name.
+        self.resources = {}
+        self.models = {}
+        self._local = threading.local()
+
+    def connect(self):
+        '''
+            Listens to the writes on all of the models.
+        '''
+        post_save.connect(self.saved)
+        post_delete.connect(self.deleted)
+        m2m_changed.connect(self.relation_changed)
+        bulk_saved.connect(self.bulk_saved)
+
+    def track(self, model, resource_name):
+        '''
+            Logs the writes on the model from now on.
+        '''
+        label = get_label(model)
+        if label not in self.resources:
+            self.resources[label] = resource_name
+            self.models[label] = model
+
+    def is_tracked(self, model):
+        return get_label(model) in self.resources
+
+    def get_aliases(self):
+        '''
+            Returns the databases the tracked models are written to.
+        '''
+        aliases = set()
+        for model in self.models.values():
+            db_name, shard_set = route(model)
+            aliases.update(shard_set.aliases if shard_set else [db_name])
+        return sorted(aliases)
+
+    @contextmanager
+    def batch(self):
+        '''
+            Holds the events recorded within by the current thread, and
+            writes them in one INSERT per database on the way out; the same
+            event once. To be entered within the transactions of the writes,
+            for the events to commit along with them.
+        '''
+        if getattr(self._local, "pending", None) is not None:
+            #Written by the outermost batch.
+            yield
+            return
+        self._local.pending = pending = {}
+        try:
+            yield
+            for alias, events in sorted(pending.items()):
+                ChangeEvent.objects.db_manager(alias).bulk_create(events)
+        finally:
+            self._local.pending = None
+
+    def record(self, alias, model, instances, action):
+        '''
+            Logs the write of the instances, or of rows updated by a query
+            when they are None, into the database; once out of the batch
+            under way, if any.
+        '''
+        label = get_label(model)
+        if instances is None:
+            events = [ChangeEvent(model=label, object_pk=None, action=action)]
+        else:
+            events = []
+            for instance in instances:
+                #Not to be logged again by the bulk_saved of the write.
+                instance._change_logged = True
+                events.append(ChangeEvent(model=label,
+                                          object_pk=unicode(instance.pk),
+                                          action=action))
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            batched = pending.setdefault(alias, [])
+            logged = set((event.model, event.object_pk, event.action)
+                         for event in batched)
+            batched.extend(event for event in events if (event.model,
+                           event.object_pk, event.action) not in logged)
+        elif events:
+            ChangeEvent.objects.db_manager(alias).bulk_create(events)
+
+    def saved(self, sender, instance, created, raw=False, using=None,
+              **kwargs):
+        if raw or not self.is_tracked(sender):
+            return
+        self.record(using, sender, [instance], ChangeEvent.CREATED if created
+                    else ChangeEvent.UPDATED)
+
+    def deleted(self, sender, instance, using=None, **kwargs):
+        if self.is_tracked(sender):
+            self.record(using, sender, [instance], ChangeEvent.DELETED)
+
+    def relation_changed(self, sender, instance, action, reverse, model,
+                         pk_set, using=None, **kwargs):
+        '''
+            Logs an update of the objects on both ends of the links.
+        '''
+        if action.startswith("pre_"):
+            return
+        if self.is_tracked(instance.__class__):
+            self.record(using, instance.__class__, [instance],
+                        ChangeEvent.UPDATED)
+        if self.is_tracked(model):
+            self.record(using, model, None if pk_set is None else
+                        [model(pk=pk) for pk in sorted(pk_set)],
+                        ChangeEvent.UPDATED)
+
+    def bulk_saved(self, sender, instances, created, using, **kwargs):
+        if not self.is_tracked(sender):
+            return
+        if instances is not None:
+            instances = [instance for instance in instances
+                         if not instance.__dict__.pop("_change_logged",
+                                                      False)]
+        self.record(using, sender, instances, ChangeEvent.CREATED if created
+                    else ChangeEvent.UPDATED)
+
+    def read(self, alias, since=0, limit=None, models=None):
+        '''
+            Returns the events of the database after the given sequence, in
+            order; of the given models only, when given.
+        '''
+        events = ChangeEvent.objects.using(alias).filter(
+                                            pk__gt=since).order_by("pk")
+        if models is not None:
+            events = events.filter(model__in=[get_label(model)
+                                              for model in models])
+        return list(events[:limit] if limit else events)
+
+    def is_pruned(self, alias, since):
+        '''
+            Returns if events after the given sequence have been pruned off
+            the database; the ids of the events have no gaps otherwise.
+        '''
+        first = ChangeEvent.objects.using(alias).order_by("pk").values_list(
+                                                        "pk", flat=True)[:1]
+        return bool(first) and first[0] > since + 1
+
+    def prune(self, alias, days):
+        '''
+            Deletes the events of the database older than the given days,
+            but for the last one, which keeps the sequence going; returns
+            how many were deleted.
+        '''
+        events = ChangeEvent.objects.using(alias)
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        last = events.aggregate(last=Max("pk"))["last"]
+        if last is None:
+            return 0
+        old = events.filter(created__lt=cutoff, pk__lt=last)
+        with transaction.commit_on_success(using=alias):
+            count = old.count()
+            #Deleted in one statement, rather than loaded to send signals.
+            old._raw_delete(using=alias)
+        return count
+
+
+#Changes of the models of the resources, followed through /v1/changes.
+CHANGES = ChangeLog()
+CHANGES.connect()
@@ -0,0 +1,140 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.core.urlresolvers import NoReverseMatch
+from django.db.models import AutoField, IntegerField
+from tastypie.bundle import Bundle
+from tastypie.exceptions import ApiFieldError
+
+#Stands in for the primary key while the detail URI gets reversed.
+PK_PLACEHOLDER = "0dualdbpk0"
+
+
+class RowBundle(Bundle):
+    '''
+        Bundle of the data dehydrated off a row; it has no object behind,
+        and skips the set up of a full bundle.
+    '''
+    def __init__(self, data, request):
+        self.obj = None
+        self.data = data
+        self.request = request
+        self.related_obj = None
+        self.related_name = None
+        self.errors = {}
+        self.objects_saved = set()
+
+
+class RowDehydrator(object):
+    '''
+        Dehydrates the lists of flat resources, the ones with no related
+        fields nor dehydrate hooks, straight off the rows of ``.values()``
+        rather than off model instances.
+
+        The function turning a row into the data of a bundle is compiled
+        once per resource and set of fields; it reads the columns, fills in
+        the defaults and converts the values the way the fields would. A
+        resource it can't compile is dehydrated the usual way.
+    '''
+    def __init__(self):
+        self.compiled = {}
+
+    def compile(self, resource, fields=None, for_list=False):
+        '''
+            Returns the columns to read and the function dehydrating a row
+            of them, for the given fields or all of them; None when the
+            resource has to be dehydrated off model instances.
+        '''
+        key = (type(resource), frozenset(fields) if fields else None,
+               for_list)
+        if key not in self.compiled:
+            self.compiled[key] = self.build(resource, fields, for_list)
+        return self.compiled[key]
+
+    def build(self, resource, fields, for_list):
+        if resource.has_dehydrate_hooks():
+            return None
+
+        model = resource._meta.object_class
+        local = dict((field.name, field) for field in model._meta.fields)
+        pk = model._meta.pk
+        use_in = ["all", "list" if for_list else "detail"]
+
+        #The fields are dehydrated in the same order as full_dehydrate
+        #does, as the XML follows the order of the data.
+        steps = []
+        columns = set([pk.attname])
+        for field_name in fields or resource.fields:
+            field_object = resource.fields[field_name]
+            field_use_in = getattr(field_object, "use_in", "all")
+            if callable(field_use_in):
+                return None
+            if field_use_in not in use_in:
+                continue
+            if field_name == "resource_uri":
+                uri = self.get_uri(resource, model)
+                if uri is None:
+                    return None
+                steps.append((field_name, pk.attname, uri, None))
+                continue
+
+            attribute = field_object.attribute
+            if getattr(field_object, "is_related", False) or \
+                    not isinstance(attribute, basestring) or \
+                    attribute not in local:
+                return None
+            column = local[attribute].attname
+            columns.add(column)
+            steps.append((field_name, column, field_object.convert,
+                          self.get_empty(field_object, attribute)))
+
+        def dehydrate(row):
+            data = {}
+            for field_name, column, convert, empty in steps:
+                value = row[column]
+                if value is None:
+                    data[field_name] = empty(row)
+                else:
+                    data[field_name] = convert(value)
+            return data
+        return sorted(columns), dehydrate
+
+    def get_empty(self, field_object, attribute):
+        '''
+            Returns the function giving the value of the field on a row
+            where its column is null, as the field would dehydrate it.
+        '''
+        def empty(row):
+            if field_object.has_default():
+                value = field_object._default
+                if callable(value):
+                    value = value()
+                return field_object.convert(value)
+            if field_object.null:
+                return field_object.convert(None)
+            raise ApiFieldError("The object '%r' has an empty attribute '%s' "
+                                "and doesn't allow a default or null value."
+                                % (row, attribute))
+        return empty
+
+    def get_uri(self, resource, model):
+        '''
+            Returns the function giving the detail URI of a primary key,
+            reversed once; None when the key doesn't make up the URI as is.
+        '''
+        if resource._meta.detail_uri_name != "pk" or \
+                not isinstance(model._meta.pk, (AutoField, IntegerField)):
+            return None
+        try:
+            uri = resource.get_resource_uri(Bundle(obj=model(
+                                                    pk=PK_PLACEHOLDER)))
+        except (NotImplementedError, NoReverseMatch):
+            uri = ""
+        if not uri:
+            return lambda pk: u""
+        if uri.count(PK_PLACEHOLDER) != 1:
+            return None
+        uri = uri.replace("{", "{{").replace("}", "}}")
+        return u"{0}".join(uri.split(PK_PLACEHOLDER)).format
@@ -0,0 +1,93 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connections, transaction
+from dualdb.core.instrumentation import activate, deactivate, get_stats
+from dualdb.core.replicas import pin, pinned, unpin_all
+
+#Threads running the queries of a request on several databases at once.
+DEFAULT_WORKERS = 8
+
+
+def can_scatter():
+    '''
+        Returns if queries can run on other threads; they get connections
+        of their own there, which see neither the writes left uncommitted
+        by the current thread nor its in-memory databases.
+    '''
+    for connection in connections.all():
+        if connection.settings_dict["NAME"] == ":memory:":
+            return False
+        if transaction.is_managed(using=connection.alias) and \
+                transaction.is_dirty(using=connection.alias):
+            return False
+    return True
+
+
+class Executor(object):
+    '''
+        Runs independent queries on several databases at once, in a pool of
+        threads holding one connection per database each; so that a request
+        spanning databases waits for the slowest of them instead of all of
+        them in turn.
+
+        The threads read off the databases the current request is pinned
+        on, see dualdb.core.replicas.pin, and record their queries into its
+        QueryStats. Queries are run in turn, on the current thread, when
+        there is a single one or when they could not see what the request
+        has written so far.
+    '''
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(settings, "SCATTER_WORKERS",
+                                          DEFAULT_WORKERS)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get_pool(self):
+        '''
+            Returns the thread pool, started on first use.
+        '''
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.workers)
+        return self._pool
+
+    def map(self, tasks):
+        '''
+            Runs the given (function, args) tasks, calling each function
+            with its args, and returns their results in order.
+        '''
+        tasks = list(tasks)
+        if len(tasks) < 2 or not can_scatter():
+            return [function(*args) for function, args in tasks]
+
+        databases = pinned()
+        stats = get_stats()
+
+        def run(task):
+            function, args = task
+            for db_name in databases:
+                pin(db_name)
+            activate(stats)
+            try:
+                return function(*args)
+            finally:
+                unpin_all()
+                deactivate()
+                #Hands the connections back to their pools between tasks.
+                for connection in connections.all():
+                    if connection.connection is not None:
+                        connection.close()
+
+        return self.get_pool().map(run, tasks)
+
+
+#Shared by the queries of all of the requests.
+EXECUTOR = Executor()
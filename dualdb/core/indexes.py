@@ -0,0 +1,207 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends import BaseDatabaseWrapper
+from django.db.backends.util import CursorDebugWrapper
+
+#Steps of a SQLite query plan reading a whole table.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS \w+)?$')
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+#Columns compared in a WHERE clause, as Django quotes them.
+CONDITION = re.compile(r'"(\w+)"\."(\w+)"\s*(=|IN\b|IS\b|>=|<=|>|<|LIKE\b|'
+                       r'BETWEEN\b)', re.IGNORECASE)
+ORDERING = re.compile(r'"(\w+)"\."(\w+)"\s*(?:ASC|DESC)', re.IGNORECASE)
+EQUALITY = ("=", "IN", "IS")
+
+
+class CapturingCursor(CursorDebugWrapper):
+    '''
+        Debug cursor handing the queries it runs, with their parameters,
+        over to an IndexAdvisor.
+    '''
+    def __init__(self, cursor, db, advisor):
+        super(CapturingCursor, self).__init__(cursor, db)
+        self.advisor = advisor
+
+    def execute(self, sql, params=()):
+        start = time.time()
+        try:
+            return super(CapturingCursor, self).execute(sql, params)
+        finally:
+            self.advisor.record(self.db.alias, sql, params,
+                                time.time() - start)
+
+
+class Suggestion(object):
+    '''
+        An index missing on a table, and the queries which would use it.
+    '''
+    def __init__(self, alias, table, columns):
+        self.alias = alias
+        self.table = table
+        self.columns = columns
+        self.queries = []
+
+    @property
+    def duration(self):
+        return sum(duration for sql, duration in self.queries)
+
+    @property
+    def name(self):
+        return "{0}_{1}_advised".format(self.table, "_".join(self.columns))
+
+    def get_sql(self):
+        quote_name = connections[self.alias].ops.quote_name
+        return "CREATE INDEX {0} ON {1} ({2})".format(quote_name(self.name),
+                    quote_name(self.table),
+                    ", ".join(quote_name(column) for column in self.columns))
+
+
+class IndexAdvisor(object):
+    '''
+        Tells the indexes the queries of a workload are missing.
+
+        The SELECTs run while capturing, on any thread, are noted down
+        along with their parameters when they take at least the threshold.
+        They are then explained on their database; a query reading a whole
+        table, or sorting its rows on the side, gets an index on the
+        columns it compares for equality, then on the first one it compares
+        by range or else on the ones it is ordered by. Indexes already
+        starting with those columns are left out.
+
+        Query plans are read the way SQLite writes them; the queries of
+        the other databases are left out.
+    '''
+    def __init__(self, threshold=0):
+        self.threshold = threshold
+        self.queries = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def capture(self):
+        '''
+            Notes down the slow queries run within the block.
+        '''
+        advisor = self
+        make_debug_cursor = BaseDatabaseWrapper.make_debug_cursor
+        debug = settings.DEBUG
+
+        def make_capturing_cursor(self, cursor):
+            return CapturingCursor(cursor, self, advisor)
+
+        BaseDatabaseWrapper.make_debug_cursor = make_capturing_cursor
+        #Debug cursors are used by the connections of all of the threads.
+        settings.DEBUG = True
+        try:
+            yield self
+        finally:
+            settings.DEBUG = debug
+            BaseDatabaseWrapper.make_debug_cursor = make_debug_cursor
+
+    def record(self, alias, sql, params, duration):
+        if duration < self.threshold or \
+                not sql.lstrip().upper().startswith("SELECT"):
+            return
+        with self._lock:
+            self.queries.append((alias, sql, tuple(params), duration))
+
+    def explain(self, alias, sql, params):
+        '''
+            Returns the steps of the plan of the query.
+        '''
+        cursor = connections[alias].cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+    def get_indexes(self, alias, table):
+        '''
+            Returns the columns of every index on the table.
+        '''
+        cursor = connections[alias].cursor()
+        quote_name = connections[alias].ops.quote_name
+        cursor.execute("PRAGMA index_list({0})".format(quote_name(table)))
+        indexes = []
+        for index in cursor.fetchall():
+            cursor.execute("PRAGMA index_info({0})".format(
+                                                    quote_name(index[1])))
+            indexes.append(tuple(column for _, _, column in
+                                 sorted(cursor.fetchall())))
+        return indexes
+
+    def get_columns(self, sql, table, sorted_aside):
+        '''
+            Returns the columns of the table an index on should start with,
+            for the given query; none when the query filters nothing on the
+            table and its rows were not sorted aside.
+        '''
+        where = re.split(r"\bORDER BY\b", sql.split(" WHERE ", 1)[-1])[0] \
+            if " WHERE " in sql else ""
+        equal = []
+        ranged = []
+        for name, column, operator in CONDITION.findall(where):
+            if name != table:
+                continue
+            columns = equal if operator.upper() in EQUALITY else ranged
+            if column not in columns:
+                columns.append(column)
+
+        ordered = []
+        if " ORDER BY " in sql:
+            for name, column in ORDERING.findall(sql.split(" ORDER BY ")[-1]):
+                if name == table and column not in ordered:
+                    ordered.append(column)
+
+        if not (equal or ranged or sorted_aside):
+            return ()
+        columns = list(equal)
+        for column in ranged[:1] or ordered:
+            if column not in columns:
+                columns.append(column)
+        return tuple(columns)
+
+    def advise(self):
+        '''
+            Returns the suggested indexes, the ones with the slowest queries
+            first.
+        '''
+        suggestions = {}
+        for alias, sql, params, duration in self.queries:
+            if connections[alias].vendor != "sqlite":
+                continue
+            plan = self.explain(alias, sql, params)
+            sorted_aside = TEMP_SORT in plan
+            tables = [match.group(1) for match in
+                      (FULL_SCAN.match(step) for step in plan) if match]
+            if sorted_aside and not tables:
+                tables = [name for name, _ in ORDERING.findall(
+                                            sql.split(" ORDER BY ")[-1])][:1]
+
+            for table in tables:
+                columns = self.get_columns(sql, table, sorted_aside)
+                if not columns or any(index[:len(columns)] == columns
+                            for index in self.get_indexes(alias, table)):
+                    continue
+                key = (alias, table, columns)
+                if key not in suggestions:
+                    suggestions[key] = Suggestion(alias, table, columns)
+                suggestions[key].queries.append((sql, duration))
+
+        return sorted(suggestions.values(), key=lambda suggestion:
+                      suggestion.duration, reverse=True)
+
+    def create(self, suggestion):
+        '''
+            Creates the suggested index.
+        '''
+        connections[suggestion.alias].cursor().execute(suggestion.get_sql())
+        transaction.commit_unless_managed(using=suggestion.alias)
@@ -0,0 +1,250 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import re
+import threading
+import time
+
+#Queries of the same shape sent this many times by a request are N+1.
+DEFAULT_N_PLUS_ONE_THRESHOLD = 3
+
+#IN lists only differ by the number of their parameters.
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+_local = threading.local()
+
+
+def get_stats():
+    '''
+        Returns the QueryStats of the request served by the thread, None
+        outside of requests.
+    '''
+    return getattr(_local, "stats", None)
+
+
+def activate(stats):
+    '''
+        Records the queries of the thread into the given QueryStats.
+    '''
+    _local.stats = stats
+
+
+def deactivate():
+    _local.stats = None
+
+
+def get_shape(sql):
+    '''
+        Returns what the queries sent with the given SQL have in common.
+    '''
+    return IN_LIST.sub("IN (...)", sql)
+
+
+class QueryStats(object):
+    '''
+        The queries one request sent to every database alias: how many,
+        the time they took and the rows they read or wrote, along with the
+        reads and writes ModelRouter routed there. Queries sent on behalf
+        of the request by other threads are recorded too.
+    '''
+    def __init__(self):
+        self.aliases = {}
+        self.shapes = {}
+        self._lock = threading.Lock()
+
+    def get_alias(self, alias):
+        '''
+            Returns the counters of the alias; called with the lock held.
+        '''
+        counters = self.aliases.get(alias)
+        if counters is None:
+            counters = self.aliases[alias] = dict.fromkeys(["queries", "rows",
+                                                "reads", "writes"], 0)
+            counters["time"] = 0.0
+        return counters
+
+    def route(self, alias, kind):
+        '''
+            Counts a read or a write routed to the alias.
+        '''
+        with self._lock:
+            self.get_alias(alias)[kind] += 1
+
+    def query(self, alias, sql, seconds, rows=0):
+        with self._lock:
+            counters = self.get_alias(alias)
+            counters["queries"] += 1
+            counters["time"] += seconds
+            counters["rows"] += rows
+            key = (alias, get_shape(sql))
+            self.shapes[key] = self.shapes.get(key, 0) + 1
+
+    def fetched(self, alias, rows):
+        with self._lock:
+            self.get_alias(alias)["rows"] += rows
+
+    def get_n_plus_one(self, threshold=DEFAULT_N_PLUS_ONE_THRESHOLD):
+        '''
+            Returns the (alias, shape, count) of the queries sent at least
+            ``threshold`` times, the most repeated first.
+        '''
+        with self._lock:
+            repeated = [(alias, shape, count) for (alias, shape), count in
+                        self.shapes.items() if count >= threshold]
+        return sorted(repeated, key=lambda item: (-item[2], item[0]))
+
+    def get_header(self, threshold=DEFAULT_N_PLUS_ONE_THRESHOLD):
+        '''
+            Returns the counters as the value of a response header.
+        '''
+        n_plus_one = {}
+        for alias, _, count in self.get_n_plus_one(threshold):
+            n_plus_one[alias] = n_plus_one.get(alias, 0) + 1
+        with self._lock:
+            return ", ".join("{0}; queries={1}; time={2:.2f}ms; rows={3}; "
+                             "reads={4}; writes={5}; n_plus_one={6}".format(
+                                alias, counters["queries"],
+                                counters["time"] * 1000, counters["rows"],
+                                counters["reads"], counters["writes"],
+                                n_plus_one.get(alias, 0))
+                             for alias, counters in
+                             sorted(self.aliases.items()))
+
+
+class InstrumentedCursor(object):
+    '''
+        Cursor recording the queries it sends, and the rows they read or
+        wrote, into the QueryStats of the request.
+    '''
+    def __init__(self, cursor, alias, stats):
+        self.cursor = cursor
+        self.alias = alias
+        self.stats = stats
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.stats.fetched(self.alias, 1)
+            yield row
+
+    def _run(self, method, sql, params):
+        start = time.time()
+        try:
+            return method(sql, params)
+        finally:
+            rowcount = getattr(self.cursor, "rowcount", -1)
+            #Reads are counted as they get fetched.
+            self.stats.query(self.alias, sql, time.time() - start,
+                             rowcount if rowcount > 0 else 0)
+
+    def execute(self, sql, params=()):
+        return self._run(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._run(self.cursor.executemany, sql, param_list)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.stats.fetched(self.alias, 1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self.cursor.fetchmany(*args)
+        self.stats.fetched(self.alias, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.stats.fetched(self.alias, len(rows))
+        return rows
+
+
+class MetricsRegistry(object):
+    '''
+        Counters kept by the process across requests, labelled by database
+        alias; rendered in the Prometheus text format for scraping.
+    '''
+    #Name, type and help of every metric, in the order they are rendered.
+    METRICS = [
+        ("dualdb_requests_total", "counter", "Requests served."),
+        ("dualdb_queries_total", "counter", "Queries sent."),
+        ("dualdb_query_seconds_total", "counter", "Seconds spent in queries."),
+        ("dualdb_rows_total", "counter", "Rows read or written."),
+        ("dualdb_routed_reads_total", "counter", "Reads routed."),
+        ("dualdb_routed_writes_total", "counter", "Writes routed."),
+        ("dualdb_n_plus_one_total", "counter",
+         "Query shapes repeated within a request."),
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.values = {}
+
+    def add(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def get(self, name, **labels):
+        return self.values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, stats, threshold=DEFAULT_N_PLUS_ONE_THRESHOLD):
+        '''
+            Adds the counters of a served request.
+        '''
+        self.add("dualdb_requests_total", 1)
+        for alias, counters in stats.aliases.items():
+            self.add("dualdb_queries_total", counters["queries"], alias=alias)
+            self.add("dualdb_query_seconds_total", counters["time"],
+                     alias=alias)
+            self.add("dualdb_rows_total", counters["rows"], alias=alias)
+            self.add("dualdb_routed_reads_total", counters["reads"],
+                     alias=alias)
+            self.add("dualdb_routed_writes_total", counters["writes"],
+                     alias=alias)
+        for alias, _, _ in stats.get_n_plus_one(threshold):
+            self.add("dualdb_n_plus_one_total", 1, alias=alias)
+
+    def render(self, gauges=()):
+        '''
+            Returns the counters, followed by the given (name, help, labels,
+            value) gauges, in the Prometheus text format.
+        '''
+        with self._lock:
+            values = sorted(self.values.items())
+        lines = []
+        for name, kind, help_text in self.METRICS:
+            lines.append("# HELP {0} {1}".format(name, help_text))
+            lines.append("# TYPE {0} {1}".format(name, kind))
+            lines.extend(format_sample(name, labels, value)
+                         for (key, labels), value in values if key == name)
+
+        described = set()
+        for name, help_text, labels, value in sorted(gauges):
+            if name not in described:
+                described.add(name)
+                lines.append("# HELP {0} {1}".format(name, help_text))
+                lines.append("# TYPE {0} gauge".format(name))
+            lines.append(format_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def format_sample(name, labels, value):
+    if labels:
+        name += "{{{0}}}".format(",".join('{0}="{1}"'.format(label, text)
+                                          for label, text in labels))
+    return "{0} {1}".format(name, repr(float(value)) if
+                            isinstance(value, float) else value)
+
+
+#Shared by all of the requests served by the process.
+METRICS = MetricsRegistry()
@@ -0,0 +1,73 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import prefetch_related_objects
+from dualdb.core.executor import EXECUTOR
+
+
+class RelationLoader(object):
+    '''
+        Loads the related objects of a whole page of rows in batches, so
+        that dehydrating the related fields of a resource does not cost a
+        query per row.
+
+        Rows are grouped by the database they were read from; ModelRouter
+        routes each group to the database of its related objects, so every
+        relation costs one IN query per target database. The queries of
+        the groups and relations are independent and run at once, see
+        Executor.
+    '''
+    def get_relations(self, resource, fields=None):
+        '''
+            Returns the names of the model relations behind the related
+            fields of the resource which can be loaded in batches; of the
+            given fields only, when given.
+        '''
+        model = resource._meta.object_class
+        relations = []
+
+        for field_name, field_object in resource.fields.items():
+            if fields is not None and field_name not in fields:
+                continue
+            if not getattr(field_object, "is_related", False):
+                continue
+
+            attribute = field_object.attribute
+            if not isinstance(attribute, basestring) or "__" in attribute:
+                continue
+
+            try:
+                field, _, direct, _ = model._meta.get_field_by_name(attribute)
+            except FieldDoesNotExist:
+                continue
+
+            if direct and field.rel is not None:
+                relations.append(attribute)
+
+        return relations
+
+    def load(self, resource, objects, fields=None):
+        '''
+            Loads the related objects for the given rows of the resource;
+            the ones of the given fields only, when given.
+        '''
+        relations = self.get_relations(resource, fields)
+        if not relations or not objects:
+            return objects
+
+        groups = {}
+        for obj in objects:
+            groups.setdefault(obj._state.db, []).append(obj)
+
+        for obj in objects:
+            #Shared by the relations, set up before they get loaded at once.
+            if not hasattr(obj, "_prefetched_objects_cache"):
+                obj._prefetched_objects_cache = {}
+
+        EXECUTOR.map((prefetch_related_objects, (group, [relation]))
+                     for group in groups.values() for relation in relations)
+
+        return objects
@@ -0,0 +1,54 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.test.client import Client
+from dualdb.core.indexes import IndexAdvisor
+from dualdb.core.management.commands.benchmark_router import URIS
+
+#The filtered lists, on top of the URIs of the other benchmarks.
+FILTERED_URIS = ["/v1/orders?customer=1", "/v1/orders?date__gte=2014-01-01",
+                 "/v1/products?title=product1", "/v1/products?price__lt=100",
+                 "/v1/products?title__startswith=product&price__gte=10"]
+
+
+class Command(BaseCommand):
+    '''
+        Serves a workload of API requests off the configured databases,
+        capturing the slow queries every alias runs, and reports the
+        indexes they are missing; creates them when asked to.
+    '''
+    help = "Suggests, or creates, the indexes the API queries are missing."
+    option_list = BaseCommand.option_list + (
+        make_option("--uri", action="append", dest="uris",
+                    help="URI to request, repeat for several."),
+        make_option("--threshold", type="float", default=0,
+                    help="Milliseconds from which a query is slow."),
+        make_option("--create", action="store_true", default=False,
+                    help="Create the suggested indexes."),
+    )
+
+    def handle(self, *args, **options):
+        advisor = IndexAdvisor(options["threshold"] / 1000)
+        client = Client()
+        with advisor.capture():
+            for uri in options["uris"] or URIS + FILTERED_URIS:
+                #The query string of the URI is dropped when given data.
+                client.get(uri + ("&" if "?" in uri else "?") +
+                           "format=json")
+
+        suggestions = advisor.advise()
+        if not suggestions:
+            self.stdout.write("No index is missing.")
+        for suggestion in suggestions:
+            self.stdout.write("{0:<14} {1};  {2} quer(ies), {3:.1f} ms".format(
+                        suggestion.alias, suggestion.get_sql(),
+                        len(suggestion.queries), suggestion.duration * 1000))
+            if options["create"]:
+                advisor.create(suggestion)
+                self.stdout.write("{0:<14} Created {1}.".format(
+                                        suggestion.alias, suggestion.name))
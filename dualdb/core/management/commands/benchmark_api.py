@@ -0,0 +1,294 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import datetime
+import json
+import os
+import random
+import subprocess
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.test.client import Client
+from django.test.simple import DjangoTestSuiteRunner
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+from dualdb.core.management.commands.load_test import percentile
+from dualdb.core.models import Customer, Order, Product, Supplier
+from dualdb.core.shards import SHARDS, next_ids
+from dualdb.core.summaries import SUMMARIES
+
+#Rows inserted per bulk_create.
+BATCH_SIZE = 5000
+
+
+def get_commit():
+    '''
+        Returns the commit the project is checked out at, None outside of
+        a git checkout.
+    '''
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(["git", "describe", "--always",
+                                            "--dirty"],
+                                           cwd=settings.PROJECT_DIR,
+                                           stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_ids(model, count):
+    '''
+        Returns primary keys for new rows of the model; allocated off the
+        shard sequence when it is spread over several shards.
+    '''
+    shard_set = SHARDS.get(model)
+    if shard_set is not None and len(shard_set) > 1:
+        return next_ids(model, count)
+    return range(1, count + 1)
+
+
+def insert(model, objects):
+    '''
+        Bulk creates the objects in the databases they are routed to.
+    '''
+    by_alias = {}
+    for obj in objects:
+        alias = router.db_for_write(model, instance=obj)
+        by_alias.setdefault(alias, []).append(obj)
+    for alias, rows in by_alias.items():
+        with transaction.commit_on_success(using=alias):
+            for start in xrange(0, len(rows), BATCH_SIZE):
+                model._default_manager.db_manager(alias).bulk_create(
+                                            rows[start:start + BATCH_SIZE])
+
+
+class Command(BaseCommand):
+    '''
+        Builds a synthetic dataset over the three databases and measures
+        the throughput and the p50/p99 latencies of the list, detail,
+        filtered and write calls of every resource.
+
+        The results are appended, along with the commit and the dataset
+        sizes, to the --output file, and compared with the last ones of
+        another commit. The calls are served in process, one at a time;
+        load_test puts the servers under concurrent load instead. GETs
+        carry a query parameter of their own so that they are not served
+        off the response cache.
+    '''
+    help = "Benchmarks the calls of every resource on synthetic data."
+    option_list = BaseCommand.option_list + (
+        make_option("--orders", type="int", default=10000,
+                    help="Orders to create, from 10k up to 1M."),
+        make_option("--customers", type="int", default=1000,
+                    help="Customers to spread the orders over."),
+        make_option("--products", type="int", default=1000,
+                    help="Products to create."),
+        make_option("--suppliers", type="int", default=100,
+                    help="Suppliers to create."),
+        make_option("--links", type="int", default=3,
+                    help="Suppliers linked to every product."),
+        make_option("--requests", type="int", default=200,
+                    help="Calls measured per scenario."),
+        make_option("--output", default=os.path.join(settings.PROJECT_DIR,
+                                                "benchmarks", "api.jsonl"),
+                    help="File the results are appended to."),
+        make_option("--baseline", default=None,
+                    help="Commit to compare with, the last other one by "
+                         "default."),
+    )
+
+    def handle(self, *args, **options):
+        sizes = dict((name, options[name]) for name in ("orders",
+                     "customers", "products", "suppliers", "links"))
+        setup_test_environment()
+        runner = DjangoTestSuiteRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            started = time.time()
+            self.build_dataset(sizes)
+            self.stdout.write("Built the dataset in {0:.1f} s.".format(
+                                                    time.time() - started))
+            results = self.run_scenarios(sizes, options["requests"])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        run = {"commit": get_commit(), "sizes": sizes,
+               "date": datetime.datetime.utcnow().isoformat(),
+               "results": results}
+        baseline = self.get_baseline(options["output"], run["commit"],
+                                     options["baseline"])
+        self.report(results, baseline)
+        self.save(options["output"], run)
+
+    def build_dataset(self, sizes):
+        '''
+            Creates the customers, orders, suppliers, products and links
+            between products and suppliers, in the databases they are
+            routed to; then summarizes the orders.
+        '''
+        self.customer_ids = list(get_ids(Customer, sizes["customers"]))
+        insert(Customer, [Customer(id=pk, username="customer{0}".format(pk),
+                                   email="customer{0}@orders.com".format(pk))
+                          for pk in self.customer_ids])
+
+        start = datetime.date(2014, 1, 1)
+        insert(Order, [Order(id=pk, amount=round(random.uniform(1, 500), 2),
+                             date=start + datetime.timedelta(
+                                                    random.randint(0, 730)),
+                             customer_id=random.choice(self.customer_ids))
+                       for pk in get_ids(Order, sizes["orders"])])
+
+        insert(Supplier, [Supplier(id=pk, username="supplier{0}".format(pk),
+                                   email="supplier{0}@products.com".format(pk))
+                          for pk in xrange(1, sizes["suppliers"] + 1)])
+        insert(Product, [Product(id=pk, title="product{0}".format(pk),
+                                 price=round(random.uniform(1, 1000), 2),
+                                 stock=random.randint(0, 100))
+                         for pk in xrange(1, sizes["products"] + 1)])
+        links = Product.suppliers.through
+        insert(links, [links(product_id=pk, supplier_id=supplier_id)
+                       for pk in xrange(1, sizes["products"] + 1)
+                       for supplier_id in random.sample(
+                            xrange(1, sizes["suppliers"] + 1),
+                            min(sizes["links"], sizes["suppliers"]))])
+
+        for summaries in SUMMARIES.values():
+            summaries.rebuild()
+
+    def get_scenarios(self, sizes):
+        '''
+            Returns the (name, method, function returning the URI and the
+            data of a call) of every scenario.
+        '''
+        def pick(count):
+            return random.randint(1, count)
+
+        def page(count):
+            return {"offset": random.randint(0, max(count - 20, 0))}
+
+        customer_ids = self.customer_ids
+        counter = iter(xrange(1, 1 << 62))
+
+        return [
+            ("customers list", "get",
+             lambda: ("/v1/customers", page(sizes["customers"]))),
+            ("customers detail", "get", lambda: ("/v1/customers/{0}".format(
+                                    random.choice(customer_ids)), {})),
+            ("customers write", "post", lambda: ("/v1/customers", {
+                "username": "new{0}".format(next(counter)),
+                "email": "new@orders.com"})),
+
+            ("orders list", "get", lambda: ("/v1/orders", {})),
+            ("orders detail", "get", lambda: ("/v1/orders/{0}".format(
+                                    pick(sizes["orders"])), {})),
+            ("orders filtered", "get", lambda: ("/v1/orders", {
+                "customer": random.choice(customer_ids),
+                "date__gte": "2015-01-01"})),
+            ("orders write", "post", lambda: ("/v1/orders", {
+                "amount": 10.5, "date": "2014-04-08",
+                "customer": "/v1/customers/{0}".format(
+                                    random.choice(customer_ids))})),
+
+            ("order_summaries list", "get",
+             lambda: ("/v1/order_summaries", page(sizes["customers"]))),
+            ("order_summaries detail", "get",
+             lambda: ("/v1/order_summaries/{0}".format(
+                                    random.choice(customer_ids)), {})),
+
+            ("suppliers list", "get",
+             lambda: ("/v1/suppliers", page(sizes["suppliers"]))),
+            ("suppliers detail", "get", lambda: ("/v1/suppliers/{0}".format(
+                                    pick(sizes["suppliers"])), {})),
+            ("suppliers write", "post", lambda: ("/v1/suppliers", {
+                "username": "new{0}".format(next(counter)),
+                "email": "new@products.com"})),
+
+            ("products list", "get",
+             lambda: ("/v1/products", page(sizes["products"]))),
+            ("products detail", "get", lambda: ("/v1/products/{0}".format(
+                                    pick(sizes["products"])), {})),
+            ("products filtered", "get", lambda: ("/v1/products", {
+                "price__lt": random.randint(1, 1000)})),
+            ("products write", "post", lambda: ("/v1/products", {
+                "title": "new", "price": 9.5, "stock": 3,
+                "suppliers": ["/v1/suppliers/{0}".format(
+                                    pick(sizes["suppliers"]))]})),
+        ]
+
+    def run_scenarios(self, sizes, requests):
+        '''
+            Sends the calls of every scenario; returns their throughput,
+            latencies and failures by scenario.
+        '''
+        client = Client()
+        results = {}
+        for name, method, make_call in self.get_scenarios(sizes):
+            latencies = []
+            failures = 0
+            for index in xrange(requests):
+                uri, data = make_call()
+                started = time.time()
+                if method == "get":
+                    #Every call misses the response cache.
+                    data = dict(data, format="json", _=index)
+                    response = client.get(uri, data)
+                else:
+                    response = client.post(uri, json.dumps(data),
+                                           content_type="application/json")
+                latencies.append(time.time() - started)
+                if response.status_code >= 400:
+                    failures += 1
+
+            elapsed = sum(latencies)
+            latencies.sort()
+            results[name] = {"rps": len(latencies) / elapsed,
+                             "p50": percentile(latencies, 0.5) * 1000,
+                             "p99": percentile(latencies, 0.99) * 1000,
+                             "failures": failures}
+        return results
+
+    def get_baseline(self, path, commit, baseline):
+        '''
+            Returns the last run stored for the baseline commit, or for
+            any other commit than the current one.
+        '''
+        if not os.path.exists(path):
+            return None
+        found = None
+        with open(path) as runs:
+            for line in runs:
+                run = json.loads(line)
+                if (baseline and run["commit"] == baseline) or \
+                        (not baseline and run["commit"] != commit):
+                    found = run
+        return found
+
+    def report(self, results, baseline):
+        if baseline is not None:
+            self.stdout.write("Compared with {0} of {1}.".format(
+                              baseline["commit"], baseline["date"]))
+        for name, result in sorted(results.items()):
+            line = "{0:<24} {1:>8.1f} req/s  p50 {2:>7.2f} ms  p99 {3:>7.2f} " \
+                "ms  {4} failure(s)".format(name, result["rps"],
+                                            result["p50"], result["p99"],
+                                            result["failures"])
+            before = (baseline or {}).get("results", {}).get(name)
+            if before:
+                line += "  req/s {0:+.0%}  p50 {1:+.0%}".format(
+                            result["rps"] / before["rps"] - 1,
+                            result["p50"] / before["p50"] - 1)
+            self.stdout.write(line)
+
+    def save(self, path, run):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "a") as runs:
+            runs.write(json.dumps(run, sort_keys=True) + "\n")
+        self.stdout.write("Results appended to {0}.".format(path))
@@ -0,0 +1,164 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.client import Client
+from django.test.simple import DjangoTestSuiteRunner
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+from dualdb.core.management.commands import benchmark_api
+from dualdb.core.management.commands.load_test import percentile
+from dualdb.core.pool import POOLS
+
+
+def close_pools():
+    '''
+        Gives the connections of the thread back, then closes all of the
+        pooled ones.
+    '''
+    for connection in connections.all():
+        connection.close()
+    for alias in list(POOLS):
+        POOLS.pop(alias).close_all()
+
+
+class Command(benchmark_api.Command):
+    '''
+        Puts a mix of v1 reads and writes, from concurrent clients, on
+        database files tuned by their PRAGMAS and on the same files left
+        with the pragmas SQLite defaults to; reports the throughput, the
+        latencies and the failed calls of both.
+
+        The files are created in a temporary directory and filled with a
+        synthetic dataset, see benchmark_api.
+    '''
+    help = "Compares the tuned SQLite pragmas with the default ones."
+    option_list = BaseCommand.option_list + tuple(option for option in
+        benchmark_api.Command.option_list if option.dest in ("orders",
+        "customers", "products", "suppliers", "links")) + (
+        make_option("--clients", type="int", default=8,
+                    help="Concurrent clients."),
+        make_option("--requests", type="int", default=100,
+                    help="Calls sent by each client."),
+        make_option("--writes", type="float", default=0.2,
+                    help="Share of the calls writing."),
+    )
+
+    def handle(self, *args, **options):
+        sizes = dict((name, options[name]) for name in ("orders",
+                     "customers", "products", "suppliers", "links"))
+        results = []
+        setup_test_environment()
+        try:
+            for profile in ("default", "tuned"):
+                results.append((profile, self.run_profile(profile, sizes,
+                                                          options)))
+        finally:
+            teardown_test_environment()
+
+        for profile, (elapsed, latencies, failures) in results:
+            self.stdout.write("{0:<8} {1:>8.1f} req/s  p50 {2:>7.2f} ms  p99 "
+                              "{3:>7.2f} ms  {4} failure(s)".format(profile,
+                              len(latencies) / elapsed,
+                              percentile(latencies, 0.5) * 1000,
+                              percentile(latencies, 0.99) * 1000, failures))
+        (_, (default_elapsed, _, _)), (_, (tuned_elapsed, _, _)) = results
+        self.stdout.write("Tuned pragmas: {0:+.0%} throughput.".format(
+                                        default_elapsed / tuned_elapsed - 1))
+
+    def run_profile(self, profile, sizes, options):
+        '''
+            Builds the dataset into database files with the pragmas of the
+            profile, and puts the load on them.
+        '''
+        directory = tempfile.mkdtemp(prefix="dualdb-pragmas-")
+        saved = {}
+        for alias in connections:
+            settings_dict = connections[alias].settings_dict
+            saved[alias] = (settings_dict.get("TEST_NAME"),
+                            settings_dict.get("PRAGMAS"))
+            settings_dict["TEST_NAME"] = "{0}/{1}.db".format(directory, alias)
+            if profile == "default":
+                settings_dict["PRAGMAS"] = {}
+        close_pools()
+
+        runner = DjangoTestSuiteRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            #Connections opened by syncdb with the names of before.
+            close_pools()
+            self.build_dataset(sizes)
+            close_pools()
+            return self.load(sizes, options)
+        finally:
+            close_pools()
+            runner.teardown_databases(old_config)
+            for alias, (test_name, pragmas) in saved.items():
+                settings_dict = connections[alias].settings_dict
+                settings_dict["TEST_NAME"] = test_name
+                settings_dict["PRAGMAS"] = pragmas
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def load(self, sizes, options):
+        '''
+            Runs the clients at once; returns the seconds they took, their
+            latencies and how many of their calls failed.
+        '''
+        scenarios = dict((name, (method, make_call)) for name, method,
+                         make_call in self.get_scenarios(sizes))
+        reads = [scenarios[name] for name in ("customers list",
+                 "orders detail", "orders filtered", "order_summaries detail",
+                 "products list", "products detail")]
+        writes = [scenarios[name] for name in ("customers write",
+                  "orders write", "products write")]
+
+        latencies = []
+        failures = []
+
+        def client(seed):
+            calls = random.Random(seed)
+            api_client = Client()
+            try:
+                for index in xrange(options["requests"]):
+                    method, make_call = calls.choice(
+                        writes if calls.random() < options["writes"] else
+                        reads)
+                    uri, data = make_call()
+                    started = time.time()
+                    try:
+                        if method == "get":
+                            response = api_client.get(uri, dict(data,
+                                    format="json", _="{0}-{1}".format(seed,
+                                                                      index)))
+                        else:
+                            response = api_client.post(uri, json.dumps(data),
+                                        content_type="application/json")
+                        if response.status_code >= 400:
+                            failures.append(response.status_code)
+                    #Like database is locked, raised by the test client.
+                    except Exception, e:
+                        failures.append(e)
+                    latencies.append(time.time() - started)
+            finally:
+                for connection in connections.all():
+                    connection.close()
+
+        threads = [threading.Thread(target=client, args=(seed,))
+                   for seed in xrange(options["clients"])]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.time() - started, sorted(latencies), len(failures)
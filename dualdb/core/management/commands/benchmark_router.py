@@ -0,0 +1,125 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import time
+from optparse import make_option
+
+from django.core import signals
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, router, reset_queries
+from django.db.models.loading import get_models
+from django.test.client import Client
+from django.test.simple import DjangoTestSuiteRunner
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+from dualdb.core.routers import ModelRouter
+
+FIXTURES = ["customers.json", "orders.json", "suppliers.json",
+            "products.json"]
+
+URIS = ["/v1/customers", "/v1/orders", "/v1/suppliers", "/v1/products",
+        "/v1/orders/1", "/v1/products/1"]
+
+
+class CountingRouter(object):
+    '''
+        Wraps a router to count the calls Django makes into it.
+    '''
+    def __init__(self, router):
+        self.router = router
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.router, name)
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return method(*args, **kwargs)
+        return counted
+
+
+class Command(BaseCommand):
+    '''
+        Reports the time ModelRouter adds to every query, so regressions
+        in routing show up.
+    '''
+    help = "Reports the overhead ModelRouter adds to every query."
+    option_list = BaseCommand.option_list + (
+        make_option("--iterations", type="int", default=100000,
+                    help="Router calls to time per method."),
+        make_option("--requests", type="int", default=50,
+                    help="Rounds of API requests to measure calls/query."),
+    )
+
+    def handle(self, *args, **options):
+        per_call = self.time_calls(options["iterations"])
+        for name, seconds in sorted(per_call.items()):
+            self.stdout.write("{0:<14} {1:>8.0f} ns/call".format(
+                                                    name, seconds * 1e9))
+
+        calls, queries = self.count_calls(options["requests"])
+        mean_call = sum(per_call.values()) / len(per_call)
+        self.stdout.write("{0} router calls for {1} queries, {2:.2f} calls "
+                          "per query".format(calls, queries,
+                                             float(calls) / queries))
+        self.stdout.write("Router overhead: {0:.0f} ns per query".format(
+                                    mean_call * 1e9 * calls / queries))
+
+    def time_calls(self, iterations):
+        '''
+            Times each router method over all of the installed models.
+        '''
+        model_router = ModelRouter()
+        models = get_models(include_auto_created=True)
+        instances = [model() for model in models]
+        calls = {
+            "db_for_read": lambda i: model_router.db_for_read(models[i]),
+            "db_for_write": lambda i: model_router.db_for_write(models[i],
+                                                    instance=instances[i]),
+            "allow_syncdb": lambda i: model_router.allow_syncdb(
+                                                    "inventory", models[i]),
+        }
+
+        per_call = {}
+        for name, call in calls.items():
+            start = time.time()
+            for iteration in xrange(iterations):
+                call(iteration % len(models))
+            per_call[name] = (time.time() - start) / iterations
+        return per_call
+
+    def count_calls(self, rounds):
+        '''
+            Serves API requests off test databases, counting the queries
+            and the router calls they take.
+        '''
+        setup_test_environment()
+        runner = DjangoTestSuiteRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        routers = router.routers
+        try:
+            for alias in connections:
+                call_command("loaddata", *FIXTURES, verbosity=0,
+                             database=alias)
+                connections[alias].use_debug_cursor = True
+
+            #Keep the queries of all the requests around to count them.
+            signals.request_started.disconnect(reset_queries)
+            counting = CountingRouter(routers[0])
+            router.routers = [counting] + routers[1:]
+            client = Client()
+            for _ in xrange(rounds):
+                for uri in URIS:
+                    client.get(uri, {"format": "json"})
+
+            queries = sum(len(connections[alias].queries)
+                          for alias in connections)
+            return counting.calls, max(queries, 1)
+        finally:
+            router.routers = routers
+            signals.request_started.connect(reset_queries)
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
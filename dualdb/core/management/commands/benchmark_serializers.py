@@ -0,0 +1,100 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import time
+from optparse import make_option
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.client import RequestFactory
+from django.test.simple import DjangoTestSuiteRunner
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+from tastypie.serializers import Serializer
+from dualdb.core.management.commands.benchmark_router import FIXTURES
+from dualdb.core.serializers import FastSerializer
+from dualdb.core.streaming import get_meta
+
+
+class Command(BaseCommand):
+    '''
+        Times tastypie's serializer against FastSerializer on the list
+        responses of every resource, checking they write the same bytes.
+    '''
+    help = "Compares the serializers on the lists of every resource."
+    option_list = BaseCommand.option_list + (
+        make_option("--rows", type="int", default=1000,
+                    help="Rows per list, the fixtures are repeated."),
+        make_option("--rounds", type="int", default=10,
+                    help="Times each list is serialized."),
+    )
+
+    def handle(self, *args, **options):
+        from dualdb.urls import V1_API
+
+        setup_test_environment()
+        runner = DjangoTestSuiteRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            for alias in connections:
+                call_command("loaddata", *FIXTURES, verbosity=0,
+                             database=alias)
+
+            serializers = [("tastypie", Serializer()),
+                           ("fast", FastSerializer())]
+            for name, resource in sorted(V1_API._registry.items()):
+                data = self.get_list(resource, options["rows"])
+                if data is None:
+                    continue
+                for fmt in ("json", "xml"):
+                    timings = self.time(serializers, fmt, data,
+                                        options["rounds"])
+                    self.stdout.write("{0:<16} {1:<4} {2}".format(name, fmt,
+                                      "  ".join("{0} {1:>7.1f} ms".format(
+                                            serializer, seconds * 1000)
+                                            for serializer, seconds in
+                                            timings)))
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def get_list(self, resource, rows):
+        '''
+            Returns the data of a list response of the resource, holding
+            the given number of dehydrated rows.
+        '''
+        request = RequestFactory().get("/")
+        objects = list(resource.get_object_list(request))
+        if not objects:
+            return None
+        bundles = [resource.full_dehydrate(resource.build_bundle(obj=obj,
+                                                            request=request))
+                   for obj in objects]
+        bundles = (bundles * (rows // len(bundles) + 1))[:rows]
+        return {resource._meta.collection_name: bundles,
+                "meta": get_meta(len(bundles))}
+
+    def time(self, serializers, fmt, data, rounds):
+        '''
+            Returns the mean seconds each serializer takes on the data;
+            fails when they do not write the same.
+        '''
+        timings = []
+        outputs = set()
+        for name, serializer in serializers:
+            method = getattr(serializer, "to_" + fmt)
+            started = time.time()
+            for _ in xrange(rounds):
+                output = method(data, {})
+            timings.append((name, (time.time() - started) / rounds))
+            if isinstance(output, unicode):
+                output = output.encode("utf-8")
+            outputs.add(output)
+
+        if len(outputs) != 1:
+            raise CommandError("The serializers wrote different {0}.".format(
+                                                                    fmt))
+        return timings
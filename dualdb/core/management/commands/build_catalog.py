@@ -0,0 +1,27 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    '''
+        Builds the snapshot files the resources with a catalog serve their
+        plain reads off; they get rebuilt on their own after writes, this
+        builds the first ones, or ones wiped out.
+    '''
+    help = "Builds the snapshot files of the catalogued resources."
+
+    def handle(self, *args, **options):
+        from dualdb.urls import V1_API
+
+        for name, resource in sorted(V1_API._registry.items()):
+            catalog = resource._meta.catalog
+            if catalog is None:
+                continue
+            snapshot = catalog.build(resource)
+            self.stdout.write("Built {0}: {1} record(s).".format(
+                                catalog.path, len(snapshot) if snapshot
+                                else 0))
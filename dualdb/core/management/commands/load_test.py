@@ -0,0 +1,145 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import httplib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from dualdb.core.management.commands.benchmark_router import URIS
+
+#Seconds a server is given to start listening.
+START_TIMEOUT = 30
+
+
+def wait_for(host, port, process):
+    '''
+        Waits for the server process to listen on the given port.
+    '''
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise CommandError("The server exited with {0}.".format(
+                                                        process.returncode))
+        try:
+            socket.create_connection((host, port), 1).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise CommandError("The server did not start listening on {0}.".format(
+                                                                    port))
+
+
+def client(host, port, uris, requests, latencies, errors):
+    '''
+        Sends the requests over one connection, kept alive as long as the
+        server lets it, noting down the latency of each.
+    '''
+    connection = httplib.HTTPConnection(host, port, timeout=60)
+    for index in xrange(requests):
+        started = time.time()
+        try:
+            connection.request("GET", uris[index % len(uris)],
+                               headers={"Connection": "keep-alive",
+                                        "Accept": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+            if response.will_close:
+                connection.close()
+        except (socket.error, httplib.HTTPException), e:
+            errors.append(e)
+            connection.close()
+        latencies.append(time.time() - started)
+    connection.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    '''
+        Puts the same load on the API served off the WSGI path, through
+        runserver, and off the event loop of serve_evented; reports the
+        throughput and the latencies of both.
+
+        Both servers use the configured databases, which should be synced
+        and loaded with data.
+    '''
+    help = "Compares the WSGI and the evented servers under load."
+    option_list = BaseCommand.option_list + (
+        make_option("--clients", type="int", default=50,
+                    help="Concurrent clients."),
+        make_option("--requests", type="int", default=20,
+                    help="Requests sent by each client."),
+        make_option("--processes", type="int", default=2,
+                    help="Processes of the evented server."),
+        make_option("--port", type="int", default=8901,
+                    help="Port of the first server, the next one gets +1."),
+        make_option("--target", choices=["both", "wsgi", "evented"],
+                    default="both", help="Servers to put under load."),
+        make_option("--uri", action="append", dest="uris",
+                    help="URI to request, repeat for several."),
+    )
+
+    def handle(self, *args, **options):
+        uris = [uri + "/?format=json" for uri in options["uris"] or URIS]
+        host = "127.0.0.1"
+        servers = []
+        if options["target"] in ("both", "wsgi"):
+            servers.append(("wsgi", ["runserver", "--noreload"]))
+        if options["target"] in ("both", "evented"):
+            servers.append(("evented", ["serve_evented", "--processes",
+                                        str(options["processes"])]))
+
+        devnull = open(os.devnull, "w")
+        for index, (name, command) in enumerate(servers):
+            port = options["port"] + index
+            #The request logs of the servers are left out.
+            process = subprocess.Popen([sys.executable, sys.argv[0]] +
+                                       command + ["{0}:{1}".format(host,
+                                                                   port)],
+                                       stdout=devnull, stderr=devnull)
+            try:
+                wait_for(host, port, process)
+                self.report(name, self.load(host, port, uris,
+                                            options["clients"],
+                                            options["requests"]))
+            finally:
+                process.terminate()
+                process.wait()
+
+    def load(self, host, port, uris, clients, requests):
+        '''
+            Runs the clients at once; returns the seconds they took, their
+            latencies and errors.
+        '''
+        latencies = []
+        errors = []
+        threads = [threading.Thread(target=client, args=(host, port, uris,
+                                                         requests, latencies,
+                                                         errors))
+                   for _ in xrange(clients)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.time() - started, sorted(latencies), errors
+
+    def report(self, name, results):
+        elapsed, latencies, errors = results
+        self.stdout.write("{0:<8} {1:>8.1f} req/s  p50 {2:>7.1f} ms  "
+                          "p99 {3:>7.1f} ms  {4} error(s)".format(name,
+                          len(latencies) / elapsed,
+                          percentile(latencies, 0.5) * 1000,
+                          percentile(latencies, 0.99) * 1000, len(errors)))
@@ -0,0 +1,33 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from dualdb.core.changes import CHANGES
+from dualdb.core.models import ChangeEvent
+from dualdb.core.registry import route
+
+
+class Command(BaseCommand):
+    '''
+        Deletes the events of the change log older than the retention, in
+        every database; consumers behind them have to read the resources
+        again in full.
+    '''
+    help = "Prunes the change log of every database."
+    option_list = BaseCommand.option_list + (
+        make_option("--days", type="int",
+                    default=settings.CHANGE_LOG_RETENTION_DAYS,
+                    help="Days the events are kept for."),
+    )
+
+    def handle(self, *args, **options):
+        _, shard_set = route(ChangeEvent)
+        for alias in shard_set.aliases:
+            pruned = CHANGES.prune(alias, options["days"])
+            self.stdout.write("Pruned {0} event(s) off {1}.".format(pruned,
+                                                                    alias))
@@ -0,0 +1,27 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from dualdb.core.summaries import SUMMARIES
+
+
+class Command(BaseCommand):
+    '''
+        Aggregates the summary models again off the rows they summarize;
+        after bulk loads, or when they are suspected to have drifted.
+    '''
+    help = "Rebuilds the order summaries of the customers."
+    option_list = BaseCommand.option_list + (
+        make_option("--database", default=None,
+                    help="Database to rebuild, all of them by default."),
+    )
+
+    def handle(self, *args, **options):
+        for model, summaries in SUMMARIES.items():
+            written = summaries.rebuild(options["database"])
+            self.stdout.write("Rebuilt {0} {1}.".format(written,
+                                    model._meta.verbose_name_plural))
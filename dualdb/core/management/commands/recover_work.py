@@ -0,0 +1,24 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from dualdb.core.work import recover
+
+
+class Command(BaseCommand):
+    '''
+        Applies the units of work left half committed by crashed processes.
+    '''
+    help = "Applies the units of work left half committed across databases."
+    option_list = BaseCommand.option_list + (
+        make_option("--grace", type="int", default=None,
+                    help="Seconds logged work is left to its own process."),
+    )
+
+    def handle(self, *args, **options):
+        recovered = recover(options["grace"])
+        self.stdout.write("Recovered {0} unit(s) of work.".format(recovered))
@@ -0,0 +1,80 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import os
+import signal
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from dualdb.core.pool import POOLS
+
+
+class Command(BaseCommand):
+    '''
+        Serves the API off the event loop of dualdb.evented, in as many
+        processes as asked for, all of them sharing the listening socket;
+        as long as the API keeps nothing in process which would tell them
+        apart, see dualdb.evented.get_process_local.
+    '''
+    args = "[host:port]"
+    help = "Serves the API off an event loop, keeping connections alive."
+    option_list = BaseCommand.option_list + (
+        make_option("--processes", type="int", default=1,
+                    help="Processes serving the requests."),
+    )
+
+    def handle(self, addrport="127.0.0.1:8000", *args, **options):
+        from dualdb.evented import Server, get_process_local
+        from dualdb.urls import V1_API
+        from dualdb.wsgi import application
+
+        host, _, port = addrport.rpartition(":")
+        try:
+            port = int(port)
+        except ValueError:
+            raise CommandError("'{0}' is not a valid port.".format(port))
+
+        processes = max(1, options["processes"])
+        local = get_process_local(V1_API)
+        if processes > 1 and local:
+            raise CommandError("Can't serve from {0} processes, keeping {1} "
+                               "in process; see RESPONSE_CACHE_VERSIONS and "
+                               "STOCK_FLUSH_INTERVAL.".format(processes,
+                                                    ", ".join(local)))
+        server = Server(application, host or "127.0.0.1", port,
+                        api=V1_API, processes=processes)
+
+        #Connections opened so far must not be shared with the children.
+        for connection in connections.all():
+            connection.close()
+        for pool in POOLS.values():
+            pool.close_all()
+
+        children = []
+        for _ in range(processes - 1):
+            pid = os.fork()
+            if not pid:
+                children = None
+                break
+            children.append(pid)
+
+        if children is not None:
+            self.stdout.write("Serving on http://{0}:{1}/ with {2} "
+                              "process(es).".format(server.host, server.port,
+                                                    processes))
+        signal.signal(signal.SIGTERM, lambda *args: server.stop())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for pid in children or ():
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                    os.waitpid(pid, 0)
+                except OSError:
+                    #Gone already, on a Ctrl-C sent to all of them.
+                    pass
@@ -0,0 +1,36 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.contrib.auth.models import UserManager
+from django.db.models import Manager
+from django.db.models.query import QuerySet
+
+
+class RoutedQuerySet(QuerySet):
+    '''
+        Creates the rows of sharded models in the shard the router picks
+        for each of them, rather than in the one it picks for the model
+        before the row exists.
+    '''
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        #Routed by the save, with the instance at hand.
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class ShardedManager(Manager):
+    '''
+        Default manager of the sharded models.
+    '''
+    def get_query_set(self):
+        return RoutedQuerySet(self.model, using=self._db)
+
+
+class ShardedUserManager(ShardedManager, UserManager):
+    '''
+        Default manager of the sharded users.
+    '''
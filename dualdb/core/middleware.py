@@ -0,0 +1,63 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import logging
+
+from django.conf import settings
+from dualdb.core.instrumentation import DEFAULT_N_PLUS_ONE_THRESHOLD, \
+    METRICS, QueryStats, activate, deactivate, get_stats
+from dualdb.core.replicas import unpin_all
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPinningMiddleware(object):
+    '''
+        Marks the request boundaries for ModelRouter, so that the reads
+        pinned to a primary after a write do not leak into the next request
+        served by the same thread.
+    '''
+    def process_request(self, request):
+        '''
+            Starts the request with reads going to the replicas.
+        '''
+        unpin_all()
+
+    def process_response(self, request, response):
+        '''
+            Drops the pins taken while serving the request.
+        '''
+        unpin_all()
+        return response
+
+
+class QueryStatsMiddleware(object):
+    '''
+        Records the queries every request sends to each database alias
+        into the METRICS registry, flagging the ones repeated N+1 style.
+        With QUERY_STATS_HEADER, the counters of the request are also sent
+        back in the X-Query-Stats header.
+
+        The queries of streamed responses, sent while the response is
+        being written out, are left out.
+    '''
+    def process_request(self, request):
+        activate(QueryStats())
+
+    def process_response(self, request, response):
+        stats = get_stats()
+        if stats is None:
+            return response
+        deactivate()
+
+        threshold = getattr(settings, "N_PLUS_ONE_THRESHOLD",
+                            DEFAULT_N_PLUS_ONE_THRESHOLD)
+        METRICS.observe(stats, threshold)
+        for alias, shape, count in stats.get_n_plus_one(threshold):
+            logger.warning("%s sent %d times to %s by %s", shape, count,
+                           alias, request.path)
+        if getattr(settings, "QUERY_STATS_HEADER", settings.DEBUG):
+            response["X-Query-Stats"] = stats.get_header(threshold)
+        return response
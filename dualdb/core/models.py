@@ -4,14 +4,17 @@ Created on 07-Apr-2014
 @author: Rahul
 '''
 
+from django.conf import settings
 from django.db import models
-from django.contrib import auth
+from django.contrib.auth.models import AbstractUser
+from .managers import ShardedManager, ShardedUserManager
 from .registry import register
+from .summaries import connect_summaries
 
 APP_LABEL = "core"
 
 
-class User(auth.models.AbstractUser):
+class User(AbstractUser):
     '''
         Represent the User entity.
     '''
@@ -31,11 +34,13 @@ class Supplier(User):
         app_label = APP_LABEL
 
 
-@register("transactions")
+@register(shards=settings.TRANSACTIONS_SHARDS, key="id")
 class Customer(User):
     '''
         Represents our Customer entity.
     '''
+    objects = ShardedUserManager()
+
     class Meta(object):
         app_label = APP_LABEL
 
@@ -52,9 +57,11 @@ class Product(models.Model):
 
     class Meta(object):
         app_label = APP_LABEL
+        #Back the title and price filters of the products resource.
+        index_together = [["title", "price"], ["price", "title"]]
 
 
-@register("transactions")
+@register(shards=settings.TRANSACTIONS_SHARDS, key="customer_id")
 class Order(models.Model):
     '''
         Captures an instance of Order generation.
@@ -63,5 +70,93 @@ class Order(models.Model):
     date = models.DateField()
     customer = models.ForeignKey(Customer)
 
+    objects = ShardedManager()
+
+    class Meta(object):
+        app_label = APP_LABEL
+        #Back the seeks of the cursor paginated orders resource, of all
+        #the orders or of the ones of a customer.
+        index_together = [["date", "id"], ["customer", "date", "id"]]
+
+
+@register(shards=settings.TRANSACTIONS_SHARDS, key="customer_id")
+class CustomerOrderSummary(models.Model):
+    '''
+        The count and total amount of the orders of a customer, kept along
+        with them in the shard of the customer; updated as orders get saved
+        and deleted, see dualdb.core.summaries.
+    '''
+    customer = models.OneToOneField(Customer, primary_key=True)
+    order_count = models.IntegerField(default=0)
+    total_amount = models.FloatField(default=0)
+
+    class Meta(object):
+        app_label = APP_LABEL
+
+connect_summaries(Order, CustomerOrderSummary)
+
+
+@register("default")
+class ShardSequence(models.Model):
+    '''
+        Hands out the primary keys of a sharded model, so that the rows
+        inserted into different shards never share an id.
+    '''
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField()
+
+    class Meta(object):
+        app_label = APP_LABEL
+
+
+@register("default")
+class WorkLog(models.Model):
+    '''
+        Records the operations of a unit of work spanning databases once
+        all of them have been prepared; the commit point of the work.
+    '''
+    COMMITTING = "committing"
+    DONE = "done"
+    FAILED = "failed"
+
+    key = models.CharField(max_length=32, unique=True)
+    state = models.CharField(max_length=10, db_index=True)
+    operations = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta(object):
+        app_label = APP_LABEL
+
+
+@register(local=True)
+class AppliedWork(models.Model):
+    '''
+        Marks, in the database it was applied to, the part of a unit of
+        work already committed there.
+    '''
+    key = models.CharField(max_length=32, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta(object):
+        app_label = APP_LABEL
+
+
+@register(local=True)
+class ChangeEvent(models.Model):
+    '''
+        Logs a write on a row of the database it was written to; the ids
+        are the sequence of the changes of the database, see
+        dualdb.core.changes.
+    '''
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+    model = models.CharField(max_length=100)
+    #None when rows were updated by a query, which leaves no trace of them.
+    object_pk = models.CharField(max_length=40, null=True)
+    action = models.CharField(max_length=7)
+    created = models.DateTimeField(auto_now_add=True)
+
     class Meta(object):
         app_label = APP_LABEL
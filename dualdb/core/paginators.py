@@ -0,0 +1,203 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from urllib import urlencode
+
+from django.db.models import Q
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+
+#Request parameters the cursor paginator replaces in the next/previous URIs.
+PAGING_PARAMS = ("cursor", "offset", "limit")
+
+
+class CursorPaginator(Paginator):
+    '''
+        Pages through the objects by seeking past the edge row of the page
+        the client comes from, in place of OFFSET; the primary key is added
+        to the ordering of the objects to make it total. The total count is
+        only computed when the client asks for it with ``total_count=true``.
+
+        The ordering columns must not be null, and should be indexed
+        together for the seeks to be cheap.
+    '''
+    def get_ordering(self):
+        '''
+            Returns the order_by field names of the objects, ending with
+            the primary key.
+        '''
+        query = self.objects.query
+        ordering = list(query.order_by)
+        if not ordering and query.default_ordering:
+            ordering = list(self.objects.model._meta.ordering)
+
+        for name in ordering:
+            if name == "?" or "__" in name:
+                raise BadRequest("Can't page through objects ordered by "
+                                 "'%s'." % name)
+
+        pk_name = self.objects.model._meta.pk.name
+        if not set(["pk", pk_name]) & set(name.lstrip("-")
+                                           for name in ordering):
+            ordering.append(pk_name)
+        return ordering
+
+    def get_cursor(self, ordering):
+        '''
+            Decodes the cursor of the request into the direction to page in
+            and the ordering values to seek past; both None on first page.
+        '''
+        cursor = self.request_data.get("cursor")
+        if not cursor:
+            return None, None
+
+        try:
+            direction, values = json.loads(urlsafe_b64decode(str(cursor)))
+        except (TypeError, ValueError):
+            raise BadRequest("Invalid cursor '%s' provided." % cursor)
+
+        if direction not in ("next", "previous") or \
+                len(values) != len(ordering):
+            raise BadRequest("Invalid cursor '%s' provided." % cursor)
+        return direction, values
+
+    def get_values(self, obj, ordering):
+        '''
+            Returns the ordering values of the given row, as strings.
+        '''
+        values = []
+        for name in ordering:
+            name = name.lstrip("-")
+            if name == "pk":
+                field = obj._meta.pk
+            else:
+                field = obj._meta.get_field(name)
+            values.append(field.value_to_string(obj))
+        return values
+
+    def make_cursor(self, direction, obj, ordering):
+        '''
+            Encodes the ordering values of the edge row of a page into an
+            opaque cursor.
+        '''
+        return urlsafe_b64encode(json.dumps([direction,
+                                    self.get_values(obj, ordering)]))
+
+    def seek(self, objects, ordering, values, forward):
+        '''
+            Filters the objects down to the ones past the given ordering
+            values, in the given direction.
+        '''
+        condition = None
+        for index, name in enumerate(ordering):
+            lookup = "lt" if name.startswith("-") == forward else "gt"
+            term = Q(**{"{0}__{1}".format(name.lstrip("-"), lookup):
+                        values[index]})
+            for previous, value in zip(ordering[:index], values[:index]):
+                term &= Q(**{previous.lstrip("-"): value})
+            condition = term if condition is None else condition | term
+        return objects.filter(condition)
+
+    def chunks(self, size):
+        '''
+            Returns an iterator over all of the objects, in lists of up to
+            ``size`` rows each seeked to like the pages are.
+        '''
+        ordering = self.get_ordering()
+
+        ordered = self.objects.order_by(*ordering)
+
+        def read():
+            objects = ordered
+            while True:
+                rows = list(objects[:size])
+                if rows:
+                    yield rows
+                if len(rows) < size:
+                    return
+                values = self.get_values(rows[-1], ordering)
+                objects = self.seek(ordered, ordering, values, True)
+        return read()
+
+    def wants_total_count(self):
+        '''
+            Returns if the client asked for the total count of objects.
+        '''
+        return self.request_data.get("total_count", "").lower() in \
+            ("1", "true")
+
+    def _generate_cursor_uri(self, limit, cursor):
+        if self.resource_uri is None:
+            return None
+
+        try:
+            items = [(name, value)
+                     for name, values in self.request_data.lists()
+                     for value in values]
+        except AttributeError:
+            items = self.request_data.items()
+
+        params = [(name, value.encode("utf-8")
+                   if isinstance(value, unicode) else value)
+                  for name, value in items if name not in PAGING_PARAMS]
+        params.extend([("limit", limit), ("cursor", cursor)])
+        return "%s?%s" % (self.resource_uri, urlencode(params))
+
+    def page(self):
+        '''
+            Seeks to the requested page, and returns it along with the URIs
+            of the pages next to it; the total count only if asked for.
+        '''
+        limit = self.get_limit()
+        ordering = self.get_ordering()
+        direction, values = self.get_cursor(ordering)
+        forward = direction != "previous"
+
+        if forward:
+            objects = self.objects.order_by(*ordering)
+        else:
+            objects = self.objects.order_by(*[name[1:]
+                                              if name.startswith("-")
+                                              else "-" + name
+                                              for name in ordering])
+        if values is not None:
+            objects = self.seek(objects, ordering, values, forward)
+
+        if limit:
+            rows = list(objects[:limit + 1])
+            more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = list(objects)
+            more = False
+
+        if not forward:
+            rows.reverse()
+
+        meta = {
+            'limit': limit,
+            'previous': None,
+            'next': None,
+        }
+
+        if rows:
+            has_previous = more if not forward else values is not None
+            has_next = more if forward else True
+            if has_previous:
+                meta['previous'] = self._generate_cursor_uri(limit,
+                        self.make_cursor("previous", rows[0], ordering))
+            if has_next:
+                meta['next'] = self._generate_cursor_uri(limit,
+                        self.make_cursor("next", rows[-1], ordering))
+
+        if self.wants_total_count():
+            meta['total_count'] = self.get_count()
+
+        return {
+            self.collection_name: rows,
+            'meta': meta,
+        }
@@ -0,0 +1,247 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import threading
+import time
+from collections import deque
+
+from django.db import DatabaseError
+
+#Defaults of the POOL settings of a database.
+DEFAULT_MIN_SIZE = 0
+DEFAULT_MAX_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_CHECKOUT_TIMEOUT = 5
+
+#Database alias to the ConnectionPool of its connections.
+POOLS = {}
+
+#Connections every pool allows at least, whatever its settings; see
+#reserve.
+RESERVED_SIZE = 0
+
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(DatabaseError):
+    '''
+        Raised when no connection got free within the checkout timeout.
+    '''
+
+
+def ping(connection):
+    '''
+        Returns if the DB-API connection is still usable.
+    '''
+    try:
+        connection.cursor().execute("SELECT 1")
+    except Exception:
+        return False
+    return True
+
+
+class ConnectionPool(object):
+    '''
+        Keeps the DB-API connections to one database open across requests.
+
+        Up to ``max_size`` connections are open at a time; a checkout waits
+        up to ``checkout_timeout`` seconds for one to get free. Connections
+        left idle for ``idle_timeout`` seconds are closed, down to
+        ``min_size`` of them. With ``validate``, idle connections are pinged
+        before being handed out, and replaced when they fail to answer.
+    '''
+    def __init__(self, connect, min_size=DEFAULT_MIN_SIZE,
+                 max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT, validate=True):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min <= max, "
+                             "1 <= max.")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.validate = validate
+
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self.metrics = dict.fromkeys(["created", "closed", "checkouts",
+                                      "waits", "timeouts", "failed_pings",
+                                      "evicted"], 0)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self.metrics["closed"] += 1
+
+    def _evict(self):
+        '''
+            Closes the connections idle for too long; the oldest ones are
+            at the left end. Called with the condition held.
+        '''
+        expired = time.time() - self.idle_timeout
+        while self._idle and self._size > self.min_size and \
+                self._idle[0][1] < expired:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self.metrics["evicted"] += 1
+            self._close(connection)
+
+    def _open(self):
+        '''
+            Opens a connection in a slot already reserved for it.
+        '''
+        try:
+            connection = self.connect()
+        except:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        self.metrics["created"] += 1
+        return connection
+
+    def fill(self):
+        '''
+            Opens connections up to ``min_size``.
+        '''
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            with self._condition:
+                self._idle.append((connection, time.time()))
+                self._condition.notify()
+
+    def checkout(self):
+        '''
+            Hands out a connection, waiting for one to get free if all of
+            them are in use.
+        '''
+        deadline = time.time() + self.checkout_timeout
+        with self._condition:
+            self.metrics["checkouts"] += 1
+            while True:
+                self._evict()
+                while self._idle:
+                    #The most recently used one, so the others age out.
+                    connection, _ = self._idle.pop()
+                    if not self.validate or ping(connection):
+                        return connection
+                    self.metrics["failed_pings"] += 1
+                    self._size -= 1
+                    self._close(connection)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.metrics["timeouts"] += 1
+                    raise PoolTimeout("No connection got free within {0} "
+                                      "seconds.".format(self.checkout_timeout))
+                self.metrics["waits"] += 1
+                self._condition.wait(remaining)
+        return self._open()
+
+    def checkin(self, connection):
+        '''
+            Takes back a connection, rolling back what it left uncommitted.
+        '''
+        try:
+            connection.rollback()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._close(connection)
+                self._condition.notify()
+            return
+
+        with self._condition:
+            self._idle.append((connection, time.time()))
+            self._condition.notify()
+
+    def grow(self, max_size):
+        '''
+            Raises the max size to the given one, when lower.
+        '''
+        with self._condition:
+            if max_size > self.max_size:
+                self.max_size = max_size
+                self._condition.notify_all()
+
+    def close_all(self):
+        '''
+            Closes the idle connections; the ones in use get closed when
+            checked in, past the idle timeout.
+        '''
+        with self._condition:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._size -= 1
+                self._close(connection)
+
+    def stats(self):
+        '''
+            Returns the pool metrics, along with its current usage.
+        '''
+        with self._condition:
+            stats = dict(self.metrics)
+            stats.update({"size": self._size, "idle": len(self._idle),
+                          "in_use": self._size - len(self._idle),
+                          "max_size": self.max_size})
+        return stats
+
+
+def get_pool(alias, settings_dict, connect):
+    '''
+        Returns the pool of the database alias, set up from the ``POOL``
+        settings of the database on first use.
+    '''
+    pool = POOLS.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = POOLS.get(alias)
+            if pool is None:
+                options = settings_dict.get("POOL", {})
+                pool = ConnectionPool(connect,
+                        min_size=options.get("MIN_SIZE", DEFAULT_MIN_SIZE),
+                        max_size=max(options.get("MAX_SIZE",
+                                                 DEFAULT_MAX_SIZE),
+                                     RESERVED_SIZE),
+                        idle_timeout=options.get("IDLE_TIMEOUT",
+                                                 DEFAULT_IDLE_TIMEOUT),
+                        checkout_timeout=options.get("CHECKOUT_TIMEOUT",
+                                                     DEFAULT_CHECKOUT_TIMEOUT),
+                        validate=options.get("VALIDATE", True))
+                POOLS[alias] = pool
+        pool.fill()
+    return pool
+
+
+def reserve(size):
+    '''
+        Makes every pool, the ones set up later on too, allow at least the
+        given number of connections; as many as the threads of the process
+        which may each hold one at once, so that none of them waits.
+    '''
+    global RESERVED_SIZE
+    with _pools_lock:
+        RESERVED_SIZE = max(RESERVED_SIZE, size)
+        for pool in POOLS.values():
+            pool.grow(RESERVED_SIZE)
+
+
+def pool_stats():
+    '''
+        Returns the metrics of every pool, by database alias.
+    '''
+    return dict((alias, pool.stats()) for alias, pool in POOLS.items())
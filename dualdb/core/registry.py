@@ -5,17 +5,59 @@ Created on 08-Apr-2014
 '''
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from dualdb.core.replicas import ReplicaSet
+from dualdb.core.shards import ShardSet, SHARDS, assign_id
 REGISTRY = {}
 
+#Logical database name to the ReplicaSet serving its reads.
+REPLICAS = {}
 
-def register(db_name):
+#Frozen once the app cache is ready, see get_routing_table.
+_routing_table = None
+
+
+def _check_db(db_name):
     '''
-        A decorator generator to accept the DB name as parameter.
+        Makes sure the given database has been configured in settings.
     '''
     if db_name not in settings.DATABASES:
         raise ImproperlyConfigured('''The {0} database, specified on model
         class ,does not have associated settings.'''.format(db_name))
 
+
+def register(db_name=None, replicas=None, shards=None, key=None,
+             ranges=None, local=False):
+    '''
+        A decorator generator to accept the DB name as parameter.
+
+        Optionally accepts the read replicas of the DB, either as a list
+        of aliases or as a dict of alias and its weight in the rotation.
+
+        Alternatively accepts the list of ``shards`` to partition the rows
+        over by the value of the ``key`` attribute; by hash, or by range
+        when the upper bounds of all but the last shard are given.
+
+        The ``local`` models get a table of their own in every database,
+        their rows are written to the database given explicitly.
+    '''
+    if local:
+        shards = ["default"] + sorted(alias for alias in settings.DATABASES
+                                      if alias != "default")
+    if shards:
+        for alias in shards:
+            _check_db(alias)
+        db_name = shards[0]
+    _check_db(db_name)
+
+    if replicas:
+        if not isinstance(replicas, dict):
+            replicas = dict((alias, 1) for alias in replicas)
+
+        replica_set = REPLICAS.setdefault(db_name, ReplicaSet(db_name))
+        for alias, weight in replicas.items():
+            _check_db(alias)
+            replica_set.add(alias, weight)
+
     def class_wrapper(model_class):
         '''
             Registers the model class into registry to keep the mapping
@@ -23,10 +65,160 @@ def register(db_name):
         '''
         REGISTRY.update({model_class: db_name})
 
-        #Hack to maintain the registry of all ManyToMany fields of auth.
-        for field in model_class._meta.local_many_to_many:
-            REGISTRY.update({field.rel.through: db_name})
+        if shards:
+            from django.db.models.signals import pre_save
+
+            SHARDS.update({model_class: ShardSet(shards, key, ranges)})
+            if not local:
+                pre_save.connect(assign_id, sender=model_class)
 
+        thaw()
         return model_class
 
     return class_wrapper
+
+
+def get_primary(db_name):
+    '''
+        Given a database alias, returns the primary it replicates; returns
+        the alias itself if it is not a replica.
+    '''
+    for primary, replica_set in REPLICAS.items():
+        if db_name in replica_set:
+            return primary
+    return db_name
+
+
+def resolve(model):
+    '''
+        Works out the database and the ShardSet, if sharded, of the given
+        model from the registry. Proxy and deferred models go where their
+        concrete model goes, auto created M2M through tables go along with
+        the model declaring the field, and the children of multi-table
+        inheritance go along with their parents unless registered.
+    '''
+    opts = model._meta
+    if opts.proxy or getattr(model, "_deferred", False):
+        model = opts.concrete_model
+        opts = model._meta
+
+    if model in REGISTRY:
+        return REGISTRY[model], SHARDS.get(model)
+
+    if opts.auto_created:
+        db_name, shard_set = resolve(opts.auto_created)
+        if shard_set is not None:
+            #Join rows follow the shard of the instance they belong to.
+            shard_set = ShardSet(shard_set.aliases)
+        return db_name, shard_set
+
+    for parent in opts.parents:
+        db_name, shard_set = resolve(parent)
+        if db_name is not None:
+            return db_name, shard_set
+
+    return None, None
+
+
+def _syncs_to(db, model_route):
+    '''
+        Returns if a model with the given route has its table in the db.
+    '''
+    db_name, shard_set = model_route
+    if shard_set is not None:
+        return db in shard_set
+    return db == db_name
+
+
+class RoutingTable(object):
+    '''
+        Immutable model to database table precomputed from the registry,
+        so that routing a query is a single dict lookup.
+    '''
+    __slots__ = ("_routes", "_syncdb", "_misses")
+
+    def __init__(self, models):
+        routes = {}
+        syncdb = set()
+
+        for model in models:
+            db_name, shard_set = resolve(model)
+            if db_name is None:
+                continue
+
+            routes[model] = (db_name, shard_set)
+            for alias in (shard_set.aliases if shard_set else [db_name]):
+                syncdb.add((alias, model))
+
+        self._routes = routes
+        self._syncdb = frozenset(syncdb)
+        #Memoizes the models created after freezing, like deferred ones.
+        self._misses = {}
+
+    def route(self, model):
+        '''
+            Returns the database and the ShardSet, if any, of the model.
+        '''
+        try:
+            return self._routes[model]
+        except KeyError:
+            pass
+
+        try:
+            return self._misses[model]
+        except KeyError:
+            route = self._misses[model] = resolve(model)
+            return route
+
+    def syncs_to(self, db, model):
+        '''
+            Returns if the table of the model belongs to the given database.
+        '''
+        if model in self._routes:
+            return (db, model) in self._syncdb
+        return _syncs_to(db, self.route(model))
+
+
+def get_routing_table():
+    '''
+        Returns the frozen RoutingTable; None until the app cache has been
+        populated, as models may still be registering before that.
+    '''
+    global _routing_table
+    if _routing_table is None:
+        from django.db.models.loading import cache
+
+        if not cache.app_cache_ready():
+            return None
+        _routing_table = RoutingTable(cache.get_models(
+                                            include_auto_created=True))
+    return _routing_table
+
+
+def thaw():
+    '''
+        Drops the frozen RoutingTable, so that it gets rebuilt from the
+        registry on its next use.
+    '''
+    global _routing_table
+    _routing_table = None
+
+
+def route(model):
+    '''
+        Returns the database and the ShardSet, if any, of the given model.
+    '''
+    table = get_routing_table()
+    if table is None:
+        return resolve(model)
+    return table.route(model)
+
+
+def syncs_to(db, model):
+    '''
+        Returns if the table of the given model belongs to the database.
+    '''
+    table = get_routing_table()
+    if table is None:
+        return _syncs_to(db, resolve(model))
+    return table.syncs_to(db, model)
@@ -0,0 +1,203 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+from django.utils import timezone
+
+#Replicas lagging behind their primary by more seconds are skipped.
+DEFAULT_MAX_LAG = 5
+
+#Seconds a replica that failed a health check is kept out of rotation.
+DEFAULT_RETRY_AFTER = 30
+
+#Seconds between the health checks of the replicas.
+DEFAULT_CHECK_INTERVAL = 10
+
+_pinned = threading.local()
+
+
+def pin(db_name):
+    '''
+        Pins the reads on the given primary database for the rest of the
+        current request. Called whenever the request writes to it.
+    '''
+    try:
+        _pinned.databases.add(db_name)
+    except AttributeError:
+        _pinned.databases = set([db_name])
+
+
+def is_pinned(db_name):
+    '''
+        Returns if the current request has written to the given primary.
+    '''
+    try:
+        return db_name in _pinned.databases
+    except AttributeError:
+        return False
+
+
+def pinned():
+    '''
+        Returns the primaries the current request has written to.
+    '''
+    return set(getattr(_pinned, "databases", ()))
+
+
+def unpin_all():
+    '''
+        Forgets about the writes done so far; marks the request boundary.
+    '''
+    _pinned.databases = set()
+
+
+class ReplicaSet(object):
+    '''
+        Holds the read replicas of one logical database and picks the one
+        to serve the next read using smooth weighted round-robin.
+
+        Replicas which failed a health check or lag too far behind the
+        primary are skipped; when none is usable the primary serves reads.
+        The replicas are checked every ``check_interval`` seconds, by the
+        read falling due; never with no interval.
+    '''
+    def __init__(self, primary, replicas=None, max_lag=None,
+                 retry_after=None, check_interval=None):
+        self.primary = primary
+        self.weights = {}
+        self.max_lag = max_lag if max_lag is not None else getattr(
+                        settings, "REPLICA_MAX_LAG", DEFAULT_MAX_LAG)
+        self.retry_after = retry_after if retry_after is not None else \
+            getattr(settings, "REPLICA_RETRY_AFTER", DEFAULT_RETRY_AFTER)
+        self.check_interval = check_interval if check_interval is not None \
+            else getattr(settings, "REPLICA_CHECK_INTERVAL",
+                         DEFAULT_CHECK_INTERVAL)
+        self.checked = 0
+        self._checking = threading.Lock()
+        self._current = {}
+        self._lag = {}
+        self._failed_at = {}
+        self._lock = threading.Lock()
+
+        for alias, weight in (replicas or {}).items():
+            self.add(alias, weight)
+
+    def __contains__(self, alias):
+        return alias in self.weights
+
+    def add(self, alias, weight=1):
+        '''
+            Adds the replica alias into rotation with the given weight.
+        '''
+        if weight <= 0:
+            raise ValueError("Replica weight must be a positive number.")
+        with self._lock:
+            self.weights[alias] = weight
+            self._current[alias] = 0
+
+    def report_lag(self, alias, seconds):
+        '''
+            Records the replication lag observed for the replica.
+        '''
+        self._lag[alias] = seconds
+
+    def mark_failed(self, alias):
+        '''
+            Takes the replica out of rotation for ``retry_after`` seconds.
+        '''
+        self._failed_at[alias] = time.time()
+
+    def mark_healthy(self, alias):
+        '''
+            Puts the replica back into rotation.
+        '''
+        self._failed_at.pop(alias, None)
+
+    def is_available(self, alias):
+        '''
+            Returns if the replica may serve reads right now.
+        '''
+        if self._lag.get(alias, 0) > self.max_lag:
+            return False
+
+        failed_at = self._failed_at.get(alias)
+        if failed_at is not None:
+            if time.time() - failed_at < self.retry_after:
+                return False
+            #Give it another chance, the next failure takes it out again.
+            self.mark_healthy(alias)
+        return True
+
+    def get_lag(self, alias):
+        '''
+            Returns the seconds since the oldest write logged on the primary
+            which the replica has not got yet, off their change logs; see
+            dualdb.core.changes.
+        '''
+        from dualdb.core.models import ChangeEvent
+
+        last = ChangeEvent.objects.using(alias).order_by("-pk").values_list(
+                                                        "pk", flat=True)[:1]
+        missing = ChangeEvent.objects.using(self.primary).filter(
+                        pk__gt=last[0] if last else 0).order_by("pk")
+        created = missing.values_list("created", flat=True)[:1]
+        if not created:
+            return 0
+        return max(0, (timezone.now() - created[0]).total_seconds())
+
+    def check_health(self):
+        '''
+            Pings every replica and measures its lag, updating its health
+            accordingly.
+        '''
+        self.checked = time.time()
+        for alias in list(self.weights):
+            try:
+                connections[alias].cursor().execute("SELECT 1")
+                self.report_lag(alias, self.get_lag(alias))
+            except DatabaseError:
+                self.mark_failed(alias)
+            else:
+                self.mark_healthy(alias)
+
+    def check_if_due(self):
+        '''
+            Checks the replicas when it is time to, unless another thread
+            is doing it.
+        '''
+        if not self.check_interval or \
+                time.time() - self.checked < self.check_interval:
+            return
+        if self._checking.acquire(False):
+            try:
+                self.check_health()
+            finally:
+                self._checking.release()
+
+    def choose(self):
+        '''
+            Returns the alias which should serve the next read.
+        '''
+        self.check_if_due()
+        candidates = [alias for alias in self.weights
+                      if self.is_available(alias)]
+        if not candidates:
+            return self.primary
+
+        with self._lock:
+            total = 0
+            chosen = None
+            for alias in candidates:
+                self._current[alias] += self.weights[alias]
+                total += self.weights[alias]
+                if chosen is None or \
+                        self._current[alias] > self._current[chosen]:
+                    chosen = alias
+            self._current[chosen] -= total
+        return chosen
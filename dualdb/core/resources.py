@@ -3,13 +3,57 @@ Created on 07-Apr-2014
 
 @author: Rahul
 '''
+import heapq
+import math
+import os
+import time
+from itertools import islice
 
-from tastypie.resources import ModelResource
+from django.conf import settings
+from django.conf.urls import url
+from django.core.urlresolvers import NoReverseMatch
+from django.db import router, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, \
+    quote_etag
+from tastypie.resources import ModelDeclarativeMetaclass, ModelResource, \
+    Resource
+from tastypie import http
+from tastypie.exceptions import BadRequest
+from tastypie.utils import trailing_slash
 from tastypie.utils.mime import determine_format
-from dualdb.core.models import Supplier, Customer, Product, Order
+from dualdb.core.models import Supplier, Customer, Product, Order, \
+    CustomerOrderSummary
 from tastypie.authorization import Authorization
 from dualdb.common.utils import get_pk_filds
+from dualdb.core.shards import shard_queryset
+from dualdb.core.loaders import RelationLoader
+from dualdb.core.bulk import BulkWriter
+from dualdb.core.cache import LRUCache, get_label
+from dualdb.core.catalog import Catalog
+from dualdb.core.changes import CHANGES
+from dualdb.core.paginators import CursorPaginator
+from dualdb.core.dehydrators import RowBundle, RowDehydrator
+from dualdb.core.serializers import FastSerializer
+from dualdb.core.stock import STOCK, OutOfStock
+from dualdb.core.streaming import stream_response
 from tastypie import fields
+from tastypie.constants import ALL
+
+
+class ChangeLoggedMetaclass(ModelDeclarativeMetaclass):
+    '''
+        Tracks the model of every resource class in its change log, as the
+        class gets declared.
+    '''
+    def __new__(cls, name, bases, attrs):
+        new_class = super(ChangeLoggedMetaclass, cls).__new__(cls, name,
+                                                              bases, attrs)
+        meta = new_class._meta
+        if getattr(meta, "change_log", None) is not None and \
+                meta.object_class is not None:
+            meta.change_log.track(meta.object_class, meta.resource_name)
+        return new_class
 
 
 class BaseResource(ModelResource):
@@ -18,12 +62,29 @@ class BaseResource(ModelResource):
         Framework modification and generally applicable
         changes will go here.
     '''
+    __metaclass__ = ChangeLoggedMetaclass
+    _cache_models = None
+
     class Meta(object):
         '''
             Meta options for all the resources.
         '''
         collection_name = "data"
         authorization = Authorization()
+        serializer = FastSerializer()
+        relation_loader = RelationLoader()
+        bulk_writer = BulkWriter()
+        response_cache = LRUCache(timeout=settings.RESPONSE_CACHE_TIMEOUT,
+                            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                            versions=settings.RESPONSE_CACHE_VERSIONS)
+        #Rows read and dehydrated at a time by the streamed lists.
+        stream_chunk_size = 500
+        #Set to a RowDehydrator to dehydrate the lists off plain rows.
+        row_dehydrator = None
+        #Set to a Catalog to serve plain reads off a snapshot file.
+        catalog = None
+        #Logs the writes on the model, see dualdb.core.changes.
+        change_log = CHANGES
 
     def determine_format(self, request):
         '''
@@ -37,6 +98,359 @@ class BaseResource(ModelResource):
 
         return fmt
 
+    def dispatch(self, request_type, request, **kwargs):
+        '''
+            Serves GET requests off the response cache while none of the
+            models behind the response has changed, and answers conditional
+            GETs with 304 off the model versions alone; any write through
+            the resource invalidates the responses built off its model.
+            Validators are only sent when the versions are shared by all
+            of the processes, as another one could answer 304 forever off
+            versions it never saw bumped. Last-Modified, in whole seconds,
+            is only sent once the second of the last write is over; a later
+            write within it would go unnoticed otherwise.
+        '''
+        cache = self._meta.response_cache
+        method = request.META.get("HTTP_X_HTTP_METHOD_OVERRIDE",
+                                  request.method).upper()
+
+        if method != "GET":
+            try:
+                return super(BaseResource, self).dispatch(request_type,
+                                                          request, **kwargs)
+            finally:
+                if method in ("POST", "PUT", "PATCH", "DELETE"):
+                    cache.bump(get_label(self._meta.object_class))
+
+        self.is_authenticated(request)
+        self.throttle_check(request)
+
+        key, modified = cache.get_validators(
+                        self.get_cache_bits(request_type, request, kwargs),
+                        self.get_cache_models())
+        etag = quote_etag(key.split(":", 1)[1])
+        shared = cache.is_shared()
+
+        if shared and self.is_not_modified(request, etag, modified):
+            response = HttpResponseNotModified()
+        else:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super(BaseResource, self).dispatch(request_type,
+                                                          request, **kwargs)
+                if not cache.cacheable(request, response):
+                    return response
+                cache.set(key, (response.content, response["Content-Type"]))
+
+        if shared:
+            response["ETag"] = etag
+            modified = math.ceil(modified)
+            if modified <= time.time():
+                response["Last-Modified"] = http_date(modified)
+        return response
+
+    def is_not_modified(self, request, etag, modified):
+        '''
+            Returns if the client already has the response with the given
+            ETag or one at least as new as the given modification time.
+        '''
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or etag.strip('"') in etags
+
+        if_modified_since = parse_http_date_safe(
+                                request.META.get("HTTP_IF_MODIFIED_SINCE"))
+        return if_modified_since is not None and \
+            math.ceil(modified) <= if_modified_since
+
+    def get_cache_bits(self, request_type, request, kwargs):
+        '''
+            Returns what tells apart the responses of the resource; the URL,
+            the query string and the format asked for.
+        '''
+        bits = [self._meta.api_name or "", self._meta.resource_name,
+                request_type, self.determine_format(request)]
+        bits.extend(u"{0}={1}".format(name, value)
+                    for name, value in sorted(kwargs.items()))
+        bits.extend(u"{0}={1}".format(name, value)
+                    for name, values in sorted(request.GET.lists())
+                    for value in values)
+        return bits
+
+    def get_cache_models(self):
+        '''
+            Returns the models the responses of the resource are built off;
+            its own model and the ones of its related resources.
+        '''
+        if self._cache_models is None:
+            models = [self._meta.object_class]
+            for field_object in self.fields.values():
+                if getattr(field_object, "is_related", False):
+                    models.append(field_object.to_class._meta.object_class)
+            self._cache_models = models
+        return self._cache_models
+
+    def get_object_list(self, request):
+        '''
+            Scatters the queries on sharded models over all of their shards
+            and gathers the rows back in order for the paginator. Only the
+            columns of the fields asked for are read, see get_sparse_fields.
+        '''
+        objects = super(BaseResource, self).get_object_list(request)
+        fields = self.get_sparse_fields(request)
+        if fields is not None and request.method == "GET":
+            ordering = list(objects.query.order_by) + \
+                request.GET.getlist("order_by")
+            columns = self.get_columns(objects.model, fields, ordering)
+            if columns is not None:
+                objects = objects.only(*columns)
+        return shard_queryset(objects)
+
+    def get_sparse_fields(self, request):
+        '''
+            Returns the names of the fields asked for with ``?fields=`` as a
+            comma separated list, along with the resource_uri; None when all
+            of them are. They apply to the resource requested only, not to
+            the ones it nests.
+        '''
+        match = getattr(request, "resolver_match", None)
+        if match is None or match.kwargs.get("resource_name") != \
+                self._meta.resource_name:
+            return None
+        if not hasattr(request, "sparse_fields"):
+            names = set(name.strip() for name in
+                        request.GET.get("fields", "").split(","))
+            names.discard("")
+            unknown = names - set(self.fields)
+            if unknown:
+                raise BadRequest("No such field(s): {0}.".format(
+                                            ", ".join(sorted(unknown))))
+            if names:
+                names.add("resource_uri")
+            request.sparse_fields = names or None
+        return request.sparse_fields
+
+    def get_columns(self, model, fields, ordering):
+        '''
+            Returns the model fields to read for the given resource fields,
+            and for the ones the rows are ordered by; None when some of them
+            can't be told apart, so that all of the columns get read.
+        '''
+        columns = set(name.lstrip("-") for name in ordering
+                      if name.lstrip("-") != "pk")
+        for field_name in fields:
+            field_object = self.fields[field_name]
+            if field_name == "resource_uri" or \
+                    getattr(field_object, "is_m2m", False):
+                continue
+            if not isinstance(field_object.attribute, basestring):
+                return None
+            columns.add(field_object.attribute.split("__")[0])
+
+        local = set(field.name for field in model._meta.fields)
+        if not columns <= local:
+            return None
+        return columns
+
+    def full_dehydrate(self, bundle, for_list=False):
+        '''
+            Dehydrates the fields asked for, the way tastypie dehydrates all
+            of them; the rest are left out of the bundle.
+        '''
+        fields = self.get_sparse_fields(bundle.request)
+        if fields is None:
+            return super(BaseResource, self).full_dehydrate(
+                                                bundle, for_list=for_list)
+
+        use_in = ["all", "list" if for_list else "detail"]
+        for field_name in fields:
+            field_object = self.fields[field_name]
+            field_use_in = getattr(field_object, "use_in", "all")
+            if callable(field_use_in):
+                if not field_use_in(bundle):
+                    continue
+            elif field_use_in not in use_in:
+                continue
+
+            if getattr(field_object, "dehydrated_type", None) == "related":
+                field_object.api_name = self._meta.api_name
+                field_object.resource_name = self._meta.resource_name
+
+            bundle.data[field_name] = field_object.dehydrate(bundle)
+            method = getattr(self, "dehydrate_{0}".format(field_name), None)
+            if method:
+                bundle.data[field_name] = method(bundle)
+
+        return self.dehydrate(bundle)
+
+    def has_dehydrate_hooks(self):
+        '''
+            Returns if the resource dehydrates its objects any other way
+            than its fields do by themselves; with a dehydrate method of its
+            own, or one for any of its fields, or URIs of its own.
+        '''
+        cls = type(self)
+        if cls.full_dehydrate.im_func is not \
+                BaseResource.full_dehydrate.im_func:
+            return True
+        for name in ("dehydrate", "dehydrate_resource_uri",
+                     "get_resource_uri", "detail_uri_kwargs"):
+            if getattr(cls, name).im_func is not \
+                    getattr(ModelResource, name).im_func:
+                return True
+        return any(hasattr(cls, "dehydrate_{0}".format(field_name))
+                   for field_name in self.fields
+                   if field_name != "resource_uri")
+
+    def get_catalog(self):
+        '''
+            Returns the Catalog the plain reads are served off, if any.
+        '''
+        return self._meta.catalog
+
+    def get_detail(self, request, **kwargs):
+        '''
+            Returns a serialized resource, off the catalog when there is
+            one and it has the resource up to date.
+        '''
+        catalog = self.get_catalog()
+        if catalog is not None:
+            response = catalog.get_detail(self, request, kwargs.get("pk"))
+            if response is not None:
+                return response
+        return super(BaseResource, self).get_detail(request, **kwargs)
+
+    def get_list(self, request, **kwargs):
+        '''
+            Returns a serialized list of resources, the way tastypie does,
+            except that the related objects of the whole page are loaded
+            in batches before it gets dehydrated. The lists of resources
+            with a row_dehydrator are dehydrated off ``.values()`` rows,
+            whenever it can compile them; the ones of resources with a
+            catalog are served off it when they can.
+        '''
+        catalog = self.get_catalog()
+        if catalog is not None:
+            response = catalog.get_list(self, request)
+            if response is not None:
+                return response
+
+        base_bundle = self.build_bundle(request=request)
+        objects = self.obj_get_list(bundle=base_bundle,
+                                    **self.remove_api_resource_names(kwargs))
+        sorted_objects = self.apply_sorting(objects, options=request.GET)
+
+        if request.GET.get("stream", "").lower() in ("1", "true"):
+            return self.get_stream(request, sorted_objects)
+
+        compiled = None
+        if self._meta.row_dehydrator is not None and \
+                not issubclass(self._meta.paginator_class, CursorPaginator):
+            #Cursors are read off model instances.
+            compiled = self._meta.row_dehydrator.compile(self,
+                                            self.get_sparse_fields(request))
+        if compiled is not None:
+            columns, dehydrate_row = compiled
+            sorted_objects = sorted_objects.values(*columns)
+
+        paginator = self._meta.paginator_class(request.GET, sorted_objects,
+                                resource_uri=self.get_resource_uri(),
+                                limit=self._meta.limit,
+                                max_limit=self._meta.max_limit,
+                                collection_name=self._meta.collection_name)
+        to_be_serialized = paginator.page()
+
+        page = list(to_be_serialized[self._meta.collection_name])
+        if compiled is not None:
+            bundles = [RowBundle(dehydrate_row(row), request) for row in page]
+        else:
+            self._meta.relation_loader.load(self, page,
+                                            self.get_sparse_fields(request))
+            bundles = []
+            for obj in page:
+                bundle = self.build_bundle(obj=obj, request=request)
+                bundles.append(self.full_dehydrate(bundle))
+
+        to_be_serialized[self._meta.collection_name] = bundles
+        to_be_serialized = self.alter_list_data_to_serialize(request,
+                                                             to_be_serialized)
+        return self.create_response(request, to_be_serialized)
+
+    def post_list(self, request, **kwargs):
+        '''
+            Writes all of the objects of a posted array in one go, see
+            BulkWriter; a single object is created the way tastypie does.
+        '''
+        deserialized = self.deserialize(request, request.body,
+                    format=request.META.get("CONTENT_TYPE", "application/json"))
+        if not isinstance(deserialized, list):
+            return super(BaseResource, self).post_list(request, **kwargs)
+
+        if not all(isinstance(item, dict) for item in deserialized):
+            raise BadRequest("Invalid data sent.")
+
+        writer = self._meta.bulk_writer
+        bundles = writer.hydrate(self, request, deserialized)
+        writer.write(self, bundles)
+
+        data = {self._meta.collection_name: [self.get_resource_uri(bundle)
+                                             for bundle in bundles]}
+        return self.create_response(request, data,
+                                    response_class=http.HttpCreated)
+
+    def save(self, bundle, skip_errors=False):
+        '''
+            Saves the object the way tastypie does, in one transaction with
+            the events the change log records for it; written in one go.
+        '''
+        change_log = self._meta.change_log
+        if change_log is None:
+            return super(BaseResource, self).save(bundle,
+                                                  skip_errors=skip_errors)
+        alias = router.db_for_write(self._meta.object_class,
+                                    instance=bundle.obj)
+        with transaction.commit_on_success(using=alias):
+            with change_log.batch():
+                return super(BaseResource, self).save(bundle,
+                                                      skip_errors=skip_errors)
+
+    def obj_get(self, bundle, **kwargs):
+        '''
+            Returns the object looked up ahead by a bulk write, if any;
+            queries for it otherwise.
+        '''
+        related_objects = getattr(bundle.request, "related_objects", None)
+        if related_objects and kwargs.keys() == ["pk"]:
+            key = (self._meta.object_class, unicode(kwargs["pk"]))
+            if key in related_objects:
+                bundle.obj = related_objects[key]
+                return bundle.obj
+        return super(BaseResource, self).obj_get(bundle, **kwargs)
+
+    def get_stream(self, request, objects):
+        '''
+            Streams out all of the objects, unpaginated, as they get read
+            off the database in chunks and dehydrated; for exports which
+            should not be held in memory all at once.
+        '''
+        paginator = CursorPaginator(request.GET, objects)
+        chunks = paginator.chunks(self._meta.stream_chunk_size)
+
+        fields = self.get_sparse_fields(request)
+
+        def dehydrate():
+            for chunk in chunks:
+                self._meta.relation_loader.load(self, chunk, fields)
+                yield [self.full_dehydrate(self.build_bundle(obj=obj,
+                                                            request=request))
+                       for obj in chunk]
+
+        stream_response(self, request, dehydrate())
+
 
 class SuppliersResource(BaseResource):
     '''
@@ -48,6 +462,10 @@ class SuppliersResource(BaseResource):
             This resource has /suppliers/ end point URI.
         '''
         resource_name = "suppliers"
+        row_dehydrator = RowDehydrator()
+        catalog = Catalog(os.path.join(settings.CATALOG_DIR,
+                                       "suppliers.snapshot"), [Supplier],
+                          settings.CATALOG_REBUILD_DELAY)
         queryset = Supplier.objects.all()
         excludes = get_pk_filds(Supplier)
 
@@ -62,6 +480,7 @@ class CustomersResource(BaseResource):
             This resource has /customers/ end point URI.
         '''
         resource_name = "customers"
+        row_dehydrator = RowDehydrator()
         queryset = Customer.objects.all()
         excludes = get_pk_filds(Customer)
 
@@ -81,6 +500,72 @@ class ProductsResource(BaseResource):
         resource_name = "products"
         queryset = Product.objects.all()
         excludes = get_pk_filds(Product)
+        filtering = {
+            "title": ("exact", "startswith"),
+            "price": ("exact", "lt", "lte", "gt", "gte", "range"),
+        }
+        #Reserves and releases the stock, see dualdb.core.stock.
+        stock_counters = STOCK
+        catalog = Catalog(os.path.join(settings.CATALOG_DIR,
+                                       "products.snapshot"),
+                          [Product, Supplier], settings.CATALOG_REBUILD_DELAY)
+
+    def get_catalog(self):
+        '''
+            Leaves the catalog aside while reserved stock is left to write
+            back, as it only gets in the snapshot afterwards.
+        '''
+        if self._meta.stock_counters.has_pending():
+            return None
+        return super(ProductsResource, self).get_catalog()
+
+    def prepend_urls(self):
+        '''
+            Adds /products/<id>/reserve and /products/<id>/release.
+        '''
+        return [url(r"^(?P<resource_name>%s)/(?P<pk>\d+)/(?P<action>reserve|"
+                    r"release)%s$" % (self._meta.resource_name,
+                                      trailing_slash()),
+                    self.wrap_view("dispatch_stock"),
+                    name="api_dispatch_stock")]
+
+    def dispatch_stock(self, request, pk, action, **kwargs):
+        '''
+            Takes the posted quantity off the stock of the product, or puts
+            it back; answers with the stock left, or with 409 when there
+            isn't enough to reserve.
+        '''
+        self.method_check(request, allowed=["post"])
+        self.is_authenticated(request)
+        self.throttle_check(request)
+
+        data = self.deserialize(request, request.body or "{}",
+                    format=request.META.get("CONTENT_TYPE", "application/json"))
+        quantity = data.get("quantity", 1) if isinstance(data, dict) else None
+        if not isinstance(quantity, (int, long)) or isinstance(quantity, bool) \
+                or quantity < 1:
+            raise BadRequest("The quantity must be a positive integer.")
+
+        counters = self._meta.stock_counters
+        try:
+            stock = getattr(counters, action)(int(pk), quantity)
+        except Product.DoesNotExist:
+            return http.HttpNotFound()
+        except OutOfStock as error:
+            return self.create_response(request, {"error": str(error),
+                                                  "stock": error.available},
+                                        response_class=http.HttpConflict)
+        finally:
+            self.log_throttled_access(request)
+        self._meta.response_cache.bump(get_label(Product))
+        return self.create_response(request, {"stock": stock})
+
+    def dehydrate_stock(self, bundle):
+        '''
+            Counts in the reservations not written back yet.
+        '''
+        return self._meta.stock_counters.get_stock(bundle.obj.pk,
+                                                   bundle.data["stock"])
 
 
 class OrdersResource(BaseResource):
@@ -95,5 +580,204 @@ class OrdersResource(BaseResource):
             This resource has /orders/ end point URI.
         '''
         resource_name = "orders"
-        queryset = Order.objects.all()
+        queryset = Order.objects.order_by("date", "id")
+        paginator_class = CursorPaginator
         excludes = get_pk_filds(Order)
+        filtering = {
+            "date": ALL,
+            "customer": ("exact", "in"),
+        }
+
+
+class OrderSummariesResource(BaseResource):
+    '''
+        Represents the read only API resource for the order summaries of
+        the customers, addressed by the customer id.
+    '''
+    customer = fields.ForeignKey(CustomersResource, attribute="customer")
+
+    class Meta(BaseResource.Meta):
+        '''
+            Holds META options for Order Summaries resource.
+            This resource has /order_summaries/ end point URI.
+        '''
+        resource_name = "order_summaries"
+        queryset = CustomerOrderSummary.objects.all()
+        allowed_methods = ["get"]
+        ordering = ["order_count", "total_amount"]
+        excludes = get_pk_filds(CustomerOrderSummary)
+        #Derived off the orders, whose changes are logged.
+        change_log = None
+
+
+class ChangesResource(Resource):
+    '''
+        Read only feed of the writes on the models of the resources, off
+        their change log; see dualdb.core.changes.
+
+        /changes?since=<cursor> lists up to ``limit`` events after the
+        cursor, oldest first, along with the cursor to ask for the next
+        ones with. A cursor holds the last sequence read of every database
+        as "alias:sequence" pairs joined by commas; the events are listed
+        from the start without one. ``resources`` narrows the feed down to
+        a comma separated list of resources, and ``stream=true`` streams
+        out all of the events after the cursor instead, each one carrying
+        its database and sequence. Cursors older than the events pruned off
+        the log get 410; the resources have to be read again in full.
+    '''
+    class Meta(object):
+        '''
+            Holds META options for Changes resource.
+            This resource has /changes/ end point URI.
+        '''
+        resource_name = "changes"
+        collection_name = "data"
+        list_allowed_methods = ["get"]
+        detail_allowed_methods = []
+        serializer = FastSerializer()
+        change_log = CHANGES
+        limit = 100
+        max_limit = 1000
+        stream_chunk_size = 500
+
+    def determine_format(self, request):
+        '''
+            Answers in JSON rather than text/html, as BaseResource does.
+        '''
+        fmt = determine_format(request, self._meta.serializer,
+                               default_format=self._meta.default_format)
+        return "application/json" if fmt == "text/html" else fmt
+
+    def parse_cursor(self, cursor):
+        '''
+            Returns the last sequence read of every database, by alias.
+        '''
+        since = dict((alias, 0) for alias in
+                     self._meta.change_log.get_aliases())
+        for part in cursor.split(","):
+            if not part:
+                continue
+            alias, _, sequence = part.partition(":")
+            if alias not in since or not sequence.isdigit():
+                raise BadRequest("Invalid cursor: {0}.".format(cursor))
+            since[alias] = int(sequence)
+        return since
+
+    def format_cursor(self, since):
+        return ",".join("{0}:{1}".format(alias, sequence)
+                        for alias, sequence in sorted(since.items()))
+
+    def get_models(self, request):
+        '''
+            Returns the models of the resources asked for, None for all.
+        '''
+        names = set(name.strip() for name in
+                    request.GET.get("resources", "").split(","))
+        names.discard("")
+        if not names:
+            return None
+        change_log = self._meta.change_log
+        models = dict((name, change_log.models[label]) for label, name in
+                      change_log.resources.items())
+        unknown = names - set(models)
+        if unknown:
+            raise BadRequest("No changes logged for: {0}.".format(
+                                                ", ".join(sorted(unknown))))
+        return [models[name] for name in sorted(names)]
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.GET.get("limit", self._meta.limit))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise BadRequest("The limit must be a positive integer.")
+        return min(limit, self._meta.max_limit)
+
+    def dehydrate_event(self, alias, event):
+        resource_name = self._meta.change_log.resources.get(event.model)
+        resource_uri = None
+        if resource_name is not None and event.object_pk is not None:
+            kwargs = {"resource_name": resource_name, "pk": event.object_pk}
+            if self._meta.api_name is not None:
+                kwargs["api_name"] = self._meta.api_name
+            try:
+                resource_uri = self._build_reverse_url("api_dispatch_detail",
+                                                       kwargs=kwargs)
+            except NoReverseMatch:
+                pass
+        return {
+            "alias": alias,
+            "sequence": event.pk,
+            "resource": resource_name,
+            "pk": event.object_pk,
+            "resource_uri": resource_uri,
+            "action": event.action,
+            "created": event.created,
+        }
+
+    def get_list(self, request, **kwargs):
+        '''
+            Lists the events after the cursor, the ones of the databases
+            merged by time; the events of each database stay in order, so
+            that the cursor can move past the last one listed.
+        '''
+        change_log = self._meta.change_log
+        since = self.parse_cursor(request.GET.get("since", ""))
+        models = self.get_models(request)
+        for alias, sequence in sorted(since.items()):
+            if change_log.is_pruned(alias, sequence):
+                return self.create_response(request, {"error": "Changes "
+                        "after {0}:{1} have been pruned.".format(alias,
+                                                                 sequence)},
+                        response_class=http.HttpGone)
+
+        if request.GET.get("stream", "").lower() in ("1", "true"):
+            return self.get_stream(request, since, models)
+
+        limit = self.get_limit(request)
+        events = list(islice(heapq.merge(*[
+                    [(event.created, alias, event.pk, event) for event in
+                     change_log.read(alias, sequence, limit, models)]
+                    for alias, sequence in sorted(since.items())]), limit))
+
+        cursor = dict(since)
+        for _, alias, sequence, _ in events:
+            cursor[alias] = sequence
+        next_uri = None
+        if len(events) == limit:
+            params = request.GET.copy()
+            params["since"] = self.format_cursor(cursor)
+            next_uri = "{0}?{1}".format(request.path, params.urlencode())
+
+        return self.create_response(request, {
+            self._meta.collection_name: [self.dehydrate_event(alias, event)
+                                         for _, alias, _, event in events],
+            "meta": {
+                "limit": limit,
+                "since": self.format_cursor(since),
+                "cursor": self.format_cursor(cursor),
+                "next": next_uri,
+            },
+        })
+
+    def get_stream(self, request, since, models):
+        '''
+            Streams out all of the events after the cursor, database after
+            database, as they get read in chunks.
+        '''
+        change_log = self._meta.change_log
+
+        def read():
+            for alias, sequence in sorted(since.items()):
+                while True:
+                    events = change_log.read(alias, sequence,
+                                             self._meta.stream_chunk_size,
+                                             models)
+                    if not events:
+                        break
+                    yield [self.dehydrate_event(alias, event)
+                           for event in events]
+                    sequence = events[-1].pk
+
+        stream_response(self, request, read())
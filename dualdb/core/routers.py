@@ -3,7 +3,9 @@ Created on 08-Apr-2014
 
 @author: Rahul
 '''
-from dualdb.core.registry import REGISTRY
+from dualdb.core.instrumentation import get_stats
+from dualdb.core.registry import REPLICAS, get_primary, route, syncs_to
+from dualdb.core.replicas import pin, is_pinned
 
 
 class ModelRouter(object):
@@ -14,26 +16,56 @@ class ModelRouter(object):
     def db_for_read(self, model, **hints):
         '''
             Returns the database name to perform read queries on this model.
+            Reads are spread over the replicas, if any, unless the current
+            request has already written to the primary.
         '''
-        return self._get_db(model)
+        db = self._get_db(model, hints.get("instance"))
+        replica_set = REPLICAS.get(db)
+        if replica_set is not None and not is_pinned(db):
+            db = replica_set.choose()
+        stats = get_stats()
+        if stats is not None:
+            stats.route(db, "reads")
+        return db
 
     def db_for_write(self, model, **hints):
         '''
             Returns the database name to perform write queries on this model.
         '''
-        return self._get_db(model)
+        db = self._get_db(model, hints.get("instance"), allocate=True)
+        if db in REPLICAS:
+            pin(db)
+        stats = get_stats()
+        if stats is not None:
+            stats.route(db, "writes")
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''
+            Allows relations between objects read from a replica and ones
+            read from its primary.
+        '''
+        db1, db2 = obj1._state.db, obj2._state.db
+        if db1 and db2 and get_primary(db1) == get_primary(db2):
+            return True
+        return None
 
     def allow_syncdb(self, db, model):
         '''
             Returns if the model needs to be synchronized for this db.
         '''
         if not db == "default":
-            return db == self._get_db(model)
+            return syncs_to(db, model)
         return None
 
-    def _get_db(self, model):
+    def _get_db(self, model, instance=None, allocate=False):
         '''
             Returns the associated DB name for this model by looking up into
-            registry.
+            the routing table. For the sharded models, returns the shard of
+            the instance involved in the query; new instances routed for a
+            write get their id first when they are sharded by it.
         '''
-        return REGISTRY.get(model)
+        db_name, shard_set = route(model)
+        if shard_set is not None:
+            return shard_set.shard_for_instance(model, instance, allocate)
+        return db_name
@@ -0,0 +1,382 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from bisect import bisect_right
+from zlib import crc32
+
+from django.db import IntegrityError
+
+#Same as django.db.models.constants.LOOKUP_SEP; this module is imported
+#by the router while django.db is still being set up.
+LOOKUP_SEP = "__"
+
+#Model class to the ShardSet partitioning its rows.
+SHARDS = {}
+
+
+class ShardSet(object):
+    '''
+        Partitions the rows of a model over several databases by the value
+        of its shard key; by hash unless range upper bounds are given.
+    '''
+    def __init__(self, aliases, key=None, ranges=None):
+        self.aliases = list(aliases)
+        self.key = key
+        self.ranges = list(ranges) if ranges else None
+
+        if not self.aliases:
+            raise ValueError("At least one shard is required.")
+        if self.ranges is not None and \
+                len(self.ranges) != len(self.aliases) - 1:
+            raise ValueError("Range partitioning over {0} shards needs {1} "
+                             "upper bounds.".format(len(self.aliases),
+                                                    len(self.aliases) - 1))
+
+    def __contains__(self, alias):
+        return alias in self.aliases
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def shard_for_value(self, value):
+        '''
+            Returns the alias of the shard owning the given key value.
+        '''
+        if hasattr(value, "pk"):
+            value = value.pk
+
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            pass
+
+        if self.ranges is not None:
+            return self.aliases[bisect_right(self.ranges, value)]
+
+        if not isinstance(value, (int, long)):
+            value = crc32(unicode(value).encode("utf-8")) & 0xffffffff
+        return self.aliases[value % len(self.aliases)]
+
+    def shard_for_instance(self, model, instance=None, allocate=False):
+        '''
+            Returns the alias of the shard the given instance lives in or
+            belongs to. Falls back to the first shard when it can't be told.
+
+            With ``allocate``, new instances sharded by a primary key they
+            don't have yet get it first; the router is asked for the shard
+            to write to before pre_save is sent.
+        '''
+        if instance is not None:
+            if instance._state.db in self.aliases:
+                return instance._state.db
+
+            if self.key and isinstance(instance, model):
+                value = getattr(instance, self.key, None)
+                if value is None and allocate and len(self.aliases) > 1 \
+                        and instance._state.adding and \
+                        self.key == model._meta.pk.attname:
+                    instance.pk = value = next_id(
+                                            model._meta.concrete_model)
+                if value is not None:
+                    return self.shard_for_value(value)
+
+        return self.aliases[0]
+
+    def key_lookups(self, model):
+        '''
+            Returns the filter lookups which pin a query on the shard key.
+        '''
+        if not self.key:
+            return ()
+
+        names = [self.key]
+        if self.key == model._meta.pk.attname:
+            names.append("pk")
+        if self.key.endswith("_id"):
+            names.extend([self.key[:-3], self.key[:-3] + LOOKUP_SEP + "id",
+                          self.key[:-3] + LOOKUP_SEP + "pk"])
+        return names
+
+    def shards_for_filters(self, model, filters):
+        '''
+            Given the filter kwargs of a query, returns the aliases of the
+            shards which can have matching rows.
+        '''
+        aliases = None
+        for name in self.key_lookups(model):
+            for lookup in (name, name + LOOKUP_SEP + "exact"):
+                if lookup in filters:
+                    aliases = set([self.shard_for_value(filters[lookup])])
+
+            lookup = name + LOOKUP_SEP + "in"
+            if lookup in filters:
+                aliases = set(self.shard_for_value(value)
+                              for value in filters[lookup])
+
+        if aliases is None:
+            return list(self.aliases)
+        return [alias for alias in self.aliases if alias in aliases]
+
+
+def next_ids(model, count=1):
+    '''
+        Allocates the next ``count`` primary keys of a sharded model, so
+        that the ids generated by different shards never collide.
+    '''
+    from django.db import transaction
+    from django.db.models import F, Max
+    from dualdb.core.models import ShardSequence
+
+    name = "{0}.{1}".format(model._meta.app_label, model._meta.object_name)
+    sequences = ShardSequence.objects.db_manager("default")
+
+    with transaction.commit_on_success(using="default"):
+        if not sequences.filter(name=name).update(value=F("value") + count):
+            #First allocation, start after the rows already present.
+            start = 0
+            for alias in SHARDS[model].aliases:
+                current = model._default_manager.using(alias).aggregate(
+                                                    top=Max("pk"))["top"]
+                start = max(start, current or 0)
+            try:
+                sequences.create(name=name, value=start + count)
+            except IntegrityError:
+                #Lost the race against another process, just increment.
+                sequences.filter(name=name).update(value=F("value") + count)
+        top = sequences.get(name=name).value
+    return range(top - count + 1, top + 1)
+
+
+def next_id(model):
+    '''
+        Allocates the next primary key of a sharded model.
+    '''
+    return next_ids(model)[0]
+
+
+def assign_id(sender, instance, raw=False, **kwargs):
+    '''
+        pre_save hook allocating primary keys of the models spread over
+        more than one shard.
+    '''
+    if raw or instance.pk is not None or len(SHARDS[sender]) < 2:
+        return
+    instance.pk = next_id(sender)
+
+
+def shard_queryset(queryset):
+    '''
+        Returns a query over every shard of the queryset model; leaves the
+        queryset untouched for the unsharded models.
+    '''
+    shard_set = SHARDS.get(queryset.model)
+    if shard_set is None or len(shard_set) < 2:
+        return queryset
+    return ShardedQuerySet([queryset.using(alias)
+                            for alias in shard_set.aliases])
+
+
+class ShardedQuerySet(object):
+    '''
+        Scatters a query over the shards of a model and gathers the rows
+        back in order, so that slicing and counting behave like they do
+        over a single database.
+    '''
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self.model = querysets[0].model
+        self._result_cache = None
+
+    def _chain(self, method, *args, **kwargs):
+        '''
+            Applies the queryset method on every shard query.
+        '''
+        return ShardedQuerySet([getattr(queryset, method)(*args, **kwargs)
+                                for queryset in self.querysets])
+
+    def all(self):
+        return self._chain("all")
+
+    def _clone(self):
+        return self._chain("_clone")
+
+    def exclude(self, *args, **kwargs):
+        return self._chain("exclude", *args, **kwargs)
+
+    def order_by(self, *field_names):
+        return self._chain("order_by", *field_names)
+
+    def only(self, *fields):
+        return self._chain("only", *fields)
+
+    def defer(self, *fields):
+        return self._chain("defer", *fields)
+
+    def select_related(self, *fields):
+        return self._chain("select_related", *fields)
+
+    def distinct(self, *fields):
+        return self._chain("distinct", *fields)
+
+    def values(self, *fields):
+        '''
+            Reads the rows as dicts of the given fields, along with the ones
+            they get gathered in order by.
+        '''
+        fields = list(fields)
+        for field_name in self._ordering():
+            name = self._get_sort_name(field_name.lstrip("-"))
+            if name not in fields:
+                fields.append(name)
+        return self._chain("values", *fields)
+
+    def filter(self, *args, **kwargs):
+        '''
+            Filters every shard query, dropping the shards which can't
+            match a filter on the shard key.
+        '''
+        aliases = SHARDS[self.model].shards_for_filters(self.model, kwargs)
+        querysets = [queryset for queryset in self.querysets
+                     if queryset.db in aliases]
+        if not querysets:
+            querysets = [self.querysets[0].none()]
+        return ShardedQuerySet([queryset.filter(*args, **kwargs)
+                                for queryset in querysets])
+
+    def get(self, *args, **kwargs):
+        '''
+            Returns the one object matching the lookups across all shards.
+        '''
+        matches = list(self.filter(*args, **kwargs)[:2])
+        if not matches:
+            raise self.model.DoesNotExist("{0} matching query does not "
+                            "exist.".format(self.model._meta.object_name))
+        if len(matches) > 1:
+            raise self.model.MultipleObjectsReturned("get() returned more "
+                    "than one {0}.".format(self.model._meta.object_name))
+        return matches[0]
+
+    @property
+    def ordered(self):
+        return True
+
+    @property
+    def query(self):
+        #The shard queries only differ by the database they run on.
+        return self.querysets[0].query
+
+    def _scatter(self, function, querysets=None):
+        '''
+            Calls the function with every shard query, on all of the shards
+            at once; returns the results in the order of the shards.
+        '''
+        from dualdb.core.executor import EXECUTOR
+
+        return EXECUTOR.map((function, (queryset,))
+                            for queryset in querysets or self.querysets)
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return sum(self._scatter(lambda queryset: queryset.count()))
+
+    def exists(self):
+        return any(self._scatter(lambda queryset: queryset.exists()))
+
+    def update(self, **kwargs):
+        return sum(queryset.update(**kwargs) for queryset in self.querysets)
+
+    def delete(self):
+        for queryset in self.querysets:
+            queryset.delete()
+
+    def _ordering(self):
+        '''
+            Returns the order_by field names shared by the shard queries;
+            the primary key when the query is not ordered.
+        '''
+        query = self.query
+        ordering = list(query.order_by)
+        if not ordering and query.default_ordering:
+            ordering = list(self.model._meta.ordering)
+        return ordering or ["pk"]
+
+    def _get_sort_name(self, field_name):
+        '''
+            Returns the attribute an order_by field is read off, the lookup
+            itself when it spans relations.
+        '''
+        if LOOKUP_SEP in field_name:
+            return field_name
+        if field_name == "pk":
+            return self.model._meta.pk.attname
+        return self.model._meta.get_field(field_name).attname
+
+    def _sort_key(self, field_name):
+        '''
+            Returns the function which reads the value of an order_by field
+            off a fetched row.
+        '''
+        name = self._get_sort_name(field_name)
+        bits = name.split(LOOKUP_SEP)
+
+        def key(obj):
+            if isinstance(obj, dict):
+                #Rows read with values().
+                return obj.get(name)
+            for bit in bits:
+                obj = getattr(obj, bit, None)
+            return obj
+        return key
+
+    def _gather(self, stop=None):
+        '''
+            Fetches the first ``stop`` rows of every shard, all when it is
+            None, and merges them in the order of the query.
+        '''
+        ordering = self._ordering()
+        querysets = [queryset if queryset.ordered else
+                     queryset.order_by(*ordering)
+                     for queryset in self.querysets]
+        if stop is not None:
+            querysets = [queryset[:stop] for queryset in querysets]
+
+        rows = []
+        for fetched in self._scatter(list, querysets):
+            rows.extend(fetched)
+
+        #Stable sorts, least significant field first.
+        for field_name in reversed(ordering):
+            descending = field_name.startswith("-")
+            rows.sort(key=self._sort_key(field_name.lstrip("-")),
+                      reverse=descending)
+        return rows
+
+    def __iter__(self):
+        if self._result_cache is None:
+            self._result_cache = self._gather()
+        return iter(self._result_cache)
+
+    def __len__(self):
+        if self._result_cache is None:
+            self._result_cache = self._gather()
+        return len(self._result_cache)
+
+    def __nonzero__(self):
+        return self.exists()
+
+    def __getitem__(self, k):
+        if self._result_cache is not None:
+            return self._result_cache[k]
+
+        if isinstance(k, slice):
+            if k.step is not None or (k.start or 0) < 0 or \
+                    (k.stop is not None and k.stop < 0):
+                return list(self)[k]
+            return self._gather(k.stop)[k.start:k.stop]
+
+        if k < 0:
+            return list(self)[k]
+        return self._gather(k + 1)[k]
@@ -0,0 +1,11 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.dispatch import Signal
+
+#Sent once per model and database after a bulk write has been committed;
+#bulk_create and batched UPDATEs send no post_save of their own. The
+#instances are None when the rows were updated by a query.
+bulk_saved = Signal(providing_args=["instances", "created", "using"])
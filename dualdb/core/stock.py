@@ -0,0 +1,347 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from dualdb.core.models import Product
+from dualdb.core.signals import bulk_saved
+
+#Seconds the reserved and released quantities are held before being
+#written back.
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+class OutOfStock(Exception):
+    '''
+        Raised when more is reserved than there is left in stock.
+    '''
+    def __init__(self, pk, available):
+        super(OutOfStock, self).__init__(
+                "Only {0} left in stock for pk {1}.".format(available, pk))
+        self.pk = pk
+        self.available = available
+
+
+class StockCounters(object):
+    '''
+        Counts the stock of a model in process, so that reservations take
+        a lock held in memory rather than the write lock of its database.
+
+        The stock of a row is read once; reservations and releases then
+        move its counter at once and add up into a delta per row. The
+        deltas are written back every ``interval`` seconds, all of them in
+        one transaction, by the call falling due or by a thread of their
+        own when the database is not in memory. Deltas a write back fails
+        to write are kept for the next one. Every write back then checks
+        the counters against the database, which catches up with the other
+        processes and with a database recovering from failed writes.
+
+        The counters are only to be trusted while the process is the only
+        one writing the stock. With no ``interval``, as when several
+        processes serve the API, every move is written at once instead,
+        with an UPDATE refusing to take the stock below zero, before being
+        confirmed. So are the moves on rows found written elsewhere by a
+        write back; one that finds a row without the stock for the
+        reservations counted in the meantime can only log them as lost.
+
+        Writes on the rows made through the models drop their counters,
+        which get read again. Quantities reserved since the last write back
+        are lost with the process.
+    '''
+    def __init__(self, model, field, interval=DEFAULT_FLUSH_INTERVAL):
+        self.model = model
+        self.field = field
+        self.interval = interval
+        self.counters = {}
+        self.pending = {}
+        self.flushing = {}
+        #Rows written elsewhere, whose moves are written at once.
+        self.contended = set()
+        self.flushed = time.time()
+        self.failed = False
+        self._lock = threading.Lock()
+        #Held while the deltas are being written, and stock read.
+        self._writing = threading.Lock()
+        self._thread = None
+
+    def connect(self):
+        '''
+            Listens to the writes on the rows made elsewhere.
+        '''
+        post_save.connect(self.changed, sender=self.model)
+        post_delete.connect(self.changed, sender=self.model)
+        bulk_saved.connect(self.bulk_changed, sender=self.model)
+
+    def changed(self, sender, instance, **kwargs):
+        with self._lock:
+            self.counters.pop(instance.pk, None)
+
+    def bulk_changed(self, sender, instances, counted=False, **kwargs):
+        if counted:
+            return
+        with self._lock:
+            if instances is None:
+                self.counters.clear()
+            else:
+                for instance in instances:
+                    self.counters.pop(instance.pk, None)
+
+    @property
+    def alias(self):
+        return router.db_for_write(self.model)
+
+    def get_delta(self, pk):
+        '''
+            Returns the quantities counted but not written back yet;
+            called with the lock held.
+        '''
+        return self.pending.get(pk, 0) + self.flushing.get(pk, 0)
+
+    def load(self, pk):
+        '''
+            Reads the stock of the row into its counter; raises
+            DoesNotExist when there is no such row.
+        '''
+        with self._writing:
+            stock = list(self.model._default_manager.db_manager(
+                self.alias).filter(pk=pk).values_list(self.field, flat=True))
+            if not stock:
+                raise self.model.DoesNotExist(
+                                    "No {0} with pk {1}.".format(
+                                    self.model._meta.object_name, pk))
+            with self._lock:
+                if pk not in self.counters:
+                    self.counters[pk] = stock[0] + self.get_delta(pk)
+
+    def has_pending(self):
+        '''
+            Returns if any quantity is left to write back.
+        '''
+        return bool(self.pending or self.flushing)
+
+    def get_stock(self, pk, default=None):
+        '''
+            Returns the counted stock of the row, or the given default when
+            it is not counted.
+        '''
+        return self.counters.get(pk, default)
+
+    def reserve(self, pk, quantity):
+        '''
+            Takes the quantity off the stock of the row; returns the stock
+            left, raises OutOfStock when there isn't enough.
+        '''
+        return self.move(pk, -quantity)
+
+    def release(self, pk, quantity):
+        '''
+            Puts the quantity back in stock; returns the stock left.
+        '''
+        return self.move(pk, quantity)
+
+    def update(self, manager, pk, delta):
+        '''
+            Moves the stock of the row in the database, unless it would go
+            below zero; returns if it did.
+        '''
+        rows = manager.filter(pk=pk)
+        if delta < 0:
+            rows = rows.filter(**{self.field + "__gte": -delta})
+        return bool(rows.update(**{self.field: F(self.field) + delta}))
+
+    def write_through(self, pk, delta):
+        '''
+            Moves the stock of the row in the database at once; returns the
+            stock left, raises OutOfStock when there isn't enough.
+        '''
+        if pk in self.pending:
+            #Written first, as the database is checked without them.
+            self.flush()
+        with self._writing:
+            alias = self.alias
+            manager = self.model._default_manager.db_manager(alias)
+            with transaction.commit_on_success(using=alias):
+                moved = self.update(manager, pk, delta)
+                stock = list(manager.filter(pk=pk).values_list(self.field,
+                                                               flat=True))
+            with self._lock:
+                self.counters.pop(pk, None)
+        if not stock:
+            raise self.model.DoesNotExist("No {0} with pk {1}.".format(
+                                    self.model._meta.object_name, pk))
+        if not moved:
+            raise OutOfStock(pk, stock[0])
+        bulk_saved.send(sender=self.model, instances=[self.model(pk=pk)],
+                        created=False, using=alias, counted=True)
+        return stock[0]
+
+    def move(self, pk, delta):
+        if not self.interval or pk in self.contended:
+            return self.write_through(pk, delta)
+        if pk not in self.counters:
+            self.load(pk)
+        with self._lock:
+            if pk not in self.counters:
+                #Dropped by a write made elsewhere in the meantime.
+                available = None
+            else:
+                available = self.counters[pk] + delta
+                if delta < 0 and available < 0:
+                    raise OutOfStock(pk, self.counters[pk])
+                self.counters[pk] = available
+                self.pending[pk] = self.pending.get(pk, 0) + delta
+        if available is None:
+            return self.move(pk, delta)
+        self.schedule()
+        return available
+
+    def schedule(self):
+        '''
+            Writes the deltas back when they fall due, unless the thread
+            does it.
+        '''
+        if self._thread is None and self.interval and \
+                connections[self.alias].settings_dict["NAME"] != ":memory:":
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self.run,
+                                                    name="stock-flush")
+                    self._thread.daemon = True
+                    self._thread.start()
+        if self._thread is None and \
+                time.time() - self.flushed >= self.interval:
+            #Waits for a write back under way, which may have missed the
+            #latest deltas.
+            self.flush()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Stock deltas could not be written back.")
+            finally:
+                connections[self.alias].close()
+
+    def reset(self):
+        '''
+            Forgets the counters, and the deltas left to write.
+        '''
+        with self._writing:
+            with self._lock:
+                self.counters = {}
+                self.pending = {}
+                self.contended = set()
+                self.flushed = time.time()
+                self.failed = False
+
+    def flush(self, wait=True):
+        '''
+            Writes the deltas back in one transaction, then checks the
+            counters against the database; returns how many rows were
+            written, or None when another flush was under way and ``wait``
+            is False. Deltas taking the stock of a row below zero are
+            refused, and the row is written at once from then on.
+        '''
+        if not self._writing.acquire(wait):
+            return None
+        try:
+            with self._lock:
+                self.flushing, self.pending = self.pending, {}
+                self.flushed = time.time()
+            batch = dict((pk, delta) for pk, delta in self.flushing.items()
+                         if delta)
+            alias = self.alias
+            refused = {}
+            try:
+                with transaction.commit_on_success(using=alias):
+                    manager = self.model._default_manager.db_manager(alias)
+                    for pk, delta in sorted(batch.items()):
+                        if not self.update(manager, pk, delta):
+                            refused[pk] = delta
+            except DatabaseError:
+                logger.exception("Stock deltas of %s could not be written "
+                                 "back, retrying.", alias)
+                with self._lock:
+                    for pk, delta in self.flushing.items():
+                        self.pending[pk] = self.pending.get(pk, 0) + delta
+                    self.flushing = {}
+                self.failed = True
+                return 0
+            with self._lock:
+                self.flushing = {}
+                for pk in refused:
+                    del batch[pk]
+                self.contended.update(refused)
+            if refused:
+                logger.error("Stock of %s taken elsewhere, reservations "
+                             "lost: %s", self.model._meta.object_name,
+                             refused)
+            #Picks up the stock written by other processes too.
+            drifted = self.reconcile(locked=True)
+            if self.failed and drifted:
+                logger.warning("Stock counters of %s reset off the database "
+                               "on recovery: %s",
+                               self.model._meta.object_name, drifted)
+            elif drifted:
+                #Written elsewhere, the counters are not to be trusted.
+                with self._lock:
+                    self.contended.update(drifted)
+            self.failed = False
+        finally:
+            self._writing.release()
+        if batch:
+            bulk_saved.send(sender=self.model, instances=[self.model(pk=pk)
+                            for pk in sorted(batch)], created=False,
+                            using=alias, counted=True)
+        return len(batch)
+
+    def reconcile(self, locked=False):
+        '''
+            Reads the stock of all of the counted rows again, and sets their
+            counters to it plus the deltas left to write; returns the rows
+            whose counter was off.
+        '''
+        if not locked:
+            self._writing.acquire()
+        try:
+            with self._lock:
+                pks = list(self.counters)
+            if not pks:
+                return []
+            stock = dict(self.model._default_manager.db_manager(
+                    self.alias).filter(pk__in=pks).values_list("pk",
+                                                               self.field))
+            drifted = []
+            with self._lock:
+                for pk in pks:
+                    if pk not in self.counters:
+                        continue
+                    if pk not in stock:
+                        del self.counters[pk]
+                        continue
+                    counted = stock[pk] + self.get_delta(pk)
+                    if self.counters[pk] != counted:
+                        drifted.append(pk)
+                        self.counters[pk] = counted
+            return drifted
+        finally:
+            if not locked:
+                self._writing.release()
+
+
+#Stock of the products, reserved and released by the products resource.
+STOCK = StockCounters(Product, "stock", getattr(settings,
+                      "STOCK_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL))
+STOCK.connect()
@@ -0,0 +1,98 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.http import StreamingHttpResponse
+from tastypie.exceptions import BadRequest, ImmediateHttpResponse
+from tastypie.utils.mime import build_content_type
+
+try:
+    from lxml.etree import tostring
+except ImportError:
+    tostring = None
+
+
+def to_xml_string(serializer, data, options, name=None, depth=0):
+    '''
+        Returns the UTF-8 XML of the element the serializer builds out of
+        the data; written out directly when the serializer can.
+    '''
+    if hasattr(serializer, "to_xml_string"):
+        return serializer.to_xml_string(data, options, name=name, depth=depth)
+    return tostring(serializer.to_etree(data, options, name=name,
+                                        depth=depth), encoding="utf-8")
+
+
+def get_meta(count):
+    '''
+        Returns the meta of a streamed list; it holds every row, so there
+        are no pages next to it.
+    '''
+    return {
+        "limit": 0,
+        "offset": 0,
+        "previous": None,
+        "next": None,
+        "total_count": count,
+    }
+
+
+def stream_json(serializer, chunks, collection_name, options=None):
+    '''
+        Yields the JSON of a list response a chunk of bundles at a time;
+        the same document the serializer would build in one go.
+    '''
+    yield '{{"{0}": ['.format(collection_name)
+
+    count = 0
+    for bundles in chunks:
+        data = u", ".join(serializer.to_json(bundle, options)
+                          for bundle in bundles)
+        yield (u", " + data if count else data).encode("utf-8")
+        count += len(bundles)
+
+    meta = serializer.to_json(get_meta(count), options)
+    yield u'], "meta": {0}}}'.format(meta).encode("utf-8")
+
+
+def stream_xml(serializer, chunks, collection_name, options=None):
+    '''
+        Yields the XML of a list response a chunk of bundles at a time;
+        the same document the serializer would build in one go.
+    '''
+    yield "<?xml version='1.0' encoding='utf-8'?>\n<response>" \
+        '<{0} type="list">'.format(collection_name)
+
+    count = 0
+    for bundles in chunks:
+        yield "".join(to_xml_string(serializer, bundle, options, depth=2)
+                      for bundle in bundles)
+        count += len(bundles)
+
+    meta = to_xml_string(serializer, get_meta(count), options, name="meta",
+                         depth=1)
+    yield "</{0}>{1}</response>".format(collection_name, meta)
+
+
+#Formats the lists can be streamed in.
+STREAMERS = {
+    "application/json": stream_json,
+    "application/xml": stream_xml,
+}
+
+
+def stream_response(resource, request, chunks):
+    '''
+        Streams out the list of the chunks of data the resource yields, in
+        the format asked for, through dispatch; raises BadRequest for the
+        formats which can't be streamed.
+    '''
+    desired_format = resource.determine_format(request)
+    if desired_format not in STREAMERS:
+        raise BadRequest("Lists can only be streamed as JSON or XML.")
+    stream = STREAMERS[desired_format](resource._meta.serializer, chunks,
+                                       resource._meta.collection_name)
+    #Tastypie only lets HttpResponse instances through dispatch.
+    raise ImmediateHttpResponse(response=StreamingHttpResponse(stream,
+                            content_type=build_content_type(desired_format)))
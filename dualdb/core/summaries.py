@@ -0,0 +1,226 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_init, post_save, \
+    pre_save
+from dualdb.core.registry import route
+from dualdb.core.signals import bulk_saved
+
+#Summary model to the OrderSummaries maintaining it.
+SUMMARIES = {}
+
+
+class OrderSummaries(object):
+    '''
+        Keeps the count and total amount of the orders of every customer
+        in a summary model, so that reading them costs a lookup instead of
+        an aggregate over the orders.
+
+        Every saved or deleted order adds its difference to the summary of
+        its customer. The values an order was read with are noted down on
+        post_init, so updates cost no extra query; when they are missing,
+        the summary of the customer is aggregated again. Rows updated by a
+        query leave no trace, their database is rebuilt instead.
+    '''
+    def __init__(self, order_model, summary_model):
+        self.order_model = order_model
+        self.summary_model = summary_model
+
+    def connect(self):
+        '''
+            Listens to the writes on the orders.
+        '''
+        post_init.connect(self.remember, sender=self.order_model)
+        pre_save.connect(self.saving, sender=self.order_model)
+        post_save.connect(self.saved, sender=self.order_model)
+        post_delete.connect(self.deleted, sender=self.order_model)
+        bulk_saved.connect(self.bulk_saved, sender=self.order_model)
+
+    def get_values(self, instance):
+        '''
+            Returns the customer and the amount of the order, None if any of
+            them was not read.
+        '''
+        values = (instance.__dict__.get("customer_id"),
+                  instance.__dict__.get("amount"))
+        if None in values:
+            return None
+        return values
+
+    def remember(self, sender, instance, **kwargs):
+        instance._summarized = self.get_values(instance)
+
+    def saving(self, sender, instance, raw=False, using=None, **kwargs):
+        '''
+            Notes down what the order was before being saved.
+        '''
+        if raw:
+            return
+        if not instance._state.adding:
+            instance._summary_before = instance._summarized
+        elif instance.pk is not None:
+            #Made up by hand, it may be overwriting a row.
+            rows = sender._default_manager.using(using).filter(
+                    pk=instance.pk).values_list("customer_id", "amount")
+            instance._summary_before = rows[0] if rows else None
+        else:
+            instance._summary_before = None
+
+    def saved(self, sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        deltas = {}
+        stale = set()
+        before = instance.__dict__.pop("_summary_before", None)
+        if before is not None and not created:
+            self.add(deltas, before, -1)
+        elif not created:
+            stale.add(instance.customer_id)
+        self.add(deltas, self.get_values(instance), 1)
+        instance._summarized = self.get_values(instance)
+        #Units of work send bulk_saved for the rows they saved one by one.
+        instance._summary_counted = True
+        self.apply(deltas, stale)
+
+    def deleted(self, sender, instance, **kwargs):
+        values = self.get_values(instance)
+        if values is None:
+            self.apply({}, set([instance.__dict__.get("customer_id")]))
+        else:
+            self.apply(self.add({}, values, -1), set())
+
+    def bulk_saved(self, sender, instances, created, using, **kwargs):
+        if instances is None:
+            return self.rebuild(using)
+
+        deltas = {}
+        stale = set()
+        for instance in instances:
+            if instance.__dict__.pop("_summary_counted", False):
+                continue
+            if not created:
+                before = getattr(instance, "_summarized", None)
+                if before is None:
+                    stale.add(instance.customer_id)
+                    continue
+                self.add(deltas, before, -1)
+            self.add(deltas, self.get_values(instance), 1)
+            instance._summarized = self.get_values(instance)
+        self.apply(deltas, stale)
+
+    def add(self, deltas, values, sign):
+        '''
+            Adds the order with the given values, or takes it off when the
+            sign is negative, into the deltas by customer.
+        '''
+        if values is not None:
+            customer_id, amount = values
+            delta = deltas.setdefault(customer_id, [0, 0])
+            delta[0] += sign
+            delta[1] += sign * amount
+        return deltas
+
+    def get_db(self, customer_id):
+        '''
+            Returns the database the summary of the customer is kept in.
+        '''
+        return router.db_for_write(self.summary_model,
+                        instance=self.summary_model(customer_id=customer_id))
+
+    def apply(self, deltas, stale):
+        '''
+            Adds the deltas to the summaries of their customers, and
+            aggregates the ones of the stale customers again.
+        '''
+        aliases = set()
+        for customer_id, (count, amount) in deltas.items():
+            if customer_id in stale or (count, amount) == (0, 0):
+                continue
+            alias = self.get_db(customer_id)
+            aliases.add(alias)
+            summaries = self.summary_model._default_manager.db_manager(alias)
+            changes = {"order_count": F("order_count") + count,
+                       "total_amount": F("total_amount") + amount}
+            if summaries.filter(pk=customer_id).update(**changes) or \
+                    count <= 0:
+                #Orders taken off a customer with no summary went along
+                #with the customer.
+                continue
+            try:
+                summaries.create(customer_id=customer_id, order_count=count,
+                                 total_amount=amount)
+            except IntegrityError:
+                #Created meanwhile, by a concurrent write.
+                summaries.filter(pk=customer_id).update(**changes)
+
+        stale.discard(None)
+        for customer_id in stale:
+            alias = self.get_db(customer_id)
+            aliases.add(alias)
+            self.refresh(alias, [customer_id])
+
+        for alias in aliases:
+            #The responses built off the summaries are out of date.
+            bulk_saved.send(sender=self.summary_model, instances=None,
+                            created=False, using=alias)
+
+    def aggregate(self, alias, customer_ids=None):
+        '''
+            Returns the summaries of the orders in the database; of the
+            given customers only, when given.
+        '''
+        orders = self.order_model._default_manager.using(alias)
+        if customer_ids is not None:
+            orders = orders.filter(customer__in=customer_ids)
+        rows = orders.order_by().values("customer").annotate(
+                    order_count=Count("pk"), total_amount=Sum("amount"))
+        return [self.summary_model(customer_id=row["customer"],
+                                   order_count=row["order_count"],
+                                   total_amount=row["total_amount"])
+                for row in rows]
+
+    def refresh(self, alias, customer_ids):
+        '''
+            Aggregates the summaries of the given customers again.
+        '''
+        summaries = self.summary_model._default_manager.db_manager(alias)
+        summaries.filter(pk__in=customer_ids).delete()
+        summaries.bulk_create(self.aggregate(alias, customer_ids))
+
+    def rebuild(self, using=None):
+        '''
+            Aggregates all of the summaries again off the orders, in the
+            given database or all of the ones holding orders. Returns how
+            many summaries were written.
+        '''
+        if using is None:
+            db_name, shard_set = route(self.summary_model)
+            aliases = shard_set.aliases if shard_set else [db_name]
+        else:
+            aliases = [using]
+
+        written = 0
+        for alias in aliases:
+            summaries = self.summary_model._default_manager.db_manager(alias)
+            rows = self.aggregate(alias)
+            with transaction.commit_on_success(using=alias):
+                summaries.all().delete()
+                summaries.bulk_create(rows)
+            written += len(rows)
+            bulk_saved.send(sender=self.summary_model, instances=None,
+                            created=False, using=alias)
+        return written
+
+
+def connect_summaries(order_model, summary_model):
+    '''
+        Maintains the summary model off the writes on the orders.
+    '''
+    summaries = OrderSummaries(order_model, summary_model)
+    summaries.connect()
+    SUMMARIES[summary_model] = summaries
+    return summaries
@@ -0,0 +1,384 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+from Queue import Empty
+from StringIO import StringIO
+from multiprocessing import Process, Queue
+from optparse import make_option
+
+from django.conf import settings
+from django.core import serializers
+from django.db import connections, router, transaction
+from django.db.models import get_apps
+from django.test import testcases
+from django.test.simple import DjangoTestSuiteRunner
+from django.utils import unittest
+from dualdb.core.pool import POOLS
+
+#Database the tables of a test database are copied into, on its connection.
+SNAPSHOT_SCHEMA = "dualdb_snapshot"
+
+
+class Snapshot(object):
+    '''
+        Copy of the rows of every table of a SQLite database, restored in
+        plain SQL. It is kept in a database attached to the connection: an
+        in-memory one for in-memory databases, a template file next to the
+        database otherwise, which the pooled connections attach as needed.
+    '''
+    def __init__(self, alias, schema=SNAPSHOT_SCHEMA):
+        self.alias = alias
+        self.schema = schema
+        self.tables = []
+        name = connections[alias].settings_dict["NAME"]
+        self.location = name if name == ":memory:" else \
+            "{0}.{1}".format(name, schema)
+
+    def attach(self, cursor):
+        #Databases can't get attached within a transaction.
+        transaction.commit_unless_managed(using=self.alias)
+        cursor.execute("PRAGMA database_list")
+        if self.schema not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("ATTACH DATABASE %s AS {0}".format(
+                    connections[self.alias].ops.quote_name(self.schema)),
+                    [self.location])
+
+    def take(self):
+        connection = connections[self.alias]
+        quote_name = connection.ops.quote_name
+        if self.location != ":memory:" and os.path.exists(self.location):
+            os.remove(self.location)
+        cursor = connection.cursor()
+        self.attach(cursor)
+        self.tables = connection.introspection.table_names(cursor)
+        for table in self.tables:
+            cursor.execute("CREATE TABLE {0}.{1} AS SELECT * FROM main.{1}"
+                           .format(quote_name(self.schema), quote_name(table)))
+        transaction.commit_unless_managed(using=self.alias)
+        return self
+
+    def restore(self):
+        connection = connections[self.alias]
+        quote_name = connection.ops.quote_name
+        cursor = connection.cursor()
+        self.attach(cursor)
+        for table in connection.introspection.table_names(cursor):
+            cursor.execute("DELETE FROM main.{0}".format(quote_name(table)))
+            if table in self.tables:
+                cursor.execute("INSERT INTO main.{1} SELECT * FROM {0}.{1}"
+                               .format(quote_name(self.schema),
+                                       quote_name(table)))
+        transaction.commit_unless_managed(using=self.alias)
+
+    def drop(self):
+        transaction.commit_unless_managed(using=self.alias)
+        connections[self.alias].cursor().execute("DETACH DATABASE {0}".format(
+                        connections[self.alias].ops.quote_name(self.schema)))
+        if self.location != ":memory:" and os.path.exists(self.location):
+            os.remove(self.location)
+        self.tables = []
+
+
+class FixtureCache(object):
+    '''
+        Loads fixtures the way loaddata does, off objects deserialized once
+        per fixture and database rather than off the files every time.
+
+        The objects are saved raw, sending the same signals loaddata does.
+        Fixtures named without their format, compressed or specific to a
+        database are left to loaddata.
+    '''
+    def __init__(self):
+        self.objects = {}
+        self.fixture_dirs = [os.path.join(os.path.dirname(app.__file__),
+                                          "fixtures") for app in get_apps()]
+        self.fixture_dirs.extend(settings.FIXTURE_DIRS)
+        self.fixture_dirs.append("")
+
+    def find(self, label):
+        '''
+            Returns the format and the paths of the fixture; None when
+            loaddata has to look it up.
+        '''
+        name, _, format = label.rpartition(".")
+        if not name or "." in os.path.basename(name) or \
+                format not in serializers.get_public_serializer_formats():
+            return None
+        if os.path.isabs(label):
+            paths = [label] if os.path.exists(label) else []
+        else:
+            paths = [path for path in (os.path.join(fixture_dir, label)
+                     for fixture_dir in self.fixture_dirs)
+                     if os.path.exists(path)]
+        return (format, paths) if paths else None
+
+    def get_objects(self, label, alias):
+        key = (label, alias)
+        if key not in self.objects:
+            found = self.find(label)
+            if found is None:
+                self.objects[key] = None
+            else:
+                format, paths = found
+                objects = []
+                for path in paths:
+                    with open(path) as fixture:
+                        objects.extend(serializers.deserialize(format,
+                                        fixture.read(), using=alias))
+                self.objects[key] = objects
+        return self.objects[key]
+
+    def load(self, labels, alias, commit=True):
+        '''
+            Loads the fixtures into the database, within a transaction of
+            its own unless ``commit`` is False; returns the fixtures left to
+            loaddata.
+        '''
+        if commit:
+            transaction.commit_unless_managed(using=alias)
+            transaction.enter_transaction_management(using=alias)
+            transaction.managed(True, using=alias)
+        missed = []
+        try:
+            for label in labels:
+                objects = self.get_objects(label, alias)
+                if objects is None:
+                    missed.append(label)
+                    continue
+                for obj in objects:
+                    if router.allow_syncdb(alias, obj.object.__class__):
+                        obj.save(using=alias)
+        except:
+            if commit:
+                transaction.rollback(using=alias)
+                transaction.leave_transaction_management(using=alias)
+            raise
+        if commit:
+            transaction.commit(using=alias)
+            transaction.leave_transaction_management(using=alias)
+        return missed
+
+
+class ParallelResult(object):
+    '''
+        Results of the test processes, added up.
+    '''
+    def __init__(self):
+        self.testsRun = 0
+        self.failures = []
+        self.errors = []
+        self.skipped = 0
+
+    def add(self, tests_run, failures, errors, skipped):
+        self.testsRun += tests_run
+        self.failures.extend(failures)
+        self.errors.extend(errors)
+        self.skipped += skipped
+
+    def wasSuccessful(self):
+        return not (self.failures or self.errors)
+
+
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            for inner in iter_tests(test):
+                yield inner
+        else:
+            yield test
+
+
+def split(suite, count):
+    '''
+        Splits the tests into at most ``count`` suites of about the same
+        size, keeping the tests of a class together and in order.
+    '''
+    classes = []
+    by_class = {}
+    for test in iter_tests(suite):
+        if type(test) not in by_class:
+            classes.append(type(test))
+            by_class[type(test)] = []
+        by_class[type(test)].append(test)
+
+    shares = [[] for _ in xrange(min(count, len(classes)))]
+    for test_class in sorted(classes, key=lambda test_class:
+                             -len(by_class[test_class])):
+        min(shares, key=len).append(test_class)
+    return [unittest.TestSuite([test for test_class in classes
+                                if test_class in share
+                                for test in by_class[test_class]])
+            for share in shares]
+
+
+class SnapshotTestRunner(DjangoTestSuiteRunner):
+    '''
+        Runs the tests off test databases provisioned once.
+
+        Every test database is snapshotted right after it is created; the
+        flush closing the transactional tests restores the snapshot instead,
+        and fixtures get loaded off a FixtureCache. With --parallel, the
+        classes of tests are shared out between processes forked once the
+        databases are set up; each of them runs on its own copies of the
+        databases, the in-memory ones being copied along by the fork.
+    '''
+    option_list = (
+        make_option("--parallel", type="int", default=1,
+                    help="Processes to run the test classes in."),
+    )
+
+    def __init__(self, parallel=1, **kwargs):
+        super(SnapshotTestRunner, self).__init__(**kwargs)
+        self.parallel = parallel or 1
+        self.snapshots = {}
+        self.fixtures = None
+
+    def setup_test_environment(self, **kwargs):
+        super(SnapshotTestRunner, self).setup_test_environment(**kwargs)
+        self.call_command = testcases.call_command
+        testcases.call_command = self.run_command
+        #The caches kept in files, like the shared model versions, go to a
+        #directory of the run's own.
+        self.cache_dir = tempfile.mkdtemp(prefix="dualdb-caches-")
+        self.cache_locations = {}
+        for alias, conf in settings.CACHES.items():
+            if conf["BACKEND"].endswith(".FileBasedCache"):
+                self.cache_locations[alias] = conf["LOCATION"]
+                conf["LOCATION"] = os.path.join(self.cache_dir, alias)
+
+    def teardown_test_environment(self, **kwargs):
+        testcases.call_command = self.call_command
+        for alias, location in self.cache_locations.items():
+            settings.CACHES[alias]["LOCATION"] = location
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super(SnapshotTestRunner, self).teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        old_config = super(SnapshotTestRunner, self).setup_databases(**kwargs)
+        self.fixtures = FixtureCache()
+        for alias in connections:
+            if connections[alias].vendor == "sqlite" and \
+                    not connections[alias].settings_dict["TEST_MIRROR"]:
+                self.snapshots[alias] = Snapshot(alias).take()
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        for snapshot in self.snapshots.values():
+            snapshot.drop()
+        self.snapshots = {}
+        super(SnapshotTestRunner, self).teardown_databases(old_config,
+                                                           **kwargs)
+
+    def run_command(self, name, *args, **options):
+        '''
+            Stands in for call_command within the test cases.
+        '''
+        alias = options.get("database", "default")
+        if name == "flush" and alias in self.snapshots:
+            self.snapshots[alias].restore()
+            return
+        if name == "loaddata" and self.fixtures is not None:
+            args = self.fixtures.load(args, alias, options.get("commit",
+                                                               True))
+            if not args:
+                return
+        return self.call_command(name, *args, **options)
+
+    def run_suite(self, suite, **kwargs):
+        if self.parallel < 2:
+            return super(SnapshotTestRunner, self).run_suite(suite, **kwargs)
+
+        started = time.time()
+        queue = Queue()
+        processes = [Process(target=self.run_share, args=(index, share, queue))
+                     for index, share in enumerate(split(suite,
+                                                         self.parallel))]
+        for process in processes:
+            process.start()
+
+        result = ParallelResult()
+        reported = set()
+        while len(reported) < len(processes):
+            try:
+                index, output, counts = queue.get(timeout=1)
+            except Empty:
+                if any(process.is_alive() for process in processes):
+                    continue
+                break
+            reported.add(index)
+            sys.stderr.write(output)
+            result.add(*counts)
+        for process in processes:
+            process.join()
+        for index in set(xrange(len(processes))) - reported:
+            result.errors.append(("process {0}".format(index),
+                                  "Exited with code {0} before reporting."
+                                  .format(processes[index].exitcode)))
+
+        sys.stderr.write("\n{0}\nRan {1} tests in {2:.3f}s over {3} "
+                         "processes\n\n{4}\n".format("-" * 70,
+                         result.testsRun, time.time() - started,
+                         len(processes), "OK" if result.wasSuccessful() else
+                         "FAILED (failures={0}, errors={1})".format(
+                            len(result.failures), len(result.errors))))
+        for title, errors in (("FAIL", result.failures),
+                              ("ERROR", result.errors)):
+            for test, traceback in errors:
+                sys.stderr.write("{0}: {1}\n{2}\n".format(title, test,
+                                                          traceback))
+        return result
+
+    def run_share(self, index, suite, queue):
+        '''
+            Runs the share of the tests of a forked process, and reports
+            back its results.
+        '''
+        copies = self.isolate(index)
+        output = StringIO()
+        output.write("Process {0}, {1} tests:\n".format(index,
+                                                        suite.countTestCases()))
+        result = unittest.TextTestRunner(stream=output,
+                    verbosity=self.verbosity, failfast=self.failfast).run(suite)
+        queue.put((index, output.getvalue(), (result.testsRun,
+                   [(str(test), traceback) for test, traceback in
+                    result.failures],
+                   [(str(test), traceback) for test, traceback in
+                    result.errors],
+                   len(result.skipped))))
+        for alias in copies:
+            connections[alias].close()
+            os.remove(connections[alias].settings_dict["NAME"])
+
+    def isolate(self, index):
+        '''
+            Gives the process copies of its own of the test databases kept
+            in files, in-memory ones were copied along by the fork, and of
+            the caches kept in files. Returns the aliases of the copied
+            databases.
+        '''
+        copies = []
+        for alias in self.snapshots:
+            connection = connections[alias]
+            name = connection.settings_dict["NAME"]
+            if name == ":memory:" or name.startswith("file:"):
+                continue
+            copy = "{0}.{1}".format(name, index)
+            connection.close()
+            shutil.copyfile(name, copy)
+            connection.settings_dict["NAME"] = copy
+            #The pool of the parent connects to its own file.
+            POOLS.pop(alias, None)
+            copies.append(alias)
+        #Versions bumped by the writes of the other processes would make
+        #this one miss its cached responses.
+        for alias in self.cache_locations:
+            conf = settings.CACHES[alias]
+            conf["LOCATION"] = os.path.join(conf["LOCATION"], str(index))
+        return copies
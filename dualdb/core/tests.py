@@ -3,8 +3,61 @@ Created on 08-Apr-2014
 
 @author: Rahul
 '''
+import datetime
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from lxml import etree
+from tastypie.bundle import Bundle
+from tastypie.serializers import Serializer
 from tastypie.test import ResourceTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import unittest
 from copy import deepcopy
+from StringIO import StringIO
+from django.core.management import call_command
+from django.test.client import RequestFactory
+from django.utils import timezone
+from django.utils.http import http_date
+from django.db.models.query_utils import deferred_class_factory
+from dualdb.core.bulk import lock_table
+from dualdb.core.cache import LRUCache, ResponseCache, get_label
+from dualdb.core.catalog import Catalog
+from dualdb.core.changes import CHANGES
+from dualdb.core.indexes import IndexAdvisor
+from dualdb.core.management.commands import benchmark_api
+from dualdb.core.instrumentation import METRICS, QueryStats, activate, \
+    deactivate
+from dualdb.core import executor
+from dualdb.core.backends.sqlite3.base import DatabaseWrapper
+from dualdb import evented
+from dualdb.evented import Server, get_process_local
+from dualdb.core import pool
+from dualdb.core.pool import ConnectionPool, PoolTimeout, POOLS
+from dualdb.core.models import Product, Order, Customer, Supplier, \
+    WorkLog, ChangeEvent, \
+    CustomerOrderSummary, \
+    AppliedWork
+from dualdb.core.resources import CustomersResource, OrdersResource, \
+    ProductsResource, SuppliersResource
+from dualdb.core.registry import REPLICAS, RoutingTable, thaw
+from dualdb.core.replicas import ReplicaSet, is_pinned, pin, unpin_all
+from dualdb.core.routers import ModelRouter
+from dualdb.core.serializers import FastSerializer
+from dualdb.core.shards import ShardSet, ShardedQuerySet, SHARDS
+from dualdb.core.stock import STOCK
+from dualdb.core.testing import FixtureCache, Snapshot, split
+from dualdb.core.work import UnitOfWork, WorkFailed, recover
 
 
 class BaseClient(ResourceTestCase):
@@ -21,20 +74,22 @@ class BaseClient(ResourceTestCase):
         bits.extend(args)
         return '/'.join(bits)
 
-    def get_list(self, resource_name, api_name="v1", accept_format="json"):
+    def get_list(self, resource_name, api_name="v1", accept_format="json",
+                 data=None):
         '''
             Returns the result of list URI call on a resource.
         '''
         uri = self.get_full_uri(api_name, resource_name)
-        resp = self.api_client.get(uri, format=accept_format)
+        resp = self.api_client.get(uri, format=accept_format, data=data)
         return resp
 
-    def get_json_list(self, resource_name, api_name="v1"):
+    def get_json_list(self, resource_name, api_name="v1", data=None):
         '''
             Expects the valid JSON data for list URI call on
             the given resource.
         '''
-        resp = self.get_list(resource_name, api_name, accept_format="json")
+        resp = self.get_list(resource_name, api_name, accept_format="json",
+                             data=data)
         self.assertHttpOK(resp)
         self.assertValidJSONResponse(resp)
         data = self.deserialize(resp)
@@ -185,7 +240,8 @@ class BaseClient(ResourceTestCase):
             Makes a LIST URI call for this resource and returns the total
             count.
         '''
-        list_data = self.get_json_list(resource_name)
+        list_data = self.get_json_list(resource_name,
+                                       data={"total_count": "true"})
         total_count = list_data["meta"]["total_count"]
         return total_count
 
@@ -295,6 +351,29 @@ class CustomersTest(BaseClient):
         '''
         self.assert_end_to_end_delete_flow(self.resource_name, self.data)
 
+    def test_sparse_fields(self):
+        '''
+            Only the fields asked for are read and returned.
+        '''
+        connection = connections["transactions"]
+        connection.use_debug_cursor = True
+        try:
+            data = self.get_json_list(self.resource_name,
+                                      data={"fields": "username,email"})
+            selects = [query["sql"] for query in connection.queries
+                       if query["sql"].startswith("SELECT")]
+        finally:
+            connection.use_debug_cursor = None
+        for row in data["data"]:
+            self.assertEqual(set(row), set(["username", "email",
+                                            "resource_uri"]))
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNotIn("password", sql)
+
+        resp = self.get_list(self.resource_name, data={"fields": "secret"})
+        self.assertHttpBadRequest(resp)
+
 
 class SuppliersTest(BaseClient):
     '''
@@ -421,6 +500,79 @@ class OrdersTest(BaseClient):
         '''
         self.assert_end_to_end_delete_flow(self.resource_name, self.data)
 
+    def test_cursor_pagination(self):
+        '''
+            Pages are seeked to on (date, id) through the cursors, and the
+            total count is only given when asked for.
+        '''
+        for amount, date in ((1, "2014-04-07"), (2, "2014-04-09"),
+                             (3, "2014-04-10")):
+            Order.objects.create(amount=amount, date=date, customer_id=1)
+
+        def amounts(data):
+            return [row["amount"] for row in data["data"]]
+
+        data = self.get_json_list(self.resource_name, data={"limit": 2})
+        self.assertEqual(amounts(data), [1, 100.1])
+        self.assertNotIn("total_count", data["meta"])
+        self.assertIsNone(data["meta"]["previous"])
+
+        data = self.deserialize(self.api_client.get(data["meta"]["next"]))
+        self.assertEqual(amounts(data), [17.9, 2])
+        last = self.deserialize(self.api_client.get(data["meta"]["next"]))
+        self.assertEqual(amounts(last), [3])
+        self.assertIsNone(last["meta"]["next"])
+
+        data = self.deserialize(self.api_client.get(last["meta"]["previous"]))
+        self.assertEqual(amounts(data), [17.9, 2])
+        data = self.get_json_list(self.resource_name,
+                                  data={"total_count": "true"})
+        self.assertEqual(data["meta"]["total_count"], 5)
+
+    def test_filtering(self):
+        '''
+            Orders are filtered by customer and date.
+        '''
+        Order.objects.create(amount=1, date="2014-04-09", customer_id=1)
+        data = self.get_json_list(self.resource_name,
+                                  data={"customer": "1",
+                                        "date__gt": "2014-04-08"})
+        self.assertEqual([row["amount"] for row in data["data"]], [1])
+        data = self.get_json_list(self.resource_name,
+                                  data={"customer__in": "2,3"})
+        self.assertEqual(data["data"], [])
+        resp = self.get_list(self.resource_name, data={"amount": "1"})
+        self.assertHttpBadRequest(resp)
+
+    def test_stream_list(self):
+        '''
+            Streamed lists hold all of the rows, read in chunks, in both
+            JSON and XML.
+        '''
+        for amount in range(3):
+            Order.objects.create(amount=amount, date="2014-04-09",
+                                 customer_id=1)
+
+        uri = self.get_full_uri("v1", self.resource_name)
+        expected = self.get_json_list(self.resource_name,
+                                      data={"limit": 0})["data"]
+        chunk_size = OrdersResource._meta.stream_chunk_size
+        OrdersResource._meta.stream_chunk_size = 2
+        try:
+            resp = self.api_client.get(uri, format="json",
+                                       data={"stream": "true"})
+            data = json.loads("".join(resp.streaming_content))
+            self.assertEqual(data["data"], expected)
+            self.assertEqual(data["meta"]["total_count"], 5)
+
+            resp = self.api_client.get(uri, format="xml",
+                                       data={"stream": "true"})
+            root = etree.fromstring("".join(resp.streaming_content))
+            self.assertEqual(len(root.find("data")), 5)
+            self.assertEqual(root.find("meta/total_count").text, "5")
+        finally:
+            OrdersResource._meta.stream_chunk_size = chunk_size
+
 
 class ProductsTest(BaseClient):
     '''
@@ -485,3 +637,1585 @@ class ProductsTest(BaseClient):
             and checks the same has been deleted in LIST URI call.
         '''
         self.assert_end_to_end_delete_flow(self.resource_name, self.data)
+
+    def test_filtering(self):
+        '''
+            Products are filtered by title and price.
+        '''
+        data = self.get_json_list(self.resource_name,
+                                  data={"price__lt": "50"})
+        self.assertEqual([row["price"] for row in data["data"]], [11.9])
+        data = self.get_json_list(self.resource_name,
+                                  data={"title__startswith": "product",
+                                        "price__gte": "10"})
+        self.assertEqual([row["price"] for row in data["data"]], [11.9])
+        data = self.get_json_list(self.resource_name,
+                                  data={"title": "product1"})
+        self.assertEqual(data["data"], [])
+
+
+class StockTest(BaseClient):
+    '''
+        Tests the stock of products reserved in process and written back
+        in batch.
+    '''
+    multi_db = True
+    fixtures = ["suppliers.json", "products.json"]
+
+    def setUp(self):
+        super(StockTest, self).setUp()
+        STOCK.reset()
+        #Written back by the tests only.
+        self.interval = STOCK.interval
+        STOCK.interval = 60
+        self.stock = Product.objects.get(pk=1).stock
+
+    def tearDown(self):
+        STOCK.interval = self.interval
+        STOCK.reset()
+        super(StockTest, self).tearDown()
+
+    def post_stock(self, action, quantity, pk=1):
+        return self.api_client.post("/v1/products/{0}/{1}".format(pk, action),
+                                    format="json",
+                                    data={"quantity": quantity})
+
+    def test_reserve(self):
+        '''
+            Reservations are counted at once, and written back in batch.
+        '''
+        for _ in range(3):
+            response = self.post_stock("reserve", 2)
+            self.assertHttpOK(response)
+        self.assertEqual(self.deserialize(response)["stock"], self.stock - 6)
+        self.assertHttpOK(self.post_stock("release", 1))
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock)
+        data = self.get_json_detail("products", "1")
+        self.assertEqual(data["stock"], self.stock - 5)
+
+        self.assertEqual(STOCK.flush(), 1)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock - 5)
+        self.assertEqual(STOCK.flush(), 0)
+
+    def test_refused(self):
+        '''
+            No more than the stock can be reserved.
+        '''
+        response = self.post_stock("reserve", self.stock + 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.deserialize(response)["stock"], self.stock)
+        self.assertHttpBadRequest(self.post_stock("reserve", 0))
+        self.assertHttpNotFound(self.post_stock("reserve", 1, pk=99))
+        self.assertHttpMethodNotAllowed(self.api_client.get(
+                                        "/v1/products/1/reserve"))
+
+    def test_reconcile(self):
+        '''
+            Stock written elsewhere is picked up by the counters.
+        '''
+        self.post_stock("reserve", 1)
+        #Written by another process, unseen by the signals.
+        Product.objects.filter(pk=1).update(stock=self.stock + 10)
+        STOCK.flush()
+        self.assertEqual(STOCK.get_stock(1), self.stock + 9)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock + 9)
+
+        Product.objects.filter(pk=1).update(stock=self.stock)
+        self.assertEqual(STOCK.reconcile(), [1])
+        self.assertEqual(STOCK.get_stock(1), self.stock)
+
+        #Saves through the model drop the counter.
+        product = Product.objects.get(pk=1)
+        product.save()
+        self.assertIsNone(STOCK.get_stock(1))
+
+    def test_refused_on_flush(self):
+        '''
+            Reservations the stock left by other processes cannot cover are
+            refused by the write back, and never take the stock below zero;
+            the row is checked in the database from then on.
+        '''
+        self.post_stock("reserve", 2)
+        #Taken by another process, unseen by the counters.
+        Product.objects.filter(pk=1).update(stock=1)
+        self.assertEqual(STOCK.flush(), 0)
+        self.assertEqual(Product.objects.get(pk=1).stock, 1)
+        self.assertEqual(STOCK.contended, set([1]))
+
+        response = self.post_stock("reserve", 2)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.deserialize(response)["stock"], 1)
+        self.assertHttpOK(self.post_stock("release", 1))
+        self.assertEqual(Product.objects.get(pk=1).stock, 2)
+
+    def test_write_through(self):
+        '''
+            With no interval, as when several processes serve the API, the
+            stock is moved in the database before being confirmed.
+        '''
+        STOCK.interval = 0
+        response = self.post_stock("reserve", 2)
+        self.assertEqual(self.deserialize(response)["stock"], self.stock - 2)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock - 2)
+        self.assertFalse(STOCK.has_pending())
+
+        #Taken by another process.
+        Product.objects.filter(pk=1).update(stock=1)
+        response = self.post_stock("reserve", 2)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Product.objects.get(pk=1).stock, 1)
+        self.assertHttpNotFound(self.post_stock("reserve", 1, pk=99))
+
+
+class IndexAdvisorTest(TestCase):
+    '''
+        Tests the indexes missing on the queries of a workload are told.
+    '''
+    multi_db = True
+    fixtures = ["suppliers.json", "products.json"]
+
+    def test_advise(self):
+        '''
+            Filters no index starts with get one, once.
+        '''
+        products = Product.objects.using("inventory")
+        advisor = IndexAdvisor()
+        with advisor.capture():
+            list(products.filter(stock=17))
+            list(products.filter(stock__in=[1, 2]))
+            list(products.filter(price__lt=20, title="product1"))
+            list(products.all())
+
+        suggestions = advisor.advise()
+        self.assertEqual([(suggestion.alias, suggestion.table,
+                           suggestion.columns, len(suggestion.queries))
+                          for suggestion in suggestions],
+                         [("inventory", "core_product", ("stock",), 2)])
+        advisor.create(suggestions[0])
+        self.assertEqual(advisor.advise(), [])
+
+
+class QueryStatsTest(BaseClient):
+    '''
+        Tests the queries of every request are counted by database.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "orders.json", "suppliers.json",
+                "products.json"]
+
+    @override_settings(QUERY_STATS_HEADER=True)
+    def test_request_counted(self):
+        '''
+            The queries of a request are sent back and scraped.
+        '''
+        before = METRICS.get("dualdb_queries_total", alias="transactions")
+        resp = self.get_list("orders")
+        self.assertHttpOK(resp)
+        header = resp["X-Query-Stats"]
+        self.assertIn("transactions; queries=", header)
+        self.assertNotIn("inventory", header)
+        self.assertTrue(METRICS.get("dualdb_queries_total",
+                                    alias="transactions") > before)
+
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('dualdb_queries_total{alias="transactions"}',
+                      resp.content)
+
+    def test_routes_and_rows(self):
+        '''
+            Routed reads and writes, and the rows fetched, are counted.
+        '''
+        stats = QueryStats()
+        activate(stats)
+        try:
+            list(Product.objects.all())
+            Customer.objects.create(username="counted")
+        finally:
+            deactivate()
+        self.assertTrue(stats.aliases["inventory"]["reads"])
+        self.assertEqual(stats.aliases["inventory"]["rows"],
+                         Product.objects.count())
+        self.assertEqual(stats.aliases["transactions"]["writes"], 1)
+        #The customer, and its change event.
+        self.assertEqual(stats.aliases["transactions"]["rows"], 2)
+
+    def test_n_plus_one(self):
+        '''
+            Queries repeated with different parameters are flagged.
+        '''
+        stats = QueryStats()
+        activate(stats)
+        try:
+            for customer in Customer.objects.all():
+                list(customer.order_set.all())
+                list(customer.order_set.all())
+                list(Order.objects.filter(pk__in=[1, 2][:customer.pk]))
+        finally:
+            deactivate()
+        repeated = stats.get_n_plus_one(threshold=2)
+        self.assertEqual(len(repeated), 2)
+        self.assertTrue(all(alias == "transactions"
+                            for alias, _, _ in repeated))
+        self.assertIn("n_plus_one=2", stats.get_header(threshold=2))
+
+
+class BenchmarkApiTest(TestCase):
+    '''
+        Tests the API benchmark builds its dataset and runs every scenario.
+    '''
+    multi_db = True
+
+    def test_scenarios(self):
+        '''
+            Every call of every resource succeeds on the synthetic data.
+        '''
+        sizes = {"orders": 30, "customers": 5, "products": 5,
+                 "suppliers": 3, "links": 2}
+        command = benchmark_api.Command()
+        command.build_dataset(sizes)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(Product.suppliers.through.objects.count(), 10)
+        self.assertEqual(CustomerOrderSummary.objects.aggregate(
+                            total=Sum("order_count"))["total"], 30)
+
+        results = command.run_scenarios(sizes, 2)
+        self.assertEqual(len(results), 16)
+        for name, result in results.items():
+            self.assertEqual(result["failures"], 0, name)
+
+
+class ReplicaRoutingTest(SimpleTestCase):
+    '''
+        Tests the spreading of reads over the replicas of a database.
+    '''
+    def setUp(self):
+        '''
+            Serves inventory reads from two stand-in replicas.
+        '''
+        unpin_all()
+        self.replica_set = ReplicaSet("inventory",
+                                      {"default": 2, "transactions": 1},
+                                      check_interval=0)
+        REPLICAS["inventory"] = self.replica_set
+        self.router = ModelRouter()
+
+    def tearDown(self):
+        '''
+            Forgets about the stand-in replicas.
+        '''
+        del REPLICAS["inventory"]
+        unpin_all()
+
+    def test_weighted_round_robin(self):
+        '''
+            Reads are spread in proportion to the replica weights.
+        '''
+        chosen = [self.router.db_for_read(Product) for _ in range(6)]
+        self.assertEqual(chosen.count("default"), 4)
+        self.assertEqual(chosen.count("transactions"), 2)
+
+    def test_unavailable_replicas_are_skipped(self):
+        '''
+            Lagging and failed replicas are skipped, falling back to primary.
+        '''
+        self.replica_set.report_lag("default", 60)
+        self.assertEqual(self.router.db_for_read(Product), "transactions")
+        self.replica_set.mark_failed("transactions")
+        self.assertEqual(self.router.db_for_read(Product), "inventory")
+
+    def test_reads_pinned_after_write(self):
+        '''
+            Once the request writes, reads go to the primary.
+        '''
+        self.assertEqual(self.router.db_for_write(Product), "inventory")
+        self.assertEqual(self.router.db_for_read(Product), "inventory")
+        unpin_all()
+        self.assertNotEqual(self.router.db_for_read(Product), "inventory")
+
+
+class ReplicaHealthTest(TestCase):
+    '''
+        Tests the replicas checked by the reads falling due, and skipped
+        when lagging or failing.
+    '''
+    multi_db = True
+
+    def setUp(self):
+        '''
+            Serves inventory reads from two stand-in replicas, checked on
+            the first read.
+        '''
+        unpin_all()
+        self.replica_set = ReplicaSet("inventory",
+                                      {"default": 1, "transactions": 1},
+                                      check_interval=60)
+        REPLICAS["inventory"] = self.replica_set
+        self.router = ModelRouter()
+        #Past all of the events logged so far on any of the databases.
+        self.pk = max(ChangeEvent.objects.using(alias).aggregate(
+                      top=Max("pk"))["top"] or 0 for alias in
+                      ("default", "transactions", "inventory")) + 100
+
+    def tearDown(self):
+        del REPLICAS["inventory"]
+        unpin_all()
+
+    def log_event(self, alias, pk, seconds_ago=0):
+        '''
+            Logs an event with the given id into the database.
+        '''
+        events = ChangeEvent.objects.using(alias)
+        events.create(pk=pk, model="core.Product", action="updated")
+        events.filter(pk=pk).update(created=timezone.now() -
+                                    datetime.timedelta(seconds=seconds_ago))
+
+    def test_lagging_replica_skipped(self):
+        '''
+            A replica missing writes older than the max lag is skipped.
+        '''
+        self.log_event("inventory", self.pk, 60)
+        self.log_event("transactions", self.pk)
+        chosen = set(self.router.db_for_read(Product) for _ in range(4))
+        self.assertEqual(chosen, set(["transactions"]))
+        self.assertGreaterEqual(self.replica_set._lag["default"], 60)
+
+    def test_failed_replica_skipped(self):
+        '''
+            A replica failing its health check is skipped.
+        '''
+        self.log_event("inventory", self.pk)
+        self.log_event("default", self.pk)
+        connection = connections["transactions"]
+
+        def cursor():
+            raise DatabaseError("Replica gone.")
+        connection.cursor = cursor
+        try:
+            chosen = set(self.router.db_for_read(Product) for _ in range(4))
+        finally:
+            del connection.cursor
+        self.assertEqual(chosen, set(["default"]))
+
+
+class ShardingTest(TestCase):
+    '''
+        Tests the partitioning of rows over shards and the scatter-gather
+        of queries across them.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "orders.json"]
+
+    def test_partitioning(self):
+        '''
+            Rows are placed by hash or range of the shard key.
+        '''
+        hashed = ShardSet(["a", "b"], key="customer_id")
+        self.assertEqual(hashed.shard_for_value(3), "b")
+        self.assertEqual(hashed.shard_for_value("4"), "a")
+        ranged = ShardSet(["a", "b", "c"], key="id", ranges=[10, 20])
+        self.assertEqual([ranged.shard_for_value(v) for v in (1, 10, 25)],
+                         ["a", "b", "c"])
+        self.assertEqual(hashed.shards_for_filters(Order, {"customer": 3}),
+                         ["b"])
+        self.assertEqual(hashed.shards_for_filters(Order, {"amount": 3}),
+                         ["a", "b"])
+
+    def test_router_picks_shard_of_instance(self):
+        '''
+            The shard comes from the instance state or its shard key.
+        '''
+        original = SHARDS[Order]
+        SHARDS[Order] = ShardSet(["transactions", "inventory"],
+                                 key="customer_id")
+        thaw()
+        try:
+            router = ModelRouter()
+            self.assertEqual(router.db_for_write(Order,
+                                instance=Order(customer_id=3)), "inventory")
+            order = Order.objects.using("transactions").get(pk=1)
+            self.assertEqual(router.db_for_read(Order, instance=order),
+                             "transactions")
+        finally:
+            SHARDS[Order] = original
+            thaw()
+
+    def test_create_and_read_across_shards(self):
+        '''
+            New rows sharded by their id get it before being routed, and
+            are read back off the shard they went to.
+        '''
+        original = SHARDS[Customer]
+        SHARDS[Customer] = ShardSet(["transactions", "default"], key="id")
+        thaw()
+        try:
+            customers = [Customer.objects.create(
+                                username="sharded{0}".format(index))
+                         for index in range(4)]
+            self.assertEqual(set(customer._state.db for customer in
+                                 customers), set(["transactions", "default"]))
+            for customer in customers:
+                self.assertEqual(customer._state.db,
+                    SHARDS[Customer].shard_for_value(customer.pk))
+                resp = self.client.get("/v1/customers/{0}".format(
+                                       customer.pk), {"format": "json"})
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(json.loads(resp.content)["username"],
+                                 customer.username)
+        finally:
+            SHARDS[Customer] = original
+            thaw()
+
+    def test_scatter_gather(self):
+        '''
+            Rows gathered from several shards keep the requested order and
+            paginate like a single query.
+        '''
+        orders = Order.objects.using("transactions")
+        sharded = ShardedQuerySet([orders.filter(amount__lt=50),
+                                   orders.filter(amount__gte=50)])
+        expected = list(orders.order_by("-amount"))
+        self.assertEqual(list(sharded.order_by("-amount")), expected)
+        self.assertEqual(sharded.order_by("-amount")[1:2], expected[1:2])
+        self.assertEqual(sharded.count(), len(expected))
+        self.assertEqual([row["amount"] for row in
+                          sharded.order_by("-amount").values("date")],
+                         [order.amount for order in expected])
+
+
+class RelationLoaderTest(BaseClient):
+    '''
+        Tests the related objects of a list page are loaded in batches.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "orders.json", "suppliers.json",
+                "products.json"]
+
+    def test_orders_customer_loaded_once(self):
+        '''
+            Customers of a page of orders cost a single query.
+        '''
+        for amount in range(10):
+            Order.objects.create(amount=amount, date="2014-04-09",
+                                 customer_id=2 - amount % 2)
+
+        #Page and one IN query for all of the customers, orders are cursor
+        #paginated so no count.
+        with self.assertNumQueries(2, using="transactions"):
+            data = self.get_json_list("orders")
+        self.assertEqual(len(data["data"]), 12)
+        self.assertEqual(data["data"][0]["customer"], "/v1/customers/1")
+
+    def test_products_suppliers_loaded_once(self):
+        '''
+            Suppliers of a page of products cost a single query.
+        '''
+        for title in ("product2", "product3"):
+            product = Product.objects.create(title=title, price=1, stock=1)
+            product.suppliers.add(1, 2)
+
+        with self.assertNumQueries(3, using="inventory"):
+            data = self.get_json_list("products")
+        self.assertEqual(data["data"][-1]["suppliers"],
+                         ["/v1/suppliers/1", "/v1/suppliers/2"])
+
+    def test_unrequested_relations_skipped(self):
+        '''
+            Relations left out of the fields asked for are not loaded.
+        '''
+        with self.assertNumQueries(2, using="inventory"):
+            data = self.get_json_list("products", data={"fields": "title"})
+        self.assertNotIn("suppliers", data["data"][0])
+
+
+class RowDehydratorTest(BaseClient):
+    '''
+        Tests the lists dehydrated off rows come out as they do off model
+        instances.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "suppliers.json"]
+
+    def get_content(self, resource, fmt, **params):
+        request = RequestFactory().get("/", dict(params, format=fmt))
+        return resource.get_list(request).content
+
+    def test_same_output(self):
+        '''
+            JSON and XML, whole and sparse, are the same either way.
+        '''
+        from dualdb.urls import V1_API
+
+        for name in ("customers", "suppliers"):
+            resource = V1_API._registry[name]
+            row_dehydrator = resource._meta.row_dehydrator
+            self.assertIsNotNone(row_dehydrator.compile(resource))
+            for fmt in ("json", "xml"):
+                compiled = self.get_content(resource, fmt, limit=2)
+                resource._meta.row_dehydrator = None
+                try:
+                    expected = self.get_content(resource, fmt, limit=2)
+                finally:
+                    resource._meta.row_dehydrator = row_dehydrator
+                self.assertEqual(compiled, expected)
+
+        columns, dehydrate_row = row_dehydrator.compile(resource,
+                                        set(["email", "resource_uri"]))
+        self.assertEqual(columns, ["email", "id"])
+        self.assertEqual(dehydrate_row({"id": 7, "email": "a@b.c"}),
+                         {"email": u"a@b.c",
+                          "resource_uri": u"/v1/suppliers/7"})
+
+    def test_hooks_fall_back(self):
+        '''
+            Resources dehydrating any field on their own aren't compiled.
+        '''
+        class MaskedCustomersResource(CustomersResource):
+            def dehydrate_email(self, bundle):
+                return u"hidden"
+
+        resource = MaskedCustomersResource()
+        self.assertIsNone(resource._meta.row_dehydrator.compile(resource))
+        data = json.loads(self.get_content(resource, "json"))
+        self.assertTrue(data["data"])
+        for row in data["data"]:
+            self.assertEqual(row["email"], u"hidden")
+
+
+class ProxyProduct(Product):
+    '''
+        Proxy to check the routing of the models it does not register.
+    '''
+    class Meta(object):
+        app_label = "core"
+        proxy = True
+
+
+class RoutingTableTest(SimpleTestCase):
+    '''
+        Tests the routing table frozen out of the registry.
+    '''
+    def setUp(self):
+        '''
+            Freezes the table over the models of interest.
+        '''
+        self.through = Product.suppliers.through
+        self.table = RoutingTable([Product, Customer, self.through])
+
+    def test_derived_routes(self):
+        '''
+            Through tables, proxies and deferred models are routed along
+            with the models they stand for.
+        '''
+        self.assertEqual(self.table.route(self.through), ("inventory", None))
+        self.assertEqual(self.table.route(ProxyProduct), ("inventory", None))
+        deferred = deferred_class_factory(Product, ["price"])
+        self.assertEqual(self.table.route(deferred), ("inventory", None))
+        db_name, shard_set = self.table.route(Customer.groups.through)
+        self.assertEqual(db_name, "transactions")
+        self.assertIsNone(shard_set.key)
+
+    def test_syncs_to(self):
+        '''
+            Tables are synchronized only into the databases they belong to.
+        '''
+        self.assertTrue(self.table.syncs_to("inventory", self.through))
+        self.assertFalse(self.table.syncs_to("transactions", Product))
+        self.assertTrue(self.table.syncs_to("transactions", Customer))
+        self.assertFalse(self.table.syncs_to("inventory", Order))
+
+
+class ResponseCacheTest(BaseClient):
+    '''
+        Tests the responses served off the cache and their invalidation.
+    '''
+    multi_db = True
+    fixtures = ["suppliers.json"]
+
+    def test_lru_eviction(self):
+        '''
+            Least recently used and expired responses are dropped.
+        '''
+        cache = LRUCache(timeout=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        cache.set("d", 4, timeout=-1)
+        self.assertIsNone(cache.get("d"))
+
+    def test_versions(self):
+        '''
+            The keys move on with the writes of the models they are built
+            off, and only of those.
+        '''
+        cache = ResponseCache()
+        key, modified = cache.get_validators(["list"], [Supplier])
+        self.assertFalse(cache.is_shared())
+        self.assertEqual(cache.make_key(["list"], [Supplier]), key)
+        cache.bump(get_label(Product))
+        self.assertEqual(cache.make_key(["list"], [Supplier]), key)
+        cache.bump(get_label(Supplier))
+        bumped, changed = cache.get_validators(["list"], [Supplier])
+        self.assertNotEqual(bumped, key)
+        self.assertGreaterEqual(changed, modified)
+
+    def test_cached_until_written(self):
+        '''
+            Repeated GETs are served without queries until a write goes
+            through the resource.
+        '''
+        self.get_json_list("suppliers")
+        with self.assertNumQueries(0, using="inventory"):
+            self.get_json_list("suppliers")
+
+        self.update("suppliers", "1", {"last_name": "surname"})
+        data = self.get_json_list("suppliers")
+        self.assertEqual(data["data"][0]["last_name"], "surname")
+
+    def test_conditional_get(self):
+        '''
+            Unchanged polls are answered with 304 without any queries.
+        '''
+        uri = self.get_full_uri("v1", "suppliers")
+        resp = self.api_client.get(uri, format="json")
+        etag = resp["ETag"]
+        #Past the second of the last write.
+        modified = http_date(time.time() + 1)
+
+        with self.assertNumQueries(0, using="inventory"):
+            resp = self.api_client.get(uri, format="json",
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.api_client.get(uri, format="json",
+                                   HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(resp.status_code, 304)
+
+        self.update("suppliers", "1", {"last_name": "surname"})
+        resp = self.api_client.get(uri, format="json",
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertHttpOK(resp)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_modified_within_second(self):
+        '''
+            A write later within the second the client has the response of
+            is not taken as older than it.
+        '''
+        uri = self.get_full_uri("v1", "suppliers")
+        since = http_date(int(time.time()))
+        self.update("suppliers", "1", {"last_name": "surname"})
+        resp = self.api_client.get(uri, format="json",
+                                   HTTP_IF_MODIFIED_SINCE=since)
+        self.assertHttpOK(resp)
+
+    def test_local_versions(self):
+        '''
+            Versions local to the process are not shared by the other
+            processes, so they answer no conditional GETs.
+        '''
+        cache = SuppliersResource._meta.response_cache
+        SuppliersResource._meta.response_cache = LRUCache(timeout=60)
+        try:
+            uri = self.get_full_uri("v1", "suppliers")
+            resp = self.api_client.get(uri, format="json")
+            self.assertFalse(resp.has_header("ETag"))
+            resp = self.api_client.get(uri, format="json",
+                                       HTTP_IF_NONE_MATCH="*")
+            self.assertHttpOK(resp)
+        finally:
+            SuppliersResource._meta.response_cache = cache
+
+
+class CatalogTest(BaseClient):
+    '''
+        Tests the plain reads served off snapshot files.
+    '''
+    multi_db = True
+    fixtures = ["suppliers.json", "products.json"]
+
+    def setUp(self):
+        '''
+            Gives the resources catalogs of their own, in a temporary
+            directory.
+        '''
+        super(CatalogTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.catalogs = {}
+        for resource, models in ((ProductsResource, [Product, Supplier]),
+                                 (SuppliersResource, [Supplier])):
+            self.catalogs[resource] = resource._meta.catalog
+            resource._meta.catalog = Catalog(os.path.join(self.directory,
+                                             resource._meta.resource_name),
+                                             models)
+        self.cache = ProductsResource._meta.response_cache
+
+    def tearDown(self):
+        for resource, catalog in self.catalogs.items():
+            resource._meta.catalog = catalog
+        shutil.rmtree(self.directory)
+        super(CatalogTest, self).tearDown()
+
+    def build(self):
+        for resource in self.catalogs:
+            resource._meta.catalog.build(resource())
+        self.cache.clear()
+
+    def test_serve(self):
+        '''
+            Snapshots serve what the database does, without any query.
+        '''
+        uris = ["/v1/products", "/v1/products/1", "/v1/suppliers",
+                "/v1/suppliers/2", "/v1/suppliers?limit=1&offset=1"]
+        expected = [self.api_client.get(uri, format="json").content
+                    for uri in uris]
+        self.build()
+        with self.assertNumQueries(0, using="inventory"):
+            served = [self.api_client.get(uri, format="json").content
+                      for uri in uris]
+        self.assertEqual(served, expected)
+        self.assertHttpNotFound(self.api_client.get("/v1/products/99",
+                                                    format="json"))
+
+    def test_invalidated(self):
+        '''
+            Writes leave the snapshot aside until it is rebuilt; requests
+            other than plain JSON ones never use it.
+        '''
+        self.build()
+        self.update("suppliers", "1", {"last_name": "surname"})
+        data = self.get_json_list("suppliers")
+        self.assertEqual(data["data"][0]["last_name"], "surname")
+        self.get_json_list("products")
+
+        self.build()
+        with self.assertNumQueries(0, using="inventory"):
+            self.assertEqual(self.get_json_detail("suppliers", "1")[
+                                                "last_name"], "surname")
+        self.cache.clear()
+        #Counted and read off the database.
+        with self.assertNumQueries(2, using="inventory"):
+            self.get_json_list("suppliers", data={"fields": "username"})
+
+
+class ChangeFeedTest(BaseClient):
+    '''
+        Tests the writes on the resources are followed off /v1/changes.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "suppliers.json", "products.json"]
+
+    def setUp(self):
+        super(ChangeFeedTest, self).setUp()
+        #Past the events left by the tests committing theirs.
+        self.start = self.get_changes(limit=1000)["meta"]["cursor"]
+
+    def get_changes(self, **data):
+        return self.get_json_list("changes", data=data)
+
+    def write(self):
+        '''
+            Creates a customer and a product, and deletes the customer.
+        '''
+        resp = self.api_client.post("/v1/customers", format="json",
+                                    data={"username": "followed",
+                                          "email": "followed@orders.com"})
+        self.assertHttpCreated(resp)
+        customer = resp["Location"].rstrip("/").split("/")[-1]
+        self.assertHttpCreated(self.api_client.post("/v1/products",
+                    format="json", data={"title": "followed", "price": 2.5,
+                                         "stock": 3,
+                                         "suppliers": ["/v1/suppliers/1"]}))
+        self.assertHttpAccepted(self.api_client.delete(
+                                    "/v1/customers/{0}".format(customer)))
+        return customer
+
+    def test_batch(self):
+        '''
+            The events of the writes of a batch are written in one INSERT
+            per database on the way out, the same ones once.
+        '''
+        events = ChangeEvent.objects.using("inventory")
+        last = events.aggregate(last=Max("pk"))["last"] or 0
+        batch = CHANGES.batch()
+        batch.__enter__()
+        try:
+            product = Product.objects.get(pk=1)
+            product.save()
+            supplier = Supplier.objects.create(username="batched")
+            product.suppliers.add(supplier)
+            product.save()
+            self.assertFalse(events.filter(pk__gt=last).exists())
+        except:
+            batch.__exit__(None, None, None)
+            raise
+        with self.assertNumQueries(1, using="inventory"):
+            batch.__exit__(None, None, None)
+        pk = unicode(supplier.pk)
+        self.assertEqual(list(events.filter(pk__gt=last).values_list(
+                            "model", "object_pk", "action").order_by("pk")),
+                         [("core.Product", "1", "updated"),
+                          ("core.Supplier", pk, "created"),
+                          ("core.Supplier", pk, "updated")])
+
+    def test_feed(self):
+        '''
+            Events are listed after the cursor, with one sequence per
+            database, and the cursor moves past them.
+        '''
+        customer = self.write()
+        data = self.get_changes(since=self.start)
+        events = [(event["alias"], event["resource"], event["action"])
+                  for event in data["data"]]
+        self.assertEqual([event for event in events
+                          if event[0] == "transactions"],
+                         [("transactions", "customers", "created"),
+                          ("transactions", "customers", "deleted")])
+        self.assertEqual(events.count(("inventory", "products", "created")),
+                         1)
+        self.assertEqual(data["data"][0]["resource_uri"],
+                         "/v1/customers/{0}".format(customer))
+        for alias in ("transactions", "inventory"):
+            sequences = [event["sequence"] for event in data["data"]
+                         if event["alias"] == alias]
+            self.assertEqual(sequences, range(sequences[0],
+                                              sequences[0] + len(sequences)))
+        self.assertIsNone(data["meta"]["next"])
+
+        cursor = data["meta"]["cursor"]
+        self.assertEqual(self.get_changes(since=cursor)["data"], [])
+        Product.objects.filter(pk=1).update(stock=0)
+        Product.objects.get(pk=1).save()
+        data = self.get_changes(since=cursor, resources="products")
+        self.assertEqual([(event["pk"], event["action"])
+                          for event in data["data"]], [("1", "updated")])
+
+        first = self.get_changes(limit=1, since=self.start)
+        self.assertEqual(len(first["data"]), 1)
+        self.assertIn("since=", first["meta"]["next"])
+        second = self.get_changes(limit=1, since=first["meta"]["cursor"])
+        self.assertNotEqual(second["data"], first["data"])
+
+        self.assertHttpBadRequest(self.get_list("changes",
+                                                data={"since": "nowhere:1"}))
+        self.assertHttpBadRequest(self.get_list("changes",
+                                                data={"resources": "order"}))
+
+    def test_stream(self):
+        '''
+            All of the events after the cursor can be streamed out.
+        '''
+        self.write()
+        listed = self.get_changes(since=self.start)["data"]
+        resp = self.api_client.get("/v1/changes", format="json",
+                                   data={"stream": "true",
+                                         "since": self.start})
+        self.assertHttpOK(resp)
+        streamed = json.loads("".join(resp.streaming_content))["data"]
+        self.assertEqual(sorted((event["alias"], event["sequence"])
+                                for event in streamed),
+                         sorted((event["alias"], event["sequence"])
+                                for event in listed))
+
+    def test_pruned(self):
+        '''
+            Cursors behind the pruned events are told to read again.
+        '''
+        self.write()
+        cursor = self.get_changes()["meta"]["cursor"]
+        self.assertTrue(CHANGES.prune("transactions", -1))
+        self.assertEqual(self.get_list("changes").status_code, 410)
+        self.assertHttpOK(self.get_list("changes", data={"since": cursor}))
+
+
+class BulkWriteTest(BaseClient):
+    '''
+        Tests writing arrays of objects through the list endpoints.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "suppliers.json", "products.json"]
+
+    def post_list(self, resource_name, data):
+        '''
+            Posts the array of objects to the list URI of the resource.
+        '''
+        uri = self.get_full_uri("v1", resource_name)
+        return self.api_client.post(uri, format="json", data=data)
+
+    def test_bulk_create_products(self):
+        '''
+            Products and their supplier links take the same few statements
+            on inventory however many are posted.
+        '''
+        for count in (2, 20):
+            data = [{"title": "bulk{0}".format(index), "price": 1.5,
+                     "stock": index,
+                     "suppliers": ["/v1/suppliers/1", "/v1/suppliers/2"]}
+                    for index in range(count)]
+            #Suppliers, write lock, top id, products insert, links insert
+            #and change events insert.
+            with self.assertNumQueries(6, using="inventory"):
+                resp = self.post_list("products", data)
+            self.assertHttpCreated(resp)
+
+            uris = self.deserialize(resp)["data"]
+            self.assertEqual(len(uris), count)
+            product = self.get_json_detail("products", uris[-1].split("/")[-1])
+            self.assertEqual(product["title"], "bulk{0}".format(count - 1))
+            self.assertEqual(product["suppliers"], data[-1]["suppliers"])
+
+    def test_bulk_update_and_create(self):
+        '''
+            Objects carrying their resource_uri are updated in batch, along
+            with the others being created.
+        '''
+        data = [{"resource_uri": "/v1/customers/1", "last_name": "surname"},
+                {"username": "bulk", "password": "secret",
+                 "email": "bulk@orders.com"}]
+        self.assertHttpCreated(self.post_list("customers", data))
+
+        customer = self.get_json_detail("customers", "1")
+        self.assertEqual(customer["last_name"], "surname")
+        self.assertEqual(Customer.objects.get(username="bulk").email,
+                         "bulk@orders.com")
+
+    def test_bulk_validation(self):
+        '''
+            Nothing is written when any of the objects is invalid.
+        '''
+        data = [{"title": "valid", "price": 1, "stock": 1, "suppliers": []},
+                {"title": "invalid", "price": 1, "stock": 1,
+                 "suppliers": ["/v1/suppliers/9"]}]
+        resp = self.post_list("products", data)
+        self.assertHttpBadRequest(resp)
+        self.assertIn("1", self.deserialize(resp)["errors"])
+        self.assertFalse(Product.objects.filter(title="valid").exists())
+
+    def test_lock_table(self):
+        '''
+            Other connections can't write while the ids are handed out; on
+            a database file, as in-memory ones have a single connection.
+        '''
+        handle, name = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        wrapper = DatabaseWrapper({"NAME": name, "OPTIONS": {},
+                                   "TIME_ZONE": None}, alias="locked")
+        other = sqlite3.connect(name, timeout=0)
+        try:
+            wrapper.cursor().execute("CREATE TABLE core_product "
+                                     "(id INTEGER PRIMARY KEY)")
+            lock_table(Product, wrapper)
+            self.assertRaises(sqlite3.OperationalError, other.execute,
+                              "INSERT INTO core_product VALUES (1)")
+            wrapper.connection.commit()
+            other.execute("INSERT INTO core_product VALUES (1)")
+        finally:
+            other.close()
+            wrapper.close()
+            POOLS.pop("locked").close_all()
+            os.remove(name)
+
+
+class UnitOfWorkTest(TransactionTestCase):
+    '''
+        Tests the writes spanning databases committed all or none; with
+        real transactions, as they are what is under test.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "suppliers.json", "products.json"]
+
+    def setUp(self):
+        '''
+            Notes down the stock of the product being ordered.
+        '''
+        self.stock = Product.objects.get(pk=1).stock
+
+    def place_order(self, quantity):
+        '''
+            Takes the ordered quantity off the stock of the first product
+            and records the order.
+        '''
+        with UnitOfWork() as work:
+            work.increment(Product, 1, stock=-quantity,
+                           guards={"stock__gte": quantity})
+            return work, work.create(Order, amount=quantity, customer_id=1,
+                                     date=datetime.date(2014, 4, 9))
+
+    def test_commit(self):
+        '''
+            Both the databases get their writes, and the work is logged.
+        '''
+        work, order = self.place_order(2)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock - 2)
+        self.assertEqual(Order.objects.get(pk=order.pk).amount, 2)
+        #Counted once, though saved and then announced by the work.
+        self.assertEqual(CustomerOrderSummary.objects.get(
+                                                pk=1).order_count, 1)
+        self.assertEqual(WorkLog.objects.get(key=work.key).state,
+                         WorkLog.DONE)
+        for alias in ("inventory", "transactions"):
+            self.assertTrue(AppliedWork.objects.using(alias).filter(
+                                                    key=work.key).exists())
+
+    def test_guard_rolls_back(self):
+        '''
+            Nothing is written when any of the writes can't be made.
+        '''
+        self.assertRaises(WorkFailed, self.place_order, self.stock + 1)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock)
+        self.assertFalse(Order.objects.filter(amount=self.stock + 1).exists())
+        self.assertFalse(WorkLog.objects.exists())
+
+    def test_recover(self):
+        '''
+            Logged work missing on a database gets applied there, once.
+        '''
+        operations = {"inventory": [{"op": "update", "model": "core.Product",
+                                     "pk": 1, "fields": {}, "guards": {},
+                                     "increments": {"stock": -3}}]}
+        WorkLog.objects.create(key="lost", state=WorkLog.COMMITTING,
+                               operations=json.dumps(operations))
+
+        self.assertEqual(recover(grace=-1), 1)
+        self.assertEqual(recover(grace=-1), 0)
+        self.assertEqual(Product.objects.get(pk=1).stock, self.stock - 3)
+        self.assertEqual(WorkLog.objects.get(key="lost").state, WorkLog.DONE)
+
+
+class SnapshotTest(TransactionTestCase):
+    '''
+        Tests the provisioning of the test databases by the test runner.
+    '''
+    multi_db = True
+    fixtures = ["products.json"]
+
+    def test_restore(self):
+        '''
+            The rows of the database are put back as they were snapshotted.
+        '''
+        snapshot = Snapshot("inventory", "test_snapshot").take()
+        try:
+            Product.objects.filter(pk=1).update(stock=0)
+            Product.objects.create(title="new", price=1, stock=1)
+            snapshot.restore()
+        finally:
+            snapshot.drop()
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertNotEqual(Product.objects.get(pk=1).stock, 0)
+
+    def test_fixture_cache(self):
+        '''
+            Fixtures get deserialized once, and fixtures without their
+            format are left to loaddata.
+        '''
+        cache = FixtureCache()
+        objects = cache.get_objects("products.json", "inventory")
+        self.assertTrue(objects)
+        self.assertIs(cache.get_objects("products.json", "inventory"),
+                      objects)
+        self.assertIsNone(cache.find("products"))
+
+        Product.objects.all().delete()
+        self.assertEqual(cache.load(["products.json", "products"],
+                                    "inventory"), ["products"])
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_split(self):
+        '''
+            The tests of a class are run by the same process.
+        '''
+        suite = unittest.TestSuite([SnapshotTest("test_restore"),
+                                    UnitOfWorkTest("test_commit"),
+                                    SnapshotTest("test_split")])
+        shares = split(suite, 4)
+        self.assertEqual(len(shares), 2)
+        self.assertEqual(sorted(share.countTestCases() for share in shares),
+                         [1, 2])
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    '''
+        Tests the connections kept open across requests; on a database file,
+        as in-memory databases are not pooled.
+    '''
+    def setUp(self):
+        '''
+            Creates the database file the pools connect to.
+        '''
+        handle, self.name = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    def tearDown(self):
+        '''
+            Closes the pools of the test and removes the database file.
+        '''
+        pool = POOLS.pop("pooled", None)
+        if pool is not None:
+            pool.close_all()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.name + suffix):
+                os.remove(self.name + suffix)
+
+    def connect(self):
+        return sqlite3.connect(self.name, check_same_thread=False)
+
+    def test_reuse(self):
+        '''
+            A connection checked in is handed out again.
+        '''
+        pool = ConnectionPool(self.connect)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        self.assertIs(pool.checkout(), connection)
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+    def test_max_size(self):
+        '''
+            Checkouts past the max size time out.
+        '''
+        pool = ConnectionPool(self.connect, max_size=2, checkout_timeout=0.01)
+        pool.checkout()
+        pool.checkout()
+        self.assertRaises(PoolTimeout, pool.checkout)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_idle_timeout(self):
+        '''
+            Connections left idle too long are closed, down to the min size.
+        '''
+        pool = ConnectionPool(self.connect, min_size=1, idle_timeout=-1)
+        first, second = pool.checkout(), pool.checkout()
+        pool.checkin(first)
+        pool.checkin(second)
+        pool.checkout()
+        self.assertEqual(pool.stats()["evicted"], 1)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_reserve(self):
+        '''
+            Reserved connections raise the max size of the pools, the ones
+            set up later on too.
+        '''
+        reserved = pool.RESERVED_SIZE
+        connections = ConnectionPool(self.connect, max_size=1)
+        POOLS["pooled"] = connections
+        try:
+            pool.reserve(3)
+            self.assertEqual(connections.max_size, 3)
+            connections.grow(2)
+            self.assertEqual(connections.max_size, 3)
+            POOLS.pop("pooled")
+            settings_dict = {"NAME": self.name, "POOL": {"MAX_SIZE": 1}}
+            self.assertEqual(pool.get_pool("pooled", settings_dict,
+                                           self.connect).max_size, 3)
+        finally:
+            pool.RESERVED_SIZE = reserved
+
+    def test_failed_ping(self):
+        '''
+            A connection not answering its ping is replaced.
+        '''
+        pool = ConnectionPool(self.connect)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.close()
+        self.assertIsNot(pool.checkout(), connection)
+        self.assertEqual(pool.stats()["failed_pings"], 1)
+
+    def test_backend(self):
+        '''
+            The backend takes its connections out of the pool of its alias,
+            giving them back on close.
+        '''
+        settings_dict = {"NAME": self.name, "OPTIONS": {}, "TIME_ZONE": None,
+                         "POOL": {"MAX_SIZE": 1}}
+        wrapper = DatabaseWrapper(settings_dict, alias="pooled")
+        wrapper.cursor().execute("CREATE TABLE t (id INTEGER)")
+        wrapper.close()
+        wrapper.cursor().execute("SELECT * FROM t")
+        wrapper.close()
+
+        stats = POOLS["pooled"].stats()
+        self.assertEqual((stats["created"], stats["checkouts"]), (1, 2))
+        self.assertEqual(stats["idle"], 1)
+
+    def test_pragmas(self):
+        '''
+            The pragmas of the database are set on its connections.
+        '''
+        settings_dict = {"NAME": self.name, "OPTIONS": {}, "TIME_ZONE": None,
+                         "PRAGMAS": {"journal_mode": "WAL", "synchronous":
+                                     "NORMAL", "cache_size": -4000,
+                                     "busy_timeout": 2000}}
+        wrapper = DatabaseWrapper(settings_dict, alias="pooled")
+        cursor = wrapper.cursor()
+        values = [cursor.execute("PRAGMA {0}".format(name)).fetchone()[0]
+                  for name in ("journal_mode", "synchronous", "cache_size",
+                               "busy_timeout")]
+        wrapper.close()
+        self.assertEqual(values, ["wal", 1, -4000, 2000])
+
+        settings_dict["PRAGMAS"] = {"cache_size": "1; DROP TABLE t"}
+        POOLS.pop("pooled").close_all()
+        self.assertRaises(ImproperlyConfigured,
+                          DatabaseWrapper(settings_dict, alias="pooled").cursor)
+
+
+class ExecutorTest(SimpleTestCase):
+    '''
+        Tests the queries on several databases run at once.
+    '''
+    def setUp(self):
+        '''
+            Lets the tasks run on the threads; the test databases are in
+            memory, which keeps them on the current thread otherwise.
+        '''
+        self.can_scatter = executor.can_scatter
+        executor.can_scatter = lambda: True
+
+    def tearDown(self):
+        executor.can_scatter = self.can_scatter
+        unpin_all()
+
+    def test_scatter(self):
+        '''
+            Tasks take as long as the slowest of them, results keep order.
+        '''
+        def query(value):
+            time.sleep(0.1)
+            return value, threading.current_thread()
+
+        started = time.time()
+        results = executor.Executor(3).map((query, (value,))
+                                           for value in range(3))
+        self.assertLess(time.time() - started, 0.25)
+        self.assertEqual([value for value, _ in results], [0, 1, 2])
+        self.assertNotIn(threading.current_thread(),
+                         [thread for _, thread in results])
+
+    def test_pins_followed(self):
+        '''
+            The threads read off the primaries the request wrote to.
+        '''
+        pin("transactions")
+        results = executor.Executor(2).map([(is_pinned, ("transactions",)),
+                                            (is_pinned, ("inventory",))])
+        self.assertEqual(results, [True, False])
+
+    def test_serial_in_memory(self):
+        '''
+            Tasks stay on the current thread with in-memory databases.
+        '''
+        executor.can_scatter = self.can_scatter
+        results = executor.Executor(2).map([(threading.current_thread, ()),
+                                            (threading.current_thread, ())])
+        self.assertEqual(results, [threading.current_thread()] * 2)
+
+
+class ScatterTest(SimpleTestCase):
+    '''
+        Tests the queries run at once on other threads, through their own
+        pooled connections; on database files, as the threads can't see
+        the in-memory test databases.
+    '''
+    def setUp(self):
+        '''
+            Points every database at a file of its own, holding its alias.
+        '''
+        self.directory = tempfile.mkdtemp()
+        self.names = {}
+        self.pools = {}
+        for connection in connections.all():
+            alias = connection.alias
+            name = os.path.join(self.directory, alias + ".db")
+            database = sqlite3.connect(name)
+            database.execute("CREATE TABLE t (alias TEXT)")
+            database.execute("INSERT INTO t VALUES (?)", (alias,))
+            database.commit()
+            database.close()
+            #The connections of this thread stay on the in-memory ones.
+            self.names[alias] = connection.settings_dict["NAME"]
+            connection.settings_dict["NAME"] = name
+            self.pools[alias] = POOLS.pop(alias, None)
+        self.executor = executor.Executor(len(self.names))
+
+    def tearDown(self):
+        '''
+            Stops the threads, closes their pools and points the databases
+            back at the in-memory ones.
+        '''
+        if self.executor._pool is not None:
+            self.executor._pool.close()
+            self.executor._pool.join()
+        for alias, name in self.names.items():
+            connections[alias].settings_dict["NAME"] = name
+            pool = POOLS.pop(alias, None)
+            if pool is not None:
+                pool.close_all()
+            if self.pools[alias] is not None:
+                POOLS[alias] = self.pools[alias]
+        shutil.rmtree(self.directory)
+
+    def test_scatter(self):
+        '''
+            Every task reads off its database on a thread of its own, at
+            the same time, and gives the connection back to its pool.
+        '''
+        def query(alias):
+            cursor = connections[alias].cursor()
+            cursor.execute("SELECT alias FROM t")
+            time.sleep(0.1)
+            return cursor.fetchone()[0], threading.current_thread()
+
+        aliases = sorted(self.names)
+        self.assertTrue(executor.can_scatter())
+        started = time.time()
+        results = self.executor.map((query, (alias,)) for alias in aliases)
+        self.assertLess(time.time() - started, 0.25)
+        self.assertEqual([alias for alias, _ in results], aliases)
+        threads = [thread for _, thread in results]
+        self.assertEqual(len(set(threads)), len(aliases))
+        self.assertNotIn(threading.current_thread(), threads)
+        for alias in aliases:
+            stats = POOLS[alias].stats()
+            self.assertEqual((stats["created"], stats["in_use"]), (1, 0))
+
+        #Connections checked in are handed out again to the next tasks.
+        self.executor.map((query, (alias,)) for alias in aliases)
+        for alias in aliases:
+            stats = POOLS[alias].stats()
+            self.assertEqual((stats["checkouts"], stats["in_use"]), (2, 0))
+            self.assertLessEqual(stats["created"], 2)
+
+    def test_uncommitted_writes(self):
+        '''
+            Tasks stay on the current thread while it has writes the other
+            connections can't see.
+        '''
+        alias = sorted(self.names)[0]
+        transaction.enter_transaction_management(using=alias)
+        transaction.managed(True, using=alias)
+        try:
+            transaction.set_dirty(using=alias)
+            self.assertFalse(executor.can_scatter())
+            results = self.executor.map([(threading.current_thread, ()),
+                                         (threading.current_thread, ())])
+            self.assertEqual(results, [threading.current_thread()] * 2)
+        finally:
+            transaction.set_clean(using=alias)
+            transaction.leave_transaction_management(using=alias)
+
+
+class StreamedBody(list):
+    '''
+        Body of a streamed response, like StreamingHttpResponse.
+    '''
+    streaming = True
+
+
+class EventedServerTest(SimpleTestCase):
+    '''
+        Tests the requests read off kept alive connections by the event
+        loop; with a plain WSGI application, as the worker threads can't
+        see the in-memory test databases.
+    '''
+    def setUp(self):
+        '''
+            Serves an application echoing the paths, on a free port.
+        '''
+        def application(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            if environ["PATH_INFO"] == "/stream":
+                return StreamedBody(["a", "", "bb", "ccc"])
+            return [environ["PATH_INFO"]]
+
+        self.server = Server(application, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join()
+
+    def exchange(self, data):
+        '''
+            Sends the raw requests over one connection, and returns what the
+            server sent back once it hung up.
+        '''
+        client = socket.create_connection((self.server.host,
+                                           self.server.port))
+        client.sendall(data)
+        received = []
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            received.append(chunk)
+        client.close()
+        return "".join(received)
+
+    def test_keep_alive(self):
+        '''
+            Pipelined requests are answered in order over one connection.
+        '''
+        received = self.exchange("GET /v1/orders HTTP/1.1\r\n\r\n"
+                                 "GET /v1/products HTTP/1.1\r\n"
+                                 "Connection: close\r\n\r\n")
+        self.assertEqual(received.count("HTTP/1.1 200 OK"), 2)
+        self.assertIn("Connection: keep-alive", received)
+        self.assertLess(received.index("/v1/orders"),
+                        received.index("/v1/products"))
+
+    def test_bad_request(self):
+        '''
+            Requests which can't be parsed are answered before hanging up.
+        '''
+        received = self.exchange("GARBAGE\r\n\r\n")
+        self.assertTrue(received.startswith("HTTP/1.1 400 Bad Request"))
+
+    def test_streaming(self):
+        '''
+            Streamed responses are sent in chunks as they are made, kept
+            alive over HTTP/1.1; up to the end of the connection otherwise.
+        '''
+        chunk_size = evented.STREAM_CHUNK_SIZE
+        evented.STREAM_CHUNK_SIZE = 2
+        try:
+            received = self.exchange("GET /stream HTTP/1.1\r\n\r\n"
+                                     "GET /next HTTP/1.1\r\n"
+                                     "Connection: close\r\n\r\n")
+        finally:
+            evented.STREAM_CHUNK_SIZE = chunk_size
+        head, _, body = received.partition("\r\n\r\n")
+        self.assertIn("Transfer-Encoding: chunked", head)
+        self.assertNotIn("Content-Length", head)
+        self.assertTrue(body.startswith("3\r\nabb\r\n3\r\nccc\r\n"
+                                        "0\r\n\r\nHTTP/1.1 200 OK"))
+        self.assertTrue(body.endswith("/next"))
+
+        received = self.exchange("GET /stream HTTP/1.0\r\n\r\n")
+        head, _, body = received.partition("\r\n\r\n")
+        self.assertIn("Connection: close", head)
+        self.assertNotIn("Transfer-Encoding", head)
+        self.assertEqual(body, "abbccc")
+
+    def test_threads(self):
+        '''
+            The pools allow a connection to the threads of every database
+            and to the scatter ones.
+        '''
+        databases = set(self.server.get_routes().values())
+        self.assertEqual(self.server.get_threads(),
+                         self.server.workers * len(databases) +
+                         executor.EXECUTOR.workers)
+
+    def test_process_local(self):
+        '''
+            The API is served from one process only while it keeps the stock
+            counted in process.
+        '''
+        from dualdb.urls import V1_API
+        self.assertEqual(get_process_local(V1_API), ["the stock counters"])
+        self.assertRaises(CommandError, call_command, "serve_evented",
+                          "127.0.0.1:0", processes=2)
+
+
+class OrderSummaryTest(BaseClient):
+    '''
+        Tests the order summaries of the customers kept up to date as the
+        orders get written.
+    '''
+    multi_db = True
+    fixtures = ["customers.json", "orders.json"]
+
+    def setUp(self):
+        '''
+            Summarizes the orders loaded, fixtures are saved raw.
+        '''
+        super(OrderSummaryTest, self).setUp()
+        call_command("rebuild_summaries", stdout=StringIO())
+
+    def assertSummary(self, customer_id, order_count, total_amount):
+        summary = CustomerOrderSummary.objects.get(pk=customer_id)
+        self.assertEqual(summary.order_count, order_count)
+        self.assertAlmostEqual(summary.total_amount, total_amount)
+
+    def test_incremental(self):
+        '''
+            Creates, updates, moves and deletes add up in the summaries.
+        '''
+        self.assertSummary(1, 2, 118)
+        order = Order.objects.create(amount=10, date="2014-04-09",
+                                     customer_id=1)
+        self.assertSummary(1, 3, 128)
+
+        order = Order.objects.get(pk=order.pk)
+        order.amount = 20
+        order.save()
+        self.assertSummary(1, 3, 138)
+
+        order.customer_id = 2
+        order.save()
+        self.assertSummary(1, 2, 118)
+        self.assertSummary(2, 1, 20)
+
+        Order.objects.get(pk=order.pk).delete()
+        self.assertSummary(2, 0, 0)
+
+    def test_resource(self):
+        '''
+            Summaries are read only, and follow the orders posted.
+        '''
+        data = self.get_json_detail("order_summaries", "1")
+        self.assertEqual((data["order_count"], data["customer"]),
+                         (2, "/v1/customers/1"))
+
+        self.create("orders", {"amount": 2, "date": "2014-04-09",
+                               "customer": "/v1/customers/1"})
+        data = self.get_json_detail("order_summaries", "1")
+        self.assertEqual(data["order_count"], 3)
+
+        resp = self.api_client.post("/v1/order_summaries", format="json",
+                                    data={"order_count": 0})
+        self.assertHttpMethodNotAllowed(resp)
+
+
+class FastSerializerTest(SimpleTestCase):
+    '''
+        Tests FastSerializer writes the very same bytes as tastypie.
+    '''
+    def assertSameOutput(self, data):
+        for fmt in ("json", "xml"):
+            expected = getattr(Serializer(), "to_" + fmt)(data, {})
+            written = getattr(FastSerializer(), "to_" + fmt)(data, {})
+            if isinstance(expected, unicode):
+                expected = expected.encode("utf-8")
+            if isinstance(written, unicode):
+                written = written.encode("utf-8")
+            self.assertEqual(written, expected)
+
+    def test_same_output(self):
+        '''
+            Nested, empty, typed and escaped values come out the same.
+        '''
+        bundle = Bundle(data={"title": u"caf\xe9 & <bar>\r\n",
+                              "price": 1.1, "stock": 17, "active": True,
+                              "date": datetime.date(2014, 4, 8),
+                              "suppliers": [], "avatar": None, "note": "",
+                              "quote": u"say \"hi\"\u2028", "big": 2 ** 70})
+        self.assertSameOutput({"data": [bundle, bundle],
+                               "meta": {"limit": 20, "next": None,
+                                        "nested": {"z": [1, "a"], "a": {}}}})
+        self.assertSameOutput({"data": []})
+
+    def test_invalid_xml(self):
+        '''
+            Control characters are refused in XML, like lxml does.
+        '''
+        self.assertRaises(ValueError, FastSerializer().to_xml,
+                          {"data": u"bell\x07"})
+        self.assertEqual(FastSerializer().to_json({"data": u"bell\x07"}),
+                         Serializer().to_json({"data": u"bell\x07"}))
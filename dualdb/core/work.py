@@ -0,0 +1,264 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+'''
+import datetime
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.db.models import F
+from django.db.models.loading import get_model
+from django.utils import timezone
+from dualdb.core.cache import get_label
+from dualdb.core.models import AppliedWork, WorkLog
+from dualdb.core.shards import SHARDS, next_id
+from dualdb.core.signals import bulk_saved
+
+#Seconds a logged unit of work is left to its own process before
+#recover() takes it over.
+DEFAULT_RECOVERY_GRACE = 60
+
+logger = logging.getLogger(__name__)
+
+
+class WorkFailed(DatabaseError):
+    '''
+        Raised when an operation of a unit of work can't be applied, like
+        an update whose guards do not hold.
+    '''
+
+
+def apply(alias, key, operations):
+    '''
+        Applies the operations of a unit of work on the database, and marks
+        them applied there; in the transaction open on it. Returns the rows
+        created, by model.
+    '''
+    created = {}
+    for operation in operations:
+        model = get_model(*operation["model"].split("."))
+        manager = model._default_manager.db_manager(alias)
+
+        if operation["op"] == "create":
+            obj = operation.get("instance") or model(**operation["fields"])
+            obj.save(using=alias, force_insert=True)
+            created.setdefault(model, []).append(obj)
+
+        elif operation["op"] == "update":
+            changes = dict(operation["fields"])
+            for name, delta in operation["increments"].items():
+                changes[name] = F(name) + delta
+            if not manager.filter(pk=operation["pk"],
+                                  **operation["guards"]).update(**changes):
+                raise WorkFailed("No {0} with pk {1} matching {2}.".format(
+                                 operation["model"], operation["pk"],
+                                 operation["guards"]))
+
+        elif operation["op"] == "delete":
+            manager.filter(pk=operation["pk"]).delete()
+
+    AppliedWork.objects.db_manager(alias).create(key=key)
+    return created
+
+
+def notify(alias, operations, created):
+    '''
+        Sends bulk_saved for the models written to by the operations, once
+        committed on the database.
+    '''
+    for model, instances in created.items():
+        bulk_saved.send(sender=model, instances=instances, created=True,
+                        using=alias)
+
+    labels = set(operation["model"] for operation in operations
+                 if operation["op"] == "update")
+    for label in labels:
+        bulk_saved.send(sender=get_model(*label.split(".")), instances=None,
+                        created=False, using=alias)
+
+
+def serialize(operation):
+    '''
+        Returns the operation as it is logged; rows to create are logged
+        with the primary key they got.
+    '''
+    operation = dict(operation)
+    obj = operation.pop("instance", None)
+    if obj is not None:
+        operation["fields"] = dict(
+                (field.attname, field.get_prep_value(getattr(obj,
+                                                             field.attname)))
+                for field in obj._meta.local_fields)
+    return operation
+
+
+class UnitOfWork(object):
+    '''
+        Batches writes to several databases and commits them all or none.
+
+        The writes to each database run in a transaction left open on it,
+        which prepares them. Once all of them went through, they are logged
+        into WorkLog on the default database, which is the commit point;
+        then the transactions are committed. Work logged but left
+        uncommitted on some database, by a crash in between, gets applied
+        there by recover().
+
+        Use it as a context manager to commit on success::
+
+            with UnitOfWork() as work:
+                work.increment(Product, 1, stock=-2, guards={"stock__gte": 2})
+                work.create(Order, amount=26.7, date=today, customer_id=1)
+    '''
+    def __init__(self):
+        self.key = uuid.uuid4().hex
+        self.operations = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def _add(self, model, alias, operation):
+        operation["model"] = get_label(model)
+        self.operations.setdefault(alias, []).append(operation)
+
+    def _route(self, model, pk, using):
+        if using is not None:
+            return using
+        return router.db_for_write(model, instance=model(pk=pk))
+
+    def create(self, model, using=None, **fields):
+        '''
+            Creates a row; returns the instance, saved once committed.
+        '''
+        obj = model(**fields)
+        if model in SHARDS and len(SHARDS[model]) > 1:
+            #Sharded rows may be routed by their id.
+            obj.pk = next_id(model)
+
+        alias = using or router.db_for_write(model, instance=obj)
+        self._add(model, alias, {"op": "create", "instance": obj})
+        return obj
+
+    def update(self, model, pk, guards=None, using=None, **fields):
+        '''
+            Sets the given fields of the row; the whole unit of work fails
+            unless the row matches the ``guards`` lookups.
+        '''
+        self._add(model, self._route(model, pk, using),
+                  {"op": "update", "pk": pk, "fields": fields,
+                   "increments": {}, "guards": guards or {}})
+
+    def increment(self, model, pk, guards=None, using=None, **deltas):
+        '''
+            Adds the given deltas to the fields of the row, in the database;
+            the whole unit of work fails unless it matches the ``guards``.
+        '''
+        self._add(model, self._route(model, pk, using),
+                  {"op": "update", "pk": pk, "fields": {},
+                   "increments": deltas, "guards": guards or {}})
+
+    def delete(self, model, pk, using=None):
+        '''
+            Deletes the row.
+        '''
+        self._add(model, self._route(model, pk, using),
+                  {"op": "delete", "pk": pk})
+
+    def commit(self):
+        '''
+            Prepares the writes on every database, logs them and commits.
+        '''
+        aliases = ["default"] + [alias for alias in self.operations
+                                 if alias != "default"]
+        created = {}
+
+        for alias in aliases:
+            transaction.enter_transaction_management(using=alias)
+            transaction.managed(True, using=alias)
+        try:
+            try:
+                for alias in aliases:
+                    if alias in self.operations:
+                        created[alias] = apply(alias, self.key,
+                                               self.operations[alias])
+
+                operations = dict((alias, [serialize(operation)
+                                           for operation in operations])
+                                  for alias, operations in
+                                  self.operations.items())
+                WorkLog.objects.db_manager("default").create(key=self.key,
+                        state=WorkLog.COMMITTING,
+                        operations=json.dumps(operations,
+                                              cls=DjangoJSONEncoder))
+                transaction.commit(using="default")
+            except:
+                for alias in aliases:
+                    transaction.rollback(using=alias)
+                raise
+
+            for alias in aliases[1:]:
+                try:
+                    transaction.commit(using=alias)
+                except DatabaseError:
+                    #Logged already, recover() applies it later on.
+                    logger.exception("Unit of work %s failed to commit on "
+                                     "%s.", self.key, alias)
+                    transaction.rollback(using=alias)
+                    created.pop(alias, None)
+        finally:
+            for alias in aliases:
+                transaction.leave_transaction_management(using=alias)
+
+        if all(alias in created for alias in self.operations):
+            WorkLog.objects.db_manager("default").filter(
+                            key=self.key).update(state=WorkLog.DONE)
+        for alias, rows in created.items():
+            notify(alias, self.operations[alias], rows)
+
+
+def recover(grace=None):
+    '''
+        Applies the units of work logged as committed on the databases they
+        did not get committed on; returns how many were recovered. Only the
+        ones logged more than ``grace`` seconds ago are taken over.
+    '''
+    if grace is None:
+        grace = getattr(settings, "WORK_RECOVERY_GRACE",
+                        DEFAULT_RECOVERY_GRACE)
+    logs = WorkLog.objects.using("default")
+    before = timezone.now() - datetime.timedelta(seconds=grace)
+
+    try:
+        pending = list(logs.filter(state=WorkLog.COMMITTING,
+                                   created__lte=before))
+    except DatabaseError:
+        #The tables are not synchronized yet, nothing to recover.
+        return 0
+
+    for log in pending:
+        state = WorkLog.DONE
+        for alias, operations in json.loads(log.operations).items():
+            if AppliedWork.objects.using(alias).filter(key=log.key).exists():
+                continue
+            try:
+                with transaction.commit_on_success(using=alias):
+                    created = apply(alias, log.key, operations)
+            except IntegrityError:
+                #Its marker got in first; applied concurrently.
+                continue
+            except DatabaseError:
+                logger.exception("Unit of work %s can't be recovered on "
+                                 "%s.", log.key, alias)
+                state = WorkLog.FAILED
+            else:
+                notify(alias, operations, created)
+        logs.filter(pk=log.pk).update(state=state)
+    return len(pending)
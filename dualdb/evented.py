@@ -0,0 +1,552 @@
+'''
+Created on 18-Oct-2026
+
+@author: Rahul
+
+Event loop entry point, alongside dualdb.wsgi, serving many concurrent
+keep-alive clients off a single thread. Requests are read and responses
+written by the loop, while the WSGI application runs on bounded pools of
+threads, one per database; a slow database only ties up the threads of
+its own pool, and idle keep-alive connections tie up none. Streamed
+responses are written out chunk by chunk, as the application makes them.
+
+Serve it with ``python manage.py serve_evented``.
+'''
+import asyncore
+import errno
+import fcntl
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from cStringIO import StringIO
+from email.utils import formatdate
+from multiprocessing.pool import ThreadPool
+from urllib import unquote
+
+from django.conf import settings
+
+#Seconds an idle keep-alive connection is kept open.
+DEFAULT_KEEPALIVE_TIMEOUT = 15
+
+#Largest request, headers and body, accepted in bytes.
+DEFAULT_MAX_REQUEST_SIZE = 10 * 1024 * 1024
+
+#Threads serving the requests of each database.
+DEFAULT_WORKERS = 10
+
+#Chunks of a streamed response queued for a client at most; the thread
+#making them waits for the client to take them.
+STREAM_WINDOW = 16
+
+#Bytes of a streamed response gathered into each of its chunks, at least.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RECV_SIZE = 64 * 1024
+BACKLOG = 1024
+
+logger = logging.getLogger(__name__)
+
+
+def get_routes(api):
+    '''
+        Returns the database each resource of the Api reads off, by the
+        resource name; sharded resources go by their first shard, the ones
+        with no model by the default database.
+    '''
+    from dualdb.core.registry import route
+
+    routes = {}
+    for name, resource in api._registry.items():
+        if resource._meta.object_class is None:
+            routes[name] = "default"
+            continue
+        db_name, shard_set = route(resource._meta.object_class)
+        if db_name is None and shard_set is not None:
+            db_name = shard_set.aliases[0]
+        routes[name] = db_name or "default"
+    return routes
+
+
+def get_process_local(api):
+    '''
+        Returns what the Api keeps in process, which would tell apart the
+        processes serving it; the response caches keeping their versions
+        in process, and the stock counted in process.
+    '''
+    from dualdb.core.stock import STOCK
+
+    local = []
+    for name, resource in sorted(api._registry.items()):
+        cache = getattr(resource._meta, "response_cache", None)
+        if cache is not None and not cache.is_shared():
+            local.append("the response cache of " + name)
+    if STOCK.interval:
+        local.append("the stock counters")
+    return local
+
+
+def make_environ(server, channel, method, target, version, headers, body):
+    '''
+        Returns the WSGI environ of a parsed request.
+    '''
+    path, _, query = target.partition("?")
+    environ = {
+        "REQUEST_METHOD": method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": unquote(path),
+        "QUERY_STRING": query,
+        "SERVER_NAME": server.host,
+        "SERVER_PORT": str(server.port),
+        "SERVER_PROTOCOL": version,
+        "REMOTE_ADDR": channel.addr[0] if channel.addr else "",
+        "CONTENT_TYPE": headers.pop("content-type", ""),
+        "CONTENT_LENGTH": headers.pop("content-length", ""),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": StringIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": server.processes > 1,
+        "wsgi.run_once": False,
+    }
+    for name, value in headers.items():
+        environ["HTTP_" + name.upper().replace("-", "_")] = value
+    return environ
+
+
+def format_head(status, headers, keep_alive, length=None, chunked=False):
+    '''
+        Returns the status line and headers of an HTTP/1.1 response, as sent
+        out; with no length, the body ends with its chunks or the connection.
+    '''
+    lines = ["HTTP/1.1 " + status]
+    for name, value in headers:
+        if name.lower() not in ("connection", "content-length", "date",
+                                "transfer-encoding"):
+            lines.append("{0}: {1}".format(name, value))
+    if length is not None:
+        lines.append("Content-Length: {0}".format(length))
+    elif chunked:
+        lines.append("Transfer-Encoding: chunked")
+    lines.append("Date: " + formatdate(usegmt=True))
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    return "\r\n".join(lines) + "\r\n\r\n"
+
+
+def format_response(status, headers, body, keep_alive):
+    '''
+        Returns the HTTP/1.1 response, headers and body, as sent out.
+    '''
+    return format_head(status, headers, keep_alive, len(body)) + body
+
+
+def stream(result, status, headers, environ, keep_alive, send):
+    '''
+        Sends the streamed response as the application makes it, gathered
+        into chunks of STREAM_CHUNK_SIZE; in chunks over HTTP/1.1, up to the
+        end of the connection otherwise. Stops when the client hangs up.
+    '''
+    chunked = environ["SERVER_PROTOCOL"] == "HTTP/1.1"
+    keep_alive = keep_alive and chunked
+
+    def send_chunk(parts):
+        chunk = "".join(parts)
+        if chunked:
+            chunk = "{0:x}\r\n{1}\r\n".format(len(chunk), chunk)
+        del parts[:]
+        return send(chunk)
+
+    if not send(format_head(status, headers, keep_alive, chunked=chunked)):
+        return
+    parts = []
+    size = 0
+    try:
+        for chunk in result:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_CHUNK_SIZE:
+                size = 0
+                if not send_chunk(parts):
+                    return
+        if size and not send_chunk(parts):
+            return
+    except Exception:
+        #Too late for an error response, the client sees the body cut off.
+        logger.exception("Error streaming %s", environ.get("PATH_INFO"))
+        send("", last=True, keep_alive=False)
+        return
+    send("0\r\n\r\n" if chunked else "", last=True, keep_alive=keep_alive)
+
+
+def run(application, environ, keep_alive, send):
+    '''
+        Runs the WSGI application on the request, on a worker thread, and
+        hands the response over to ``send``; streamed responses as they are
+        made, the others with the whole of their body buffered.
+    '''
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        response[:] = [status, headers]
+
+    try:
+        result = application(environ, start_response)
+        try:
+            if getattr(result, "streaming", False):
+                #Django responses are the iterable; made on iterating.
+                return stream(result, response[0], response[1], environ,
+                              keep_alive, send)
+            body = "".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    except Exception:
+        logger.exception("Error serving %s", environ.get("PATH_INFO"))
+        response[:] = ["500 Internal Server Error",
+                       [("Content-Type", "text/plain")]]
+        body = "Internal Server Error"
+    send(format_response(response[0], response[1], body, keep_alive),
+         last=True, keep_alive=keep_alive)
+
+
+class Channel(asyncore.dispatcher):
+    '''
+        One client connection; parses the requests off it, one at a time,
+        and writes back their responses in order.
+    '''
+    def __init__(self, server, sock, addr):
+        asyncore.dispatcher.__init__(self, sock, map=server.map)
+        self.server = server
+        self.addr = addr
+        self.inbuf = ""
+        #Data to write, along with if it counts in the stream window.
+        self.outbuf = deque()
+        self.busy = False
+        self.close_when_done = False
+        self.last_active = time.time()
+        #Chunks of the response being streamed not written yet.
+        self.queued = 0
+        self.window = threading.Condition()
+
+    def readable(self):
+        return not self.busy and not self.close_when_done
+
+    def writable(self):
+        return bool(self.outbuf)
+
+    def handle_read(self):
+        data = self.recv(RECV_SIZE)
+        if not data:
+            return
+        self.last_active = time.time()
+        self.inbuf += data
+        self.parse()
+
+    def reject(self, status):
+        '''
+            Answers a request which can't be served, and hangs up.
+        '''
+        self.inbuf = ""
+        self.close_when_done = True
+        self.outbuf.append([format_response(status,
+                                            [("Content-Type", "text/plain")],
+                                            status, False), False])
+
+    def parse(self):
+        '''
+            Hands the next complete request, if any, over to the server.
+        '''
+        end = self.inbuf.find("\r\n\r\n")
+        if end < 0:
+            if len(self.inbuf) > self.server.max_request_size:
+                self.reject("431 Request Header Fields Too Large")
+            return
+
+        lines = self.inbuf[:end].split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            return self.reject("400 Bad Request")
+
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name in headers:
+                headers[name] += "," + value.strip()
+            else:
+                headers[name] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return self.reject("411 Length Required")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            return self.reject("400 Bad Request")
+        if end + 4 + length > self.server.max_request_size:
+            return self.reject("413 Request Entity Too Large")
+        if len(self.inbuf) < end + 4 + length:
+            return
+
+        body = self.inbuf[end + 4:end + 4 + length]
+        self.inbuf = self.inbuf[end + 4 + length:]
+
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            keep_alive = "close" not in connection
+        else:
+            keep_alive = "keep-alive" in connection
+
+        self.busy = True
+        self.server.submit(self, make_environ(self.server, self, method,
+                                              target, version, headers,
+                                              body), keep_alive)
+
+    def wait_window(self):
+        '''
+            Waits for the client to take enough of the chunks queued to
+            queue one more, on a worker thread; returns if it is still
+            connected.
+        '''
+        with self.window:
+            while self.connected and self.queued >= STREAM_WINDOW:
+                self.window.wait(1)
+            self.queued += 1
+            return self.connected
+
+    def finish(self, data, last, keep_alive):
+        '''
+            Queues data of the response of the request being served for
+            writing; done with the request on the last of it.
+        '''
+        self.outbuf.append([data, not last])
+        if last:
+            self.busy = False
+            self.close_when_done = not keep_alive
+
+    def handle_write(self):
+        data, windowed = self.outbuf[0]
+        sent = self.send(data)
+        if sent < len(data):
+            self.outbuf[0][0] = data[sent:]
+        else:
+            self.outbuf.popleft()
+            if windowed:
+                with self.window:
+                    self.queued -= 1
+                    self.window.notify()
+        self.last_active = time.time()
+
+        if not self.outbuf:
+            if self.close_when_done:
+                self.close()
+            elif not self.busy:
+                #Pipelined requests already read.
+                self.parse()
+
+    def handle_close(self):
+        self.close()
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        #Stops the worker thread streaming to the client, if any.
+        with self.window:
+            self.window.notify_all()
+
+    def handle_error(self):
+        logger.exception("Error on the connection of %s", self.addr)
+        self.close()
+
+
+class Waker(asyncore.file_dispatcher):
+    '''
+        Wakes the loop up when the worker threads are done with requests.
+    '''
+    def __init__(self, server):
+        self.server = server
+        read_fd, self.write_fd = os.pipe()
+        asyncore.file_dispatcher.__init__(self, read_fd, map=server.map)
+        os.close(read_fd)
+        flags = fcntl.fcntl(self.write_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.write_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def writable(self):
+        return False
+
+    def wake(self):
+        try:
+            os.write(self.write_fd, "x")
+        except OSError:
+            #The pipe is full, the loop is being woken up already; or it
+            #is closed, the loop has stopped.
+            pass
+
+    def handle_read(self):
+        try:
+            self.recv(RECV_SIZE)
+        except (OSError, socket.error), e:
+            if e.errno != errno.EAGAIN:
+                raise
+        self.server.flush()
+
+    def close(self):
+        asyncore.file_dispatcher.close(self)
+        os.close(self.write_fd)
+
+
+class Server(asyncore.dispatcher):
+    '''
+        Accepts the connections and runs the requests read off them on the
+        pool of threads of the database they read off, see get_routes.
+
+        A request may query any of the databases, on its own thread and on
+        the threads of dualdb.core.executor, all of them sharing the pools
+        of connections of the process; these are made to allow a connection
+        to every one of those threads, see get_threads, so that none of
+        them waits for one whatever their POOL settings.
+    '''
+    def __init__(self, application, host="127.0.0.1", port=8000,
+                 api=None, processes=1, keepalive_timeout=None,
+                 max_request_size=None, workers=None):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.application = application
+        self.api = api
+        self.processes = processes
+        self.keepalive_timeout = keepalive_timeout or getattr(settings,
+                    "EVENTED_KEEPALIVE_TIMEOUT", DEFAULT_KEEPALIVE_TIMEOUT)
+        self.max_request_size = max_request_size or getattr(settings,
+                    "EVENTED_MAX_REQUEST_SIZE", DEFAULT_MAX_REQUEST_SIZE)
+        self.workers = workers or getattr(settings, "EVENTED_WORKERS",
+                                          DEFAULT_WORKERS)
+        self.routes = None
+        self.executors = {}
+        self.done = deque()
+        #Until stop() is called, which may be before serve_forever().
+        self.running = True
+
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(BACKLOG)
+        self.host, self.port = self.socket.getsockname()[:2]
+        #Made by the process serving, the listening socket may be shared.
+        self.waker = None
+
+    def get_routes(self):
+        '''
+            Returns the database each resource reads off, by its name.
+        '''
+        if self.routes is None:
+            if self.api is None:
+                from dualdb.urls import V1_API
+                self.api = V1_API
+            self.routes = get_routes(self.api)
+        return self.routes
+
+    def get_threads(self):
+        '''
+            Returns how many threads of the process may query a database at
+            once; those of every database, along with the scatter ones.
+        '''
+        from dualdb.core.executor import EXECUTOR
+
+        databases = set(self.get_routes().values()) | set(["default"])
+        return self.workers * len(databases) + EXECUTOR.workers
+
+    def get_database(self, path):
+        '''
+            Returns the database the request for the given path reads off.
+        '''
+        self.get_routes()
+
+        bits = path.strip("/").split("/")
+        if len(bits) > 1 and bits[0] == self.api.api_name:
+            return self.routes.get(bits[1], "default")
+        return "default"
+
+    def get_executor(self, alias):
+        '''
+            Returns the pool of threads running the requests on the given
+            database, started on first use; in the process serving them.
+        '''
+        if alias not in self.executors:
+            self.executors[alias] = ThreadPool(self.workers)
+        return self.executors[alias]
+
+    def submit(self, channel, environ, keep_alive):
+        '''
+            Runs the request on a worker thread, handing its response back
+            to the loop as it comes; returns if the client is still there.
+        '''
+        def send(data, last=False, keep_alive=keep_alive):
+            if not last and not channel.wait_window():
+                return False
+            self.done.append((channel, data, last, keep_alive))
+            self.waker.wake()
+            return channel.connected
+
+        executor = self.get_executor(self.get_database(environ["PATH_INFO"]))
+        executor.apply_async(run, (self.application, environ, keep_alive,
+                                   send))
+
+    def flush(self):
+        '''
+            Queues the responses the worker threads handed back so far.
+        '''
+        while self.done:
+            channel, data, last, keep_alive = self.done.popleft()
+            if channel.connected:
+                channel.finish(data, last, keep_alive)
+
+    def sweep(self):
+        '''
+            Closes the keep-alive connections left idle for too long.
+        '''
+        expired = time.time() - self.keepalive_timeout
+        for dispatcher in self.map.values():
+            if isinstance(dispatcher, Channel) and not dispatcher.busy and \
+                    not dispatcher.outbuf and dispatcher.last_active < expired:
+                dispatcher.close()
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            Channel(self, *pair)
+
+    def handle_error(self):
+        #Keep on listening, like on running out of file descriptors.
+        logger.exception("Error accepting a connection")
+
+    def serve_forever(self):
+        '''
+            Runs the loop until stop() is called.
+        '''
+        from dualdb.core.pool import reserve
+
+        reserve(self.get_threads())
+        self.waker = Waker(self)
+        swept = time.time()
+        while self.running:
+            asyncore.loop(timeout=1, use_poll=True, map=self.map, count=1)
+            if time.time() - swept >= 1:
+                self.sweep()
+                swept = time.time()
+        for dispatcher in self.map.values():
+            dispatcher.close()
+        for executor in self.executors.values():
+            executor.close()
+
+    def stop(self):
+        '''
+            Stops the loop; may be called from any thread.
+        '''
+        self.running = False
+        if self.waker is not None:
+            self.waker.wake()
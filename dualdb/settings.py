@@ -12,33 +12,65 @@ APP_NAME = "dualdb"
 MANAGERS = ADMINS
 PROJECT_DIR = os.path.split(os.path.split(os.path.abspath(__file__))[0])[0]
 
+# Connections are kept open across requests, per database. Idle ones are
+# closed after IDLE_TIMEOUT seconds and pinged before reuse with VALIDATE.
+POOL = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'IDLE_TIMEOUT': 300,
+    'CHECKOUT_TIMEOUT': 5,
+    'VALIDATE': True,
+}
+
+# Pragmas set on every connection as it opens. The databases are written
+# ahead of their log (WAL) so that readers and the writer don't block each
+# other, and synced at checkpoints only. transactions takes most of the
+# writes: it waits longer on locks and checkpoints less often; inventory
+# takes most of the reads: it gets a larger cache and memory map.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    'cache_size': -8000,
+    'mmap_size': 64 * 1024 * 1024,
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'dualdb.core.backends.sqlite3',
         'NAME': '{0}/project.db'.format(PROJECT_DIR),
         # The following settings are not used with sqlite3:
         'USER': '',
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
+        'POOL': POOL,
+        'PRAGMAS': dict(PRAGMAS),
     },
     'transactions': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'dualdb.core.backends.sqlite3',
         'NAME': '{0}/transactions.db'.format(PROJECT_DIR),
         # The following settings are not used with sqlite3:
         'USER': '',
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
+        'POOL': POOL,
+        'PRAGMAS': dict(PRAGMAS, busy_timeout=10000,
+                        cache_size=-16000, wal_autocheckpoint=4000),
     },
     'inventory': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'dualdb.core.backends.sqlite3',
         'NAME': '{0}/inventory.db'.format(PROJECT_DIR),
         # The following settings are not used with sqlite3:
         'USER': '',
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
+        'POOL': POOL,
+        'PRAGMAS': dict(PRAGMAS, cache_size=-64000,
+                        mmap_size=256 * 1024 * 1024),
     }
 }
 
@@ -114,11 +146,13 @@ TEMPLATE_LOADERS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'dualdb.core.middleware.QueryStatsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'dualdb.core.middleware.ReplicaPinningMiddleware',
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
 )
@@ -180,6 +214,84 @@ LOGGING = {
 
 DATABASE_ROUTERS = ["dualdb.core.routers.ModelRouter"]
 
+# Replicas lagging behind their primary by more seconds than this are
+# skipped, and the ones failing health checks are retried after a while.
+# They are checked every REPLICA_CHECK_INTERVAL seconds, their lag measured
+# off the change log.
+REPLICA_MAX_LAG = 5
+REPLICA_RETRY_AFTER = 30
+REPLICA_CHECK_INTERVAL = 10
+
+# Customers and their orders are partitioned over these databases by the
+# customer id. Add aliases to DATABASES and here to spread the writes.
+TRANSACTIONS_SHARDS = ("transactions",)
+
+# Threads running the queries of a request on several databases at once.
+SCATTER_WORKERS = 8
+
+# The test databases are created and snapshotted once per run, restored
+# between tests; "manage.py test --parallel N" shares the test classes out
+# between N processes, each with copies of its own of the databases.
+TEST_RUNNER = "dualdb.core.testing.SnapshotTestRunner"
+
+# Queries of the same shape sent this many times by a request are flagged
+# as N+1. The query counters of every request are sent back in the
+# X-Query-Stats header when QUERY_STATS_HEADER is set; /metrics has them
+# all for scraping.
+N_PLUS_ONE_THRESHOLD = 3
+QUERY_STATS_HEADER = DEBUG
+
+# Idle keep-alive connections of serve_evented are closed after this many
+# seconds; requests larger than EVENTED_MAX_REQUEST_SIZE bytes are refused.
+EVENTED_KEEPALIVE_TIMEOUT = 15
+EVENTED_MAX_REQUEST_SIZE = 10 * 1024 * 1024
+
+# Threads of serve_evented serving the requests of each database; the pools
+# of connections allow as many as all of these and the SCATTER_WORKERS.
+EVENTED_WORKERS = 10
+
+# The "responses" cache is shared by all of the processes on the host; the
+# response caches of the resources keep their model versions in it, see
+# RESPONSE_CACHE_VERSIONS.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '{0}/cache/responses'.format(PROJECT_DIR),
+    }
+}
+
+# Seconds and number of responses kept by the response cache of resources,
+# in process; the versions of the models they were built off are kept in
+# the RESPONSE_CACHE_VERSIONS cache, so that a write in any process serving
+# the API invalidates them in all of the others. Set it to None when a
+# single process serves the API, to keep them in process too.
+RESPONSE_CACHE_TIMEOUT = 60
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_VERSIONS = "responses"
+
+# The products and suppliers resources serve their plain reads off snapshot
+# files kept here, rebuilt CATALOG_REBUILD_DELAY seconds after the last
+# write; see dualdb.core.catalog.
+CATALOG_DIR = os.path.join(PROJECT_DIR, "catalog")
+CATALOG_REBUILD_DELAY = 1
+
+# Seconds the stock reserved and released through /v1/products/<id>/reserve
+# and /release is counted in process before being written back, in batch.
+# Set it to 0 to write it back at once, when several processes serve the API.
+STOCK_FLUSH_INTERVAL = 0.5
+
+# Seconds a unit of work logged as committed is left to the process that
+# logged it, before recovery applies it where it did not get committed.
+WORK_RECOVERY_GRACE = 60
+
+# Writes on the models of the resources are logged per database, and read
+# back through /v1/changes; "manage.py prune_changes" deletes the events
+# older than this many days.
+CHANGE_LOG_RETENTION_DAYS = 7
+
 TASTYPIE_ALLOW_MISSING_SLASH = True
 
 FIXTURE_DIRS = (
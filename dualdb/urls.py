@@ -1,6 +1,7 @@
 from django.conf.urls import patterns, include, url
 from dualdb.core.resources import CustomersResource, OrdersResource,\
-    SuppliersResource, ProductsResource
+    SuppliersResource, ProductsResource, OrderSummariesResource, \
+    ChangesResource
 from tastypie.api import Api
 
 # Initializing the version V1 APIs.
@@ -8,12 +9,17 @@ V1_API = Api(api_name="v1")
 
 V1_API.register(CustomersResource())
 V1_API.register(OrdersResource())
+V1_API.register(OrderSummariesResource())
 
 V1_API.register(SuppliersResource())
 V1_API.register(ProductsResource())
 
+V1_API.register(ChangesResource())
+
 urlpatterns = patterns('',
 
     url(r'^$', 'dualdb.views.hello', name='hello'),
+    url(r'^pools$', 'dualdb.views.pools', name='pools'),
+    url(r'^metrics$', 'dualdb.views.metrics', name='metrics'),
     (r'', include(V1_API.urls)),
 )
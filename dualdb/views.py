@@ -3,8 +3,12 @@ Created on 08-Apr-2014
 
 @author: Rahul
 '''
+import json
+
 from django.http.response import HttpResponse
+from dualdb.core.instrumentation import METRICS
 from dualdb.core.models import Product
+from dualdb.core.pool import pool_stats
 
 
 def hello(request):
@@ -13,3 +17,24 @@ def hello(request):
     '''
     print dir(Product.pk)
     return HttpResponse("This is working")
+
+
+def pools(request):
+    '''
+        Returns the metrics of the connection pools, by database.
+    '''
+    return HttpResponse(json.dumps(pool_stats()),
+                        content_type="application/json")
+
+
+def metrics(request):
+    '''
+        Returns the query counters of every database, and the usage of
+        their connection pools, in the Prometheus text format.
+    '''
+    gauges = [("dualdb_pool_{0}".format(name), "Connection pool {0}.".format(
+                    name.replace("_", " ")), (("alias", alias),), value)
+              for alias, stats in sorted(pool_stats().items())
+              for name, value in sorted(stats.items())]
+    return HttpResponse(METRICS.render(gauges),
+                        content_type="text/plain; version=0.0.4")
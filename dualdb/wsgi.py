@@ -27,6 +27,10 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "dualdb.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Finish the units of work a previous process left half committed.
+from dualdb.core.work import recover
+recover()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)